@@ -0,0 +1,175 @@
+"""Архив старых отзывов и комментариев.
+
+Строки старше ARCHIVE_AFTER_DAYS дней переносятся в таблицы
+ArchivedReview и ArchivedComment того же шарда пачками по ARCHIVE_CHUNK
+строк. Пачка переносится одной транзакцией шарда: строка всегда лежит
+ровно в одной из таблиц, а id сохраняются. Отзыв переезжает вместе со
+всеми комментариями, поэтому к архивному отзыву не бывает горячих
+комментариев. Горячие таблицы и их индексы остаются небольшими.
+
+Списки отзывов и комментариев отдаются свежими первыми и продолжаются
+архивом (HotThenArchive): страницы в пределах горячих строк к архиву
+не обращаются.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching, db
+from reviews.models import ArchivedComment, ArchivedReview, Comments, Review
+from reviews.sharding import on_shard, shard_for, shards
+
+REVIEW_FIELDS = (
+    'id', 'text', 'score', 'pub_date', 'is_hidden', 'title_id', 'author_id'
+)
+COMMENT_FIELDS = (
+    'id', 'text', 'pub_date', 'is_hidden', 'review_id', 'author_id'
+)
+# Порядок списков: свежие первыми.
+ORDERING = ('-pk',)
+
+
+class HotThenArchive:
+    """Последовательность для пагинатора: горячие строки, затем архивные.
+
+    Поддерживает count() и срезы, как queryset. Строки архива
+    выбираются только для страниц, выходящих за горячие строки.
+    """
+
+    def __init__(self, hot, archived):
+        self.hot = hot.order_by(*ORDERING)
+        self.archived = archived.order_by(*ORDERING)
+        self._hot_count = None
+
+    def hot_count(self):
+        if self._hot_count is None:
+            self._hot_count = self.hot.count()
+        return self._hot_count
+
+    def count(self):
+        return self.hot_count() + self.archived.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        yield from self.hot
+        yield from self.archived
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        hot_count = self.hot_count()
+        rows = list(self.hot[start:stop]) if start < hot_count else []
+        if stop is None or stop > hot_count:
+            archived_stop = None if stop is None else stop - hot_count
+            rows += list(
+                self.archived[max(start - hot_count, 0):archived_stop]
+            )
+        return rows
+
+
+def reviews_of(title_id):
+    """Архивные отзывы произведения."""
+    return on_shard(ArchivedReview.objects, shard_for(title_id)).filter(
+        title_id=title_id
+    )
+
+
+def comments_of(review):
+    """Архивные комментарии горячего или архивного отзыва."""
+    return on_shard(
+        ArchivedComment.objects, shard_for(review.title_id)
+    ).filter(review_id=review.pk)
+
+
+def _move_comments(shard, queryset, titles):
+    """Переносит комментарии queryset'а; titles - {id отзыва: id тайтла}."""
+    rows = list(queryset.values(*COMMENT_FIELDS))
+    ArchivedComment.objects.using(shard).bulk_create(
+        ArchivedComment(title_id=titles[row['review_id']], **row)
+        for row in rows
+    )
+    Comments.objects.using(shard).filter(
+        pk__in=[row['id'] for row in rows]
+    )._raw_delete(shard)
+    return rows
+
+
+def _archive_reviews(shard, cutoff):
+    with transaction.atomic(using=shard):
+        rows = list(
+            Review.objects.using(shard).filter(pub_date__lt=cutoff)
+            .order_by('pk').values(*REVIEW_FIELDS)[:settings.ARCHIVE_CHUNK]
+        )
+        if not rows:
+            return rows, []
+        titles = {row['id']: row['title_id'] for row in rows}
+        ArchivedReview.objects.using(shard).bulk_create(
+            ArchivedReview(**row) for row in rows
+        )
+        comments = _move_comments(shard, Comments.objects.using(shard).filter(
+            review_id__in=titles
+        ), titles)
+        Review.objects.using(shard).filter(pk__in=titles)._raw_delete(shard)
+    return rows, comments
+
+
+def _archive_comments(shard, cutoff):
+    with transaction.atomic(using=shard):
+        ids = list(
+            Comments.objects.using(shard).filter(pub_date__lt=cutoff)
+            .order_by('pk').values_list('pk', flat=True)[
+                :settings.ARCHIVE_CHUNK
+            ]
+        )
+        if not ids:
+            return []
+        queryset = Comments.objects.using(shard).filter(pk__in=ids)
+        titles = dict(queryset.values_list('review_id', 'review__title_id'))
+        return _move_comments(shard, queryset, titles)
+
+
+def archive(cutoff=None):
+    """Переносит в архив строки старше cutoff и возвращает их число.
+
+    Сначала переносятся старые комментарии, затем старые отзывы с
+    оставшимися комментариями. Страницы списков затронутых произведений
+    и отзывов сбрасываются; средние оценки не меняются.
+    """
+    if cutoff is None:
+        cutoff = timezone.now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+    result = {'reviews': 0, 'comments': 0}
+    for shard in shards():
+        while True:
+            comments = db.retry_on_locked(_archive_comments, shard, cutoff)
+            if not comments:
+                break
+            result['comments'] += len(comments)
+            _invalidate((), comments)
+        while True:
+            reviews, comments = db.retry_on_locked(
+                _archive_reviews, shard, cutoff
+            )
+            if not reviews:
+                break
+            result['reviews'] += len(reviews)
+            result['comments'] += len(comments)
+            _invalidate(reviews, comments)
+    return result
+
+
+def _invalidate(reviews, comments):
+    for title_id in {row['title_id'] for row in reviews}:
+        caching.bump_generation(
+            caching.REVIEWS_GENERATION_KEY.format(title_id=title_id)
+        )
+    review_ids = {row['id'] for row in reviews}
+    review_ids.update(row['review_id'] for row in comments)
+    for review_id in review_ids:
+        caching.bump_generation(
+            caching.COMMENTS_GENERATION_KEY.format(review_id=review_id)
+        )
@@ -0,0 +1,289 @@
+"""Пакетная загрузка отзывов и произведений.
+
+Отзывы обрабатываются пачками по BULK_REVIEW_CHUNK: произведения и
+авторы пачки проверяются двумя запросами IN, отзывы вставляются одним
+INSERT на шард с пропуском конфликтов unique_reviews, после чего одним
+запросом выясняется, какие из них действительно добавлены.
+
+Произведения проверяются по заранее загруженным словарям жанров и
+категорий и вставляются пачками по TITLE_IMPORT_CHUNK: одна транзакция
+на пачку, по одному INSERT для произведений и их жанров.
+
+Массовое изменение произведений выполняется фиксированным числом
+запросов независимо от размера набора.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Max
+
+from . import caching, db
+from .serializers import BulkReviewItemSerializer, TitleImportItemSerializer
+from reviews.models import (ArchivedReview, Category, Genre, GenreTitle,
+                            Review, Title, User)
+from reviews.sharding import group_by_shard, on_shard
+
+CREATED = 'created'
+DUPLICATE = 'duplicate'
+ERROR = 'error'
+
+
+def _chunks(items, size):
+    items = iter(items)
+    chunk = list(islice(items, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(items, size))
+
+
+def _validate(start, chunk):
+    """Возвращает результаты с ошибками и {индекс: validated_data}."""
+    results, valid = [], {}
+    for index, item in enumerate(chunk, start):
+        serializer = BulkReviewItemSerializer(data=item)
+        if serializer.is_valid():
+            valid[index] = serializer.validated_data
+        else:
+            results.append(
+                {'index': index, 'status': ERROR, 'errors': serializer.errors}
+            )
+    titles = set(Title.objects.filter(
+        pk__in={data['title'] for data in valid.values()}
+    ).values_list('pk', flat=True))
+    authors = dict(User.objects.filter(
+        username__in={data['author'] for data in valid.values()}
+    ).values_list('username', 'pk'))
+    reviews, seen = {}, set()
+    for index, data in valid.items():
+        errors = {}
+        if data['title'] not in titles:
+            errors['title'] = ['Произведение не найдено.']
+        if data['author'] not in authors:
+            errors['author'] = ['Пользователь не найден.']
+        if errors:
+            results.append({'index': index, 'status': ERROR, 'errors': errors})
+            continue
+        key = (data['title'], authors[data['author']])
+        if key in seen:
+            results.append({'index': index, 'status': DUPLICATE})
+            continue
+        seen.add(key)
+        reviews[index] = Review(
+            title_id=key[0], author_id=key[1], text=data['text'],
+            score=data['score'],
+        )
+    return results, reviews
+
+
+def _insert(shard, reviews):
+    """Вставляет отзывы шарда и возвращает {индекс: id} добавленных."""
+    # Уникальность пары (произведение, автор) в архиве не проверяется БД.
+    archived = set(on_shard(ArchivedReview.objects, shard).filter(
+        title_id__in={review.title_id for review in reviews.values()},
+        author_id__in={review.author_id for review in reviews.values()},
+    ).values_list('title_id', 'author_id'))
+    reviews = {
+        index: review for index, review in reviews.items()
+        if (review.title_id, review.author_id) not in archived
+    }
+    db.retry_on_locked(
+        on_shard(Review.objects, shard).bulk_create,
+        reviews.values(), ignore_conflicts=True,
+    )
+    # Добавленную строку отличает pub_date, выставленный bulk_create.
+    rows = {
+        (title_id, author_id): (pk, pub_date)
+        for pk, title_id, author_id, pub_date in on_shard(
+            Review.objects, shard
+        ).filter(
+            title_id__in={review.title_id for review in reviews.values()},
+            author_id__in={review.author_id for review in reviews.values()},
+        ).values_list('pk', 'title_id', 'author_id', 'pub_date')
+    }
+    created = {}
+    for index, review in reviews.items():
+        pk, pub_date = rows.get(
+            (review.title_id, review.author_id), (None, None)
+        )
+        if pub_date == review.pub_date:
+            created[index] = pk
+    return created
+
+
+def import_reviews(items):
+    """Загружает отзывы и возвращает результат по каждому элементу."""
+    results, start = [], 0
+    for chunk in _chunks(items, settings.BULK_REVIEW_CHUNK):
+        chunk_results, reviews = _validate(start, chunk)
+        start += len(chunk)
+        by_title = {}
+        for index, review in reviews.items():
+            by_title.setdefault(review.title_id, {})[index] = review
+        created = {}
+        for shard, title_ids in group_by_shard(by_title).items():
+            created.update(_insert(shard, {
+                index: review
+                for title_id in title_ids
+                for index, review in by_title[title_id].items()
+            }))
+        for index, review in reviews.items():
+            if index in created:
+                chunk_results.append(
+                    {'index': index, 'status': CREATED, 'id': created[index]}
+                )
+            else:
+                chunk_results.append({'index': index, 'status': DUPLICATE})
+        # bulk_create не отправляет сигналы: страницы отзывов каждого
+        # затронутого произведения сбрасываются один раз.
+        for title_id in {reviews[index].title_id for index in created}:
+            caching.bump_generation(
+                caching.REVIEWS_GENERATION_KEY.format(title_id=title_id)
+            )
+        results.extend(sorted(chunk_results, key=lambda r: r['index']))
+    return results
+
+
+def reserve_ids(model, count):
+    """Первый из count идущих подряд свободных id модели.
+
+    Нужен для bulk_create на БД, которые не возвращают первичные ключи
+    вставленных строк. Вызывается в транзакции записи: если другой
+    процесс успел вставить строки, SQLite отклонит повышение блокировки,
+    и транзакция будет повторена через retry_on_locked.
+    """
+    using = router.db_for_write(model)
+    last = model._default_manager.db_manager(using).aggregate(
+        last=Max('pk')
+    )['last'] or 0
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        # AUTOINCREMENT не переиспользует id удалённых строк.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT seq FROM sqlite_sequence WHERE name = %s',
+                [model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        last = max(last, row[0] if row else 0)
+    return last + 1
+
+
+def _insert_titles(rows):
+    titles = [
+        Title(
+            name=data['name'], year=data['year'],
+            description=data['description'], category_id=category_id,
+        )
+        for data, category_id, _ in rows
+    ]
+    connection = connections[router.db_for_write(Title)]
+    if not connection.features.can_return_rows_from_bulk_insert:
+        first = reserve_ids(Title, len(titles))
+        for offset, title in enumerate(titles):
+            title.pk = first + offset
+    Title.objects.bulk_create(titles)
+    GenreTitle.objects.bulk_create(
+        GenreTitle(title_id=title.pk, genre_id=genre_id)
+        for title, (_, _, genre_ids) in zip(titles, rows)
+        for genre_id in genre_ids
+    )
+    return titles
+
+
+def import_titles(lines):
+    """Загружает произведения из пар (номер строки, значение).
+
+    Генератор: по каждой строке выдаёт её id или ошибки, после каждой
+    пачки - строку прогресса с накопленными итогами.
+    """
+    genres = dict(Genre.objects.values_list('slug', 'pk'))
+    categories = dict(Category.objects.values_list('slug', 'pk'))
+    processed = created = failed = 0
+    for chunk in _chunks(lines, settings.TITLE_IMPORT_CHUNK):
+        numbers, rows = [], []
+        for number, item in chunk:
+            serializer = TitleImportItemSerializer(data=item)
+            if not serializer.is_valid():
+                failed += 1
+                yield {'line': number, 'errors': serializer.errors}
+                continue
+            data = serializer.validated_data
+            errors = {}
+            unknown = [slug for slug in data['genre'] if slug not in genres]
+            if unknown:
+                errors['genre'] = [
+                    f'Жанры не найдены: {", ".join(unknown)}.'
+                ]
+            if data['category'] not in categories:
+                errors['category'] = ['Категория не найдена.']
+            if errors:
+                failed += 1
+                yield {'line': number, 'errors': errors}
+                continue
+            numbers.append(number)
+            rows.append((
+                data, categories[data['category']],
+                list(dict.fromkeys(genres[slug] for slug in data['genre'])),
+            ))
+        if rows:
+            titles = db.retry_on_locked(_insert_titles, rows)
+            created += len(titles)
+            for number, title in zip(numbers, titles):
+                yield {'line': number, 'id': title.pk}
+        processed += len(chunk)
+        yield {'processed': processed, 'created': created, 'errors': failed}
+
+
+def _remove_genres(titles, genre_ids):
+    links = GenreTitle.objects.filter(
+        title_id__in=titles.values('pk'), genre_id__in=genre_ids
+    )
+    # Один DELETE без сигналов по каждой строке: CachingQuerySet один раз
+    # увеличивает поколение таблицы, кэш JSON сбрасывается ниже.
+    return links._raw_delete(links.db)
+
+
+def update_titles(titles, changes, remove_last=False):
+    """Применяет изменения к произведениям и возвращает счётчики.
+
+    titles - queryset выбранных произведений, он входит в каждый запрос
+    подзапросом. Выполняется в транзакции: один UPDATE полей, удаление
+    жанров одним DELETE и одна выборка с одним INSERT для добавляемых.
+    Добавление жанров набор не меняет. Удаление жанров и UPDATE полей
+    могут вывести произведения из фильтра, поэтому последним выполняется
+    то, от чего зависит фильтр: remove_last - фильтр выбирает по
+    удаляемому жанру. Кэш JSON произведений сбрасывается после коммита
+    через поколение каталога.
+    """
+    fields = {
+        field: changes[field]
+        for field in ('name', 'year', 'category') if field in changes
+    }
+    result = {
+        'matched': titles.count(), 'updated': 0,
+        'genres_added': 0, 'genres_removed': 0,
+    }
+    add = [genre.pk for genre in changes.get('add_genres', ())]
+    if add:
+        existing = set(GenreTitle.objects.filter(
+            title_id__in=titles.values('pk'), genre_id__in=add
+        ).values_list('title_id', 'genre_id'))
+        links = GenreTitle.objects.bulk_create(
+            GenreTitle(title_id=title_id, genre_id=genre_id)
+            for title_id in titles.values_list('pk', flat=True).iterator()
+            for genre_id in add
+            if (title_id, genre_id) not in existing
+        )
+        result['genres_added'] = len(links)
+    remove = {genre.pk for genre in changes.get('remove_genres', ())}
+    if remove and not remove_last:
+        result['genres_removed'] = _remove_genres(titles, remove)
+    if fields:
+        result['updated'] = titles.update(**fields)
+    if remove and remove_last:
+        result['genres_removed'] = _remove_genres(titles, remove)
+    transaction.on_commit(
+        lambda: caching.bump_generation(caching.CATALOGUE_GENERATION_KEY)
+    )
+    return result
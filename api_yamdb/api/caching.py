@@ -0,0 +1,113 @@
+"""Кэширование ответов API поверх общего кэша Django.
+
+Инвалидация построена на счётчиках поколений: ключ закэшированного
+значения включает текущие поколения данных, из которых оно собрано, а
+запись в эти данные увеличивает поколение. Старые значения никто не
+удаляет, они просто перестают запрашиваться и вытесняются кэшем.
+"""
+import time
+from hashlib import blake2b
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+
+TITLE_GENERATION_KEY = 'gen:title:{title_id}'
+CATALOGUE_GENERATION_KEY = 'gen:catalogue'
+REVIEWS_GENERATION_KEY = 'gen:reviews:{title_id}'
+COMMENTS_GENERATION_KEY = 'gen:comments:{review_id}'
+PAGE_KEY = 'page:{generation}:{digest}'
+TITLE_FRAGMENT_KEY = (
+    'title-json:{id}:{generation}:{catalogue}:{category}:{genres}:{rating}'
+)
+
+
+def _initial_generation():
+    # Если счётчик вытеснен из кэша, новое значение не должно совпасть
+    # ни с одним из прежних, иначе ожили бы устаревшие записи.
+    return time.time_ns()
+
+
+def get_generations(keys):
+    """Возвращает текущие поколения для списка ключей-счётчиков."""
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _initial_generation(), timeout=None)
+            generations[key] = cache.get(key)
+    return generations
+
+
+def bump_generation(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_generation(), timeout=None)
+
+
+def title_fragment_keys(titles):
+    """Ключи JSON-фрагментов произведений с учётом всех их зависимостей."""
+    generation_keys = [
+        TITLE_GENERATION_KEY.format(title_id=title.pk) for title in titles
+    ]
+    generations = get_generations(
+        generation_keys + [CATALOGUE_GENERATION_KEY]
+    )
+    return [
+        TITLE_FRAGMENT_KEY.format(
+            id=title.pk,
+            generation=generations[generation_key],
+            catalogue=generations[CATALOGUE_GENERATION_KEY],
+            category=title.category_id,
+            genres='.'.join(
+                str(genre.pk) for genre in title.genre.all()
+            ),
+            rating=title.rating,
+        )
+        for title, generation_key in zip(titles, generation_keys)
+    ]
+
+
+def title_fragments(titles, serializer_class, renderer):
+    """Возвращает JSON-байты произведений, сериализуя только промахи."""
+    keys = title_fragment_keys(titles)
+    cached = cache.get_many(keys)
+    fragments, missed = [], {}
+    for title, key in zip(titles, keys):
+        fragment = cached.get(key)
+        if fragment is None:
+            fragment = renderer.render(serializer_class(title).data)
+            missed[key] = fragment
+        fragments.append(fragment)
+    if missed:
+        cache.set_many(missed, timeout=settings.TITLE_FRAGMENT_TIMEOUT)
+    return fragments
+
+
+def cached_page(generation_key, path, params, render, alias=None):
+    """Возвращает байты страницы, вызывая render() только при промахе.
+
+    Ключ страницы включает поколение родительского объекта, путь,
+    параметры пагинации и БД, из которой она прочитана. Реплика может
+    отставать от уже увеличенного поколения, поэтому прочитанные с неё
+    страницы живут не дольше REPLICA_LAG. Если render() вернул None,
+    ответ не кэшируется.
+    """
+    generation = get_generations([generation_key])[generation_key]
+    raw = '\n'.join((
+        path, repr(sorted(params.items())), alias or DEFAULT_DB_ALIAS
+    ))
+    key = PAGE_KEY.format(
+        generation=generation,
+        digest=blake2b(raw.encode(), digest_size=16).hexdigest(),
+    )
+    content = cache.get(key)
+    if content is None:
+        content = render()
+        if content is not None:
+            timeout = settings.PAGE_CACHE_TIMEOUT
+            if alias not in (None, DEFAULT_DB_ALIAS):
+                timeout = min(timeout, settings.REPLICA_LAG)
+            cache.set(key, content, timeout=timeout)
+    return content
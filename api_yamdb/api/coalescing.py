@@ -0,0 +1,80 @@
+"""Склейка одинаковых одновременных запросов на чтение (single-flight).
+
+Первый запрос с данным ключом становится ведущим и выполняет обработку,
+остальные ждут его результата и получают копию ответа. Склеиваются только
+успешные ответы: при ошибке или таймауте ожидающие запросы выполняются
+самостоятельно. Склеиваются только анонимные запросы: запросы с
+учётными данными должны пройти аутентификацию сами и могут быть
+закреплены за основной БД.
+"""
+import threading
+from hashlib import blake2b
+
+from django.http import HttpResponse
+
+
+class ResponseSnapshot:
+    """Неизменяемая копия отрендеренного ответа."""
+
+    def __init__(self, response):
+        self.status = response.status_code
+        self.content = response.content
+        self.headers = list(response.items())
+
+    def to_response(self):
+        response = HttpResponse(self.content, status=self.status)
+        for header, value in self.headers:
+            response[header] = value
+        return response
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, timeout):
+        """Возвращает пару (результат, роль): leader, follower или own."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if leader:
+            try:
+                call.result = func()
+                return call.result, 'leader'
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        if call.done.wait(timeout) and call.result is not None:
+            return call.result, 'follower'
+        return func(), 'own'
+
+
+def is_anonymous(request):
+    """Запрос пришёл без учётных данных."""
+    return 'HTTP_AUTHORIZATION' not in request.META
+
+
+def request_key(request):
+    """Ключ запроса: путь, отсортированные параметры и Accept."""
+    query = sorted(
+        (name, value)
+        for name, values in request.GET.lists() for value in values
+    )
+    raw = '\n'.join((
+        request.path, repr(query), request.META.get('HTTP_ACCEPT', ''),
+    ))
+    return blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+flights = SingleFlight()
@@ -0,0 +1,74 @@
+"""Коды подтверждения для получения токена.
+
+Коды хранятся в таблице ConfirmationCode по строке на пользователя, а не
+в таблице пользователей: повторная регистрация не переписывает строку
+пользователя. Код действует CONFIRMATION_CODE_TTL секунд и выдерживает
+CONFIRMATION_CODE_ATTEMPTS неверных попыток. Истёкшие коды не вычищаются
+отдельно: они отбрасываются при проверке и перезаписываются при
+следующей выдаче. Пока с выдачи кода не прошло
+CONFIRMATION_CODE_RESEND_WINDOW секунд, новый код не выдаётся.
+"""
+import hmac
+from datetime import timedelta
+from random import randint
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from reviews.models import ConfirmationCode, User
+
+
+def _expired(issued_at, now):
+    return issued_at <= now - timedelta(seconds=settings.CONFIRMATION_CODE_TTL)
+
+
+def issue(user, row=None):
+    """Выдаёт пользователю новый код и возвращает его.
+
+    row - текущая строка кода пользователя, если она уже загружена.
+    Возвращает None, если код выдан недавно и письмо отправлять не нужно.
+    """
+    now = timezone.now()
+    window = timedelta(seconds=settings.CONFIRMATION_CODE_RESEND_WINDOW)
+    if row is not None and row.issued_at > now - window:
+        return None
+    code = randint(100000, 999999)
+    if row is None:
+        ConfirmationCode.objects.create(user=user, code=code, issued_at=now)
+    else:
+        row.code, row.issued_at, row.attempts = code, now, 0
+        row.save(update_fields=('code', 'issued_at', 'attempts'))
+    return code
+
+
+def verify(username, code):
+    """Проверяет код и возвращает id пользователя или None.
+
+    Пользователь не загружается: один запрос читает его id и строку кода.
+    Верный код расходуется, неверный увеличивает счётчик попыток.
+    Неизвестный username вызывает User.DoesNotExist.
+    """
+    rows = User.objects.filter(username=username).values_list(
+        'pk', 'confirmation__code', 'confirmation__issued_at',
+        'confirmation__attempts'
+    )[:1]
+    if not rows:
+        raise User.DoesNotExist
+    user_id, expected, issued_at, attempts = rows[0]
+    if expected is None:
+        return None
+    codes = ConfirmationCode.objects.filter(pk=user_id)
+    if (
+        _expired(issued_at, timezone.now())
+        or attempts >= settings.CONFIRMATION_CODE_ATTEMPTS
+    ):
+        codes.delete()
+        return None
+    if not hmac.compare_digest(str(code), str(expected)):
+        codes.update(attempts=F('attempts') + 1)
+        return None
+    # Код одноразовый; параллельная проверка того же кода его не получит.
+    if not codes.filter(code=expected).delete()[0]:
+        return None
+    return user_id
@@ -0,0 +1,101 @@
+"""Работа с БД: настройка SQLite под нагрузкой и чтение с реплик."""
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, OperationalError, transaction
+
+
+REPLICA_PIN_KEY = 'replica-pin:{user_id}'
+
+read_alias = ContextVar('read_alias', default=None)
+
+
+def apply_sqlite_pragmas(cursor, pragmas):
+    """Выполняет PRAGMA из словаря вида {'journal_mode': 'WAL', ...}."""
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Обработчик connection_created: применяет SQLITE_PRAGMAS.
+
+    WAL позволяет читателям работать параллельно с писателем, а
+    busy_timeout заставляет SQLite ждать освобождения блокировки вместо
+    немедленной ошибки "database is locked".
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        apply_sqlite_pragmas(cursor, settings.SQLITE_PRAGMAS)
+
+
+def is_locked_error(error):
+    return isinstance(error, OperationalError) and 'locked' in str(error)
+
+
+def retry_on_locked(func, *args, **kwargs):
+    """Выполняет запись в транзакции, повторяя её при блокировке БД.
+
+    Даже с busy_timeout SQLite сразу возвращает ошибку, если отложенная
+    транзакция не может повысить блокировку до записи, поэтому такие
+    транзакции повторяются с экспоненциальной задержкой.
+    """
+    attempts = settings.SQLITE_LOCK_RETRIES
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        except OperationalError as error:
+            if not is_locked_error(error) or attempt == attempts - 1:
+                raise
+            delay = settings.SQLITE_LOCK_BACKOFF * 2 ** attempt
+            time.sleep(delay + random.uniform(0, delay))
+
+
+def choose_read_alias(request):
+    """Выбирает БД для чтения в рамках запроса.
+
+    Безопасные запросы уходят на случайную реплику из DATABASE_REPLICAS,
+    если пользователь не делал записей последние REPLICA_LAG секунд:
+    иначе реплика могла ещё не получить его изменения.
+    """
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        return None
+    user = request.user
+    if user.is_authenticated and cache.get(
+        REPLICA_PIN_KEY.format(user_id=user.pk)
+    ):
+        return None
+    return random.choice(replicas)
+
+
+def pin_to_primary(user):
+    """Отправляет чтения пользователя на основную БД на время REPLICA_LAG."""
+    if user.is_authenticated and settings.DATABASE_REPLICAS:
+        cache.set(
+            REPLICA_PIN_KEY.format(user_id=user.pk), True,
+            timeout=settings.REPLICA_LAG
+        )
+
+
+class ReadReplicaRouter:
+    """Роутер, направляющий чтения на реплику, выбранную для запроса.
+
+    Записи и чтения вне ReplicaReadMixin всегда идут на основную БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,120 @@
+"""Поля сериализаторов."""
+import copy
+import threading
+
+from django.db import router
+from django.utils.encoding import smart_str
+from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.utils import html
+
+from reviews.query_cache import pending_tables, table_generations
+
+
+class SlugMap:
+    """Общий для процесса словарь slug -> объект модели-справочника.
+
+    Словарь сбрасывается, когда меняется поколение таблицы модели в кэше
+    запросов, то есть после любой записи в неё. Транзакция, которая уже
+    писала в таблицу, словарём не пользуется: её строки могут быть
+    откачены.
+    """
+
+    def __init__(self, model, slug_field='slug'):
+        self.model = model
+        self.slug_field = slug_field
+        self._lock = threading.Lock()
+        self._objects = {}
+        self._generation = None
+
+    def __deepcopy__(self, memo):
+        # DRF копирует аргументы полей для каждого сериализатора, а
+        # словарь должен быть общим.
+        return self
+
+    def _query(self, slugs):
+        return {
+            getattr(obj, self.slug_field): obj
+            for obj in self.model._default_manager.filter(
+                **{f'{self.slug_field}__in': slugs}
+            )
+        }
+
+    def resolve(self, slugs):
+        """Возвращает {slug: объект} для существующих slug'ов.
+
+        Отсутствующие в словаре slug'и загружаются одним запросом IN.
+        Объекты копируются, чтобы запросы не делили общие экземпляры.
+        """
+        slugs = set(slugs)
+        table = self.model._meta.db_table
+        if table in pending_tables(router.db_for_write(self.model)):
+            return self._query(slugs)
+        generation, = table_generations([table])
+        with self._lock:
+            if generation != self._generation:
+                self._objects, self._generation = {}, generation
+            found = {
+                slug: self._objects[slug]
+                for slug in slugs if slug in self._objects
+            }
+        missing = slugs - found.keys()
+        if missing:
+            loaded = self._query(missing)
+            with self._lock:
+                if generation == self._generation:
+                    self._objects.update(loaded)
+            found.update(loaded)
+        return {slug: copy.copy(obj) for slug, obj in found.items()}
+
+
+class CachedSlugRelatedField(serializers.Field):
+    """Аналог SlugRelatedField, разрешающий slug'и через SlugMap.
+
+    С many=True принимает список slug'ов и разрешает их одним запросом.
+    """
+
+    default_error_messages = {
+        **serializers.SlugRelatedField.default_error_messages,
+        **serializers.ManyRelatedField.default_error_messages,
+    }
+
+    def __init__(self, slug_map, many=False, **kwargs):
+        self.slug_map = slug_map
+        self.many = many
+        super().__init__(**kwargs)
+
+    def get_value(self, dictionary):
+        if self.many and html.is_html_input(dictionary):
+            if self.field_name not in dictionary:
+                if getattr(self.root, 'partial', False):
+                    return empty
+                return self.default_empty_html
+            return dictionary.getlist(self.field_name)
+        return super().get_value(dictionary)
+
+    def to_internal_value(self, data):
+        if not self.many:
+            return self._resolve([data])[0]
+        if isinstance(data, (str, bytes)) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        objects = {obj.pk: obj for obj in self._resolve(list(data))}
+        return list(objects.values())
+
+    def _resolve(self, slugs):
+        slugs = [smart_str(slug) for slug in slugs]
+        objects = self.slug_map.resolve(slugs)
+        for slug in slugs:
+            if slug not in objects:
+                self.fail(
+                    'does_not_exist', slug_name=self.slug_map.slug_field,
+                    value=slug
+                )
+        return [objects[slug] for slug in slugs]
+
+    def to_representation(self, value):
+        if self.many:
+            return [
+                getattr(obj, self.slug_map.slug_field) for obj in value.all()
+            ]
+        return getattr(value, self.slug_map.slug_field)
@@ -0,0 +1,202 @@
+"""Почтовый бэкенд, дописывающий письма в сегменты спула.
+
+Вместо отдельного файла на каждое письмо (filebased) письма дописываются
+в сегмент EMAIL_FILE_PATH/segment-<номер>.eml, а в индекс сегмента
+segment-<номер>.idx для каждого получателя добавляется строка
+"адрес<TAB>смещение<TAB>длина<TAB>время". Когда сегмент вырастает до
+MAIL_SPOOL_SEGMENT_BYTES, начинается следующий, а сегменты старше
+MAIL_SPOOL_RETENTION_DAYS дней удаляются. Запись идёт под flock файла
+блокировки, поэтому спул общий для всех воркеров узла.
+"""
+import email
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from email import policy
+
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+
+try:
+    import fcntl
+except ImportError:  # Windows: спул без межпроцессной блокировки.
+    fcntl = None
+
+
+SEGMENT = 'segment-{number:08d}'
+SEGMENT_FILE = re.compile(r'^segment-(\d{8})\.eml$')
+LOCK_FILE = 'spool.lock'
+CODE = re.compile(r'\b(\d{6})\b')
+
+
+def _directory(directory=None):
+    return os.path.abspath(directory or settings.EMAIL_FILE_PATH)
+
+
+def _path(directory, number, suffix):
+    return os.path.join(directory, SEGMENT.format(number=number) + suffix)
+
+
+def segments(directory=None):
+    """Номера сегментов спула по возрастанию."""
+    try:
+        names = os.listdir(_directory(directory))
+    except FileNotFoundError:
+        return []
+    return sorted(
+        int(match.group(1))
+        for match in map(SEGMENT_FILE.match, names) if match
+    )
+
+
+@contextmanager
+def _locked(directory):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), 'a') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _prune(directory, days):
+    cutoff = time.time() - days * 24 * 60 * 60
+    removed = 0
+    # Текущий сегмент не удаляется, даже если в него давно не писали.
+    for number in segments(directory)[:-1]:
+        path = _path(directory, number, '.eml')
+        try:
+            if os.path.getmtime(path) >= cutoff:
+                continue
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        try:
+            os.remove(_path(directory, number, '.idx'))
+        except FileNotFoundError:
+            pass
+        removed += 1
+    return removed
+
+
+def prune(directory=None, days=None):
+    """Удаляет сегменты старше days дней и возвращает их число."""
+    directory = _directory(directory)
+    if days is None:
+        days = settings.MAIL_SPOOL_RETENTION_DAYS
+    with _locked(directory):
+        return _prune(directory, days)
+
+
+class SpoolEmailBackend(BaseEmailBackend):
+    """Бэкенд Django, пишущий письма в спул (см. описание модуля)."""
+
+    def __init__(self, file_path=None, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently, **kwargs)
+        self.directory = _directory(file_path)
+        self._lock = threading.Lock()
+
+    def _segment(self):
+        numbers = segments(self.directory)
+        if not numbers:
+            return 1
+        number = numbers[-1]
+        if (
+            os.path.getsize(_path(self.directory, number, '.eml'))
+            < settings.MAIL_SPOOL_SEGMENT_BYTES
+        ):
+            return number
+        _prune(self.directory, settings.MAIL_SPOOL_RETENTION_DAYS)
+        return number + 1
+
+    def send_messages(self, email_messages):
+        records = [
+            (message.recipients(), message.message().as_bytes())
+            for message in email_messages if message.recipients()
+        ]
+        if not records:
+            return 0
+        try:
+            with self._lock, _locked(self.directory):
+                number = self._segment()
+                lines = []
+                with open(_path(self.directory, number, '.eml'), 'ab') as file:
+                    offset = file.seek(0, os.SEEK_END)
+                    for recipients, data in records:
+                        file.write(data + b'\n')
+                        lines.extend(
+                            f'{recipient.lower()}\t{offset}\t{len(data)}\t'
+                            f'{int(time.time())}\n'
+                            for recipient in recipients
+                        )
+                        offset += len(data) + 1
+                # Индекс дописывается после письма и не ссылается на
+                # недописанные байты.
+                with open(
+                    _path(self.directory, number, '.idx'), 'a',
+                    encoding='utf-8'
+                ) as index:
+                    index.write(''.join(lines))
+        except OSError:
+            if not self.fail_silently:
+                raise
+            return 0
+        return len(records)
+
+
+def _index_matches(directory, number, address, limit):
+    """(смещение, длина) последних писем адресату в сегменте."""
+    try:
+        with open(
+            _path(directory, number, '.idx'), encoding='utf-8'
+        ) as index:
+            lines = index.readlines()
+    except FileNotFoundError:
+        return []
+    matches = []
+    for line in reversed(lines):
+        fields = line.rstrip('\n').split('\t')
+        # Последняя строка может быть дописана не до конца.
+        if len(fields) == 4 and fields[0] == address:
+            matches.append((int(fields[1]), int(fields[2])))
+            if len(matches) == limit:
+                break
+    return matches
+
+
+def find(address, limit=1, directory=None):
+    """Последние письма адресату, от новых к старым."""
+    directory = _directory(directory)
+    address = address.lower()
+    found = []
+    for number in reversed(segments(directory)):
+        matches = _index_matches(
+            directory, number, address, limit - len(found)
+        )
+        if not matches:
+            continue
+        try:
+            with open(_path(directory, number, '.eml'), 'rb') as file:
+                for offset, length in matches:
+                    file.seek(offset)
+                    found.append(email.message_from_bytes(
+                        file.read(length), policy=policy.default
+                    ))
+        except FileNotFoundError:
+            continue
+        if len(found) >= limit:
+            break
+    return found
+
+
+def latest_code(address, directory=None):
+    """Код подтверждения из последнего письма адресату или None.
+
+    Нужен тестам и локальной разработке, где письма не уходят наружу.
+    """
+    messages = find(address, directory=directory)
+    if not messages:
+        return None
+    match = CODE.search(messages[0].get_body(('plain',)).get_content())
+    return int(match.group(1)) if match else None
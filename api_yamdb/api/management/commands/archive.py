@@ -0,0 +1,35 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.archive import archive
+
+
+class Command(BaseCommand):
+    help = 'Перенос старых отзывов и комментариев в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Возраст строк в днях; по умолчанию ARCHIVE_AFTER_DAYS.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять с паузой в секундах; 0 - выполнить один раз.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            cutoff = None
+            if options['days'] is not None:
+                cutoff = timezone.now() - timedelta(days=options['days'])
+            result = archive(cutoff)
+            self.stdout.write(
+                f'Перенесено в архив отзывов: {result["reviews"]}, '
+                f'комментариев: {result["comments"]}'
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
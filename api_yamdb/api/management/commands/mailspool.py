@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.mail_spool import find, latest_code, prune
+
+
+class Command(BaseCommand):
+    help = 'Поиск писем адресату в почтовом спуле и очистка старых сегментов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('address', nargs='?', help='Адрес получателя.')
+        parser.add_argument(
+            '--limit', type=int, default=1,
+            help='Сколько последних писем показать.'
+        )
+        parser.add_argument(
+            '--code', action='store_true',
+            help='Показать только код подтверждения из последнего письма.'
+        )
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='Удалить сегменты старше MAIL_SPOOL_RETENTION_DAYS дней.'
+        )
+
+    def handle(self, *args, **options):
+        if options['prune']:
+            self.stdout.write(f'Удалено сегментов: {prune()}')
+        address = options['address']
+        if not address:
+            if not options['prune']:
+                raise CommandError('Укажите адрес или --prune.')
+            return
+        if options['code']:
+            code = latest_code(address)
+            if code is None:
+                raise CommandError(f'Код для {address} не найден.')
+            self.stdout.write(str(code))
+            return
+        messages = find(address, limit=options['limit'])
+        if not messages:
+            raise CommandError(f'Писем для {address} не найдено.')
+        for message in messages:
+            self.stdout.write(message.as_string())
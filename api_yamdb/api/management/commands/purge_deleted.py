@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.purge import purge_deleted
+
+
+class Command(BaseCommand):
+    help = 'Удаление помеченных объектов и их зависимых строк пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять с паузой в секундах; 0 - выполнить один раз.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            purged = purge_deleted()
+            self.stdout.write(f'Удалено помеченных объектов: {purged}')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
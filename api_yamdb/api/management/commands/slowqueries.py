@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.slow_queries import fingerprint, read_entries
+
+
+class Command(BaseCommand):
+    help = 'Сводка журнала медленных запросов по нормализованному SQL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log', default=settings.SLOW_QUERY_LOG,
+            help='Путь к журналу медленных запросов.'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Сколько самых затратных запросов показать.'
+        )
+
+    def handle(self, *args, **options):
+        groups = {}
+        for entry in read_entries(options['log']):
+            group = groups.setdefault(fingerprint(entry['sql']), {
+                'count': 0, 'total': 0.0, 'max': 0.0,
+                'views': set(), 'plan': None,
+            })
+            group['count'] += 1
+            group['total'] += entry['duration_ms']
+            group['max'] = max(group['max'], entry['duration_ms'])
+            group['views'].add(f'{entry["view"]}.{entry["action"]}')
+            group['plan'] = entry.get('plan') or group['plan']
+
+        if not groups:
+            self.stdout.write('Медленных запросов не найдено.')
+            return
+        ranked = sorted(
+            groups.items(), key=lambda item: item[1]['total'], reverse=True
+        )
+        for statement, group in ranked[:options['limit']]:
+            self.stdout.write(self.style.WARNING(
+                f'{group["count"]} раз, всего {group["total"]:.1f} мс, '
+                f'в среднем {group["total"] / group["count"]:.1f} мс, '
+                f'максимум {group["max"]:.1f} мс'
+            ))
+            self.stdout.write(f'  {statement}')
+            self.stdout.write(f'  views: {", ".join(sorted(group["views"]))}')
+            for line in group['plan'] or ():
+                self.stdout.write(f'  plan: {line}')
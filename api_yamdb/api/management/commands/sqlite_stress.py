@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.db import apply_sqlite_pragmas
+
+
+SCHEMA = (
+    'CREATE TABLE review ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'title_id INTEGER NOT NULL, score INTEGER NOT NULL, text TEXT NOT NULL)'
+)
+
+
+class Worker(threading.Thread):
+    """Поток, выполняющий чтения или записи до истечения времени."""
+
+    def __init__(self, path, pragmas, deadline, writer):
+        super().__init__(daemon=True)
+        self.path = path
+        self.pragmas = pragmas
+        self.deadline = deadline
+        self.writer = writer
+        self.done = 0
+        self.errors = 0
+
+    def run(self):
+        connection = sqlite3.connect(
+            self.path, timeout=0, isolation_level=None,
+            check_same_thread=False
+        )
+        apply_sqlite_pragmas(connection.cursor(), self.pragmas)
+        while time.monotonic() < self.deadline:
+            try:
+                if self.writer:
+                    self.write(connection)
+                else:
+                    self.read(connection)
+                self.done += 1
+            except sqlite3.OperationalError:
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+                self.errors += 1
+        connection.close()
+
+    def write(self, connection):
+        # Отложенная транзакция, как её открывает Django.
+        connection.execute('BEGIN')
+        connection.execute(
+            'INSERT INTO review (title_id, score, text) VALUES (?, ?, ?)',
+            (self.done % 100, 7, 'stress' * 20)
+        )
+        connection.execute('COMMIT')
+
+    def read(self, connection):
+        connection.execute(
+            'SELECT title_id, AVG(score) FROM review '
+            'WHERE title_id = ? GROUP BY title_id', (self.done % 100,)
+        ).fetchall()
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочная проверка SQLite: пропускная способность читателей и '
+        'писателей с настройками по умолчанию и с SQLITE_PRAGMAS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--duration', type=float, default=3,
+            help='Длительность каждого прогона в секундах.'
+        )
+
+    def run_mode(self, pragmas, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stress.sqlite3')
+            connection = sqlite3.connect(path)
+            apply_sqlite_pragmas(connection.cursor(), pragmas)
+            connection.execute(SCHEMA)
+            connection.commit()
+            connection.close()
+
+            deadline = time.monotonic() + options['duration']
+            workers = [
+                Worker(path, pragmas, deadline, writer=False)
+                for _ in range(options['readers'])
+            ] + [
+                Worker(path, pragmas, deadline, writer=True)
+                for _ in range(options['writers'])
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        result = {'reads': 0, 'writes': 0, 'errors': 0}
+        for worker in workers:
+            result['writes' if worker.writer else 'reads'] += worker.done
+            result['errors'] += worker.errors
+        return result
+
+    def handle(self, *args, **options):
+        modes = (
+            ('default', {'busy_timeout': 0}),
+            ('tuned', settings.SQLITE_PRAGMAS),
+        )
+        for name, pragmas in modes:
+            result = self.run_mode(pragmas, options)
+            duration = options['duration']
+            self.stdout.write(
+                f'{name}: {result["reads"] / duration:.0f} чтений/с, '
+                f'{result["writes"] / duration:.0f} записей/с, '
+                f'ошибок блокировки: {result["errors"]}'
+            )
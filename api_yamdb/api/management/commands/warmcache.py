@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.warmup import collect_paths, warm
+
+
+class Command(BaseCommand):
+    help = 'Прогрев кэшей популярными страницами каталога и отзывов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file', help='Файл частот обращений. По умолчанию '
+                           'WARMCACHE_FILE или встроенный набор страниц.'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=settings.WARMCACHE_LIMIT
+        )
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=settings.WARMCACHE_CONCURRENCY
+        )
+
+    def handle(self, *args, **options):
+        paths = collect_paths(options['limit'], options['file'])
+        succeeded, failed, seconds = warm(paths, options['concurrency'])
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(
+            f'Прогрето адресов: {succeeded} за {seconds:.2f} с, '
+            f'ошибок: {failed}'
+        ))
@@ -0,0 +1,179 @@
+"""Метрики приложения в формате Prometheus.
+
+Значения копятся в памяти процесса и раз в METRICS_FLUSH_INTERVAL секунд
+сливаются в общий файл METRICS_FILE. Запись в файл идёт под flock, поэтому
+один scrape /metrics видит суммарные значения всех воркеров узла.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: файл общий, но без блокировки.
+    fcntl = None
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152)
+
+FAMILIES = {
+    'yamdb_requests_total': (
+        'counter', 'Количество запросов по view и action.'),
+    'yamdb_request_duration_seconds': (
+        'histogram', 'Время обработки запроса.'),
+    'yamdb_sql_queries_per_request': (
+        'histogram', 'Количество SQL-запросов на один HTTP-запрос.'),
+    'yamdb_sql_duration_seconds': (
+        'histogram', 'Суммарное время SQL-запросов на один HTTP-запрос.'),
+    'yamdb_response_size_bytes': (
+        'histogram', 'Размер тела ответа.'),
+    'yamdb_email_send_total': (
+        'counter', 'Результаты отправки писем с кодом подтверждения.'),
+    'yamdb_coalesced_requests_total': (
+        'counter', 'Запросы на чтение по роли в склейке: leader - '
+                   'выполнил обработку, follower - получил чужой ответ, '
+                   'own - не дождался и выполнил сам.'),
+}
+
+
+_muted = ContextVar('metrics_muted', default=False)
+
+
+@contextmanager
+def muted():
+    """Не учитывает в метриках служебные запросы, например прогрев."""
+    token = _muted.set(True)
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', r'\\').replace('"', r'\"')
+        .replace('\n', r'\n')
+    )
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return '{' + pairs + '}'
+
+
+def _format_le(bound):
+    return str(float(bound)) if bound != int(bound) else str(int(bound))
+
+
+class Registry:
+    """Реестр аддитивных серий с периодическим сбросом в общий файл.
+
+    Все серии (в том числе корзины гистограмм) хранятся как счётчики,
+    поэтому объединение данных разных процессов сводится к сложению.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def _add(self, family, sample, labels, value):
+        if _muted.get():
+            return
+        key = f'{family}\t{sample}{_labels(labels)}'
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + value
+
+    def inc(self, family, value=1, **labels):
+        self._add(family, family, sorted(labels.items()), value)
+
+    def observe(self, family, value, buckets, **labels):
+        labels = sorted(labels.items())
+        for bound in buckets:
+            if value <= bound:
+                self._add(
+                    family, f'{family}_bucket',
+                    labels + [('le', _format_le(bound))], 1
+                )
+        self._add(family, f'{family}_bucket', labels + [('le', '+Inf')], 1)
+        self._add(family, f'{family}_sum', labels, value)
+        self._add(family, f'{family}_count', labels, 1)
+
+    def maybe_flush(self):
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1)
+        if time.monotonic() - self._last_flush >= interval:
+            self.flush()
+
+    def flush(self):
+        """Прибавляет накопленные значения к общему файлу."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return self._read()
+        path = settings.METRICS_FILE
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'a+', encoding='utf-8') as file:
+            if fcntl:
+                fcntl.flock(file, fcntl.LOCK_EX)
+            file.seek(0)
+            content = file.read()
+            totals = json.loads(content) if content else {}
+            for key, value in pending.items():
+                totals[key] = totals.get(key, 0) + value
+            file.seek(0)
+            file.truncate()
+            json.dump(totals, file, ensure_ascii=False)
+        return totals
+
+    def _read(self):
+        try:
+            with open(settings.METRICS_FILE, encoding='utf-8') as file:
+                if fcntl:
+                    fcntl.flock(file, fcntl.LOCK_SH)
+                content = file.read()
+        except FileNotFoundError:
+            return {}
+        return json.loads(content) if content else {}
+
+    def render(self):
+        """Возвращает суммарные значения узла в text-формате Prometheus."""
+        totals = self.flush()
+        samples = {}
+        for key, value in totals.items():
+            family, sample = key.split('\t', 1)
+            samples.setdefault(family, []).append((sample, value))
+        lines = []
+        for family, (kind, help_text) in FAMILIES.items():
+            lines.append(f'# HELP {family} {help_text}')
+            lines.append(f'# TYPE {family} {kind}')
+            for sample, value in sorted(samples.get(family, ())):
+                lines.append(f'{sample} {value!r}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+
+def view_labels(view_func, method):
+    """Возвращает пару (view, action) для функции, полученной из as_view().
+
+    Для ViewSet'ов action берётся из карты методов роутера, для прочих
+    представлений используется HTTP-метод.
+    """
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return view_func.__name__, method.lower()
+    actions = getattr(view_func, 'actions', None) or {}
+    return view_class.__name__, actions.get(method.lower(), method.lower())
@@ -0,0 +1,127 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import slow_queries, timing
+from .metrics import (LATENCY_BUCKETS, SIZE_BUCKETS, SQL_COUNT_BUCKETS,
+                      registry, view_labels)
+
+
+def wrap_connections(wrapper):
+    """Подключает execute wrapper ко всем соединениям с БД."""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+    return stack
+
+
+class QueryCounter:
+    """Execute wrapper, считающий количество и время SQL-запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """Собирает метрики запросов для эндпоинта /metrics."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.metrics_view = ('unresolved', request.method.lower())
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with wrap_connections(queries):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view, action = request.metrics_view
+        registry.inc(
+            'yamdb_requests_total', view=view, action=action,
+            method=request.method, status=response.status_code
+        )
+        registry.observe(
+            'yamdb_request_duration_seconds', duration, LATENCY_BUCKETS,
+            view=view, action=action
+        )
+        registry.observe(
+            'yamdb_sql_queries_per_request', queries.count,
+            SQL_COUNT_BUCKETS, view=view, action=action
+        )
+        registry.observe(
+            'yamdb_sql_duration_seconds', queries.duration, LATENCY_BUCKETS,
+            view=view, action=action
+        )
+        if not response.streaming:
+            registry.observe(
+                'yamdb_response_size_bytes', len(response.content),
+                SIZE_BUCKETS, view=view, action=action
+            )
+        registry.maybe_flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = view_labels(view_func, request.method)
+
+
+class ServerTimingMiddleware:
+    """Добавляет к ответу заголовок Server-Timing.
+
+    Включается настройкой SERVER_TIMING. Фазы perm, serialize и render
+    замеряются хуками DRF, время БД и число запросов - execute wrapper'ом.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'SERVER_TIMING', False):
+            return self.get_response(request)
+        queries = QueryCounter()
+        start = time.perf_counter()
+        spent = timing.ServerTiming()
+        with wrap_connections(queries), timing.activate(spent):
+            response = self.get_response(request)
+        response['Server-Timing'] = spent.header(
+            queries.count, queries.duration, time.perf_counter() - start
+        )
+        return response
+
+
+class SlowQueryLogMiddleware:
+    """Пишет в журнал медленные SQL-запросы с привязкой к view и action.
+
+    Отключается настройкой SLOW_QUERY_LOG = None.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'SLOW_QUERY_LOG', None):
+            return self.get_response(request)
+        token = slow_queries.current_view.set(
+            ('unresolved', request.method.lower())
+        )
+        try:
+            with wrap_connections(slow_queries.logger):
+                return self.get_response(request)
+        finally:
+            slow_queries.current_view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        slow_queries.current_view.set(
+            view_labels(view_func, request.method)
+        )
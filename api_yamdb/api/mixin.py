@@ -1,4 +1,14 @@
-from rest_framework import mixins
+from string import Formatter
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework import mixins, permissions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from . import archive, caching, coalescing, db, purge, timing
+from .metrics import registry
 
 
 class CreateListDestroyMixin(mixins.CreateModelMixin,
@@ -6,3 +16,188 @@ class CreateListDestroyMixin(mixins.CreateModelMixin,
                              mixins.DestroyModelMixin):
     "Кастомный миксин класс."
     pass
+
+
+class ServerTimingMixin:
+    """Замеряет проверки прав доступа для заголовка Server-Timing."""
+
+    def check_permissions(self, request):
+        with timing.phase('perm'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with timing.phase('perm'):
+            super().check_object_permissions(request, obj)
+
+
+class LockRetryMixin:
+    """Повторяет записи при ошибке SQLite "database is locked".
+
+    Повторяется обработчик целиком, вместе с валидацией: при повторе
+    сериализатор создаётся заново.
+    """
+
+    def create(self, request, *args, **kwargs):
+        return db.retry_on_locked(super().create, request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        return db.retry_on_locked(super().update, request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        return db.retry_on_locked(super().destroy, request, *args, **kwargs)
+
+
+class ReplicaReadMixin:
+    """Выполняет безопасные запросы на реплике БД.
+
+    После успешной записи пользователь на время REPLICA_LAG закрепляется
+    за основной БД, чтобы сразу видеть свои изменения.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = db.read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            db.read_alias.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        db.read_alias.set(db.choose_read_alias(request))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (
+            request.method not in permissions.SAFE_METHODS
+            and response.status_code < 400
+        ):
+            db.pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class CoalescingMixin:
+    """Склеивает одинаковые одновременные запросы на чтение.
+
+    Анонимные запросы с одинаковыми путём, параметрами и Accept ждут
+    ответа первого из них не дольше REQUEST_COALESCING_TIMEOUT секунд.
+    Реплику для них выбирает ведущий запрос: анонимные чтения не
+    закрепляются за основной БД, и любая реплика им подходит.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if (
+            request.method not in permissions.SAFE_METHODS
+            or not settings.REQUEST_COALESCING
+            or not coalescing.is_anonymous(request)
+        ):
+            return super().dispatch(request, *args, **kwargs)
+        dispatch = super().dispatch
+        own = []
+
+        def compute():
+            response = dispatch(request, *args, **kwargs)
+            own.append(response)
+            if response.streaming or not 200 <= response.status_code < 300:
+                return None
+            if hasattr(response, 'render'):
+                response.render()
+            return coalescing.ResponseSnapshot(response)
+
+        snapshot, role = coalescing.flights.do(
+            coalescing.request_key(request), compute,
+            settings.REQUEST_COALESCING_TIMEOUT
+        )
+        registry.inc(
+            'yamdb_coalesced_requests_total', view=type(self).__name__,
+            action=self.action_map.get(request.method.lower()), role=role
+        )
+        return own[0] if own else snapshot.to_response()
+
+
+class GenerationPageCacheMixin:
+    """Кэширует JSON страниц списка до изменения родительского объекта.
+
+    page_generation_key - шаблон ключа счётчика поколений, который
+    увеличивается при любой записи в список; поля шаблона заполняются
+    параметрами URL. Пока поколение не изменилось, страница отдаётся из
+    кэша без запросов к БД. Без шаблона список не кэшируется.
+    """
+
+    page_generation_key = None
+
+    def list(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if (
+            self.page_generation_key is None
+            or not isinstance(renderer, JSONRenderer)
+        ):
+            return super().list(request, *args, **kwargs)
+        paginator = self.paginator
+        params = {
+            name: request.query_params[name]
+            for name in (
+                getattr(paginator, 'limit_query_param', None),
+                getattr(paginator, 'offset_query_param', None),
+                getattr(paginator, 'page_query_param', None),
+            )
+            if name in request.query_params
+        }
+
+        def render():
+            response = super(GenerationPageCacheMixin, self).list(
+                request, *args, **kwargs
+            )
+            if response.status_code != 200:
+                return None
+            return renderer.render(response.data)
+
+        # Берутся только поля шаблона: в kwargs бывает и format из
+        # суффикса .json. Поля - id, "05" и "5" должны давать один ключ.
+        generation_key = self.page_generation_key.format(**{
+            name: int(self.kwargs[name])
+            for _, name, _, _ in Formatter().parse(self.page_generation_key)
+            if name
+        })
+        content = caching.cached_page(
+            generation_key, request.path, params, render,
+            alias=db.read_alias.get()
+        )
+        return HttpResponse(content, content_type=renderer.media_type)
+
+
+class DeferredDeleteMixin:
+    """Удаляет объекты с большим каскадом в фоне (см. api.purge)."""
+
+    def perform_destroy(self, instance):
+        purge.delete(instance)
+
+
+class ArchiveFallThroughMixin:
+    """Продолжает список и чтение объектов архивом (см. api.archive).
+
+    Наследник определяет метод archive_queryset(), возвращающий архивные
+    строки того же списка. Архивные объекты можно только читать.
+    """
+
+    def list(self, request, *args, **kwargs):
+        rows = archive.HotThenArchive(
+            self.filter_queryset(self.get_queryset()),
+            self.archive_queryset()
+        )
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(self.get_serializer(list(rows), many=True).data)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            if self.request.method not in permissions.SAFE_METHODS:
+                raise
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = get_object_or_404(
+            self.archive_queryset(), pk=self.kwargs[lookup_url_kwarg]
+        )
+        self.check_object_permissions(self.request, obj)
+        return obj
@@ -0,0 +1,345 @@
+"""Кэш в общем отображаемом в память файле.
+
+Все воркеры узла видят одни и те же записи и инвалидации, поэтому
+страницы не дублируются в памяти каждого процесса, как в LocMemCache.
+
+Файл состоит из заголовка и массива слотов фиксированного размера.
+Слоты сгруппированы в наборы по WAYS штук: ключ может лежать только в
+своём наборе, а при переполнении набора вытесняется запись по алгоритму
+CLOCK (бит обращения сбрасывается при проходе стрелки).
+
+Запись идёт под блокировкой файла, чтение - без блокировок: у каждого
+слота есть счётчик seq, нечётный во время записи (seqlock). Значение
+распаковывается прямо из отображения, а затем seq проверяется повторно.
+Байтовые значения при чтении копируются один раз: после проверки seq
+слот может быть перезаписан, и ссылка на отображение вернула бы чужие
+или недописанные байты.
+
+clear() атомарно увеличивает поколение в заголовке, и все записи
+прежнего поколения сразу становятся недействительными во всех процессах.
+Файл с другими размерами не усекается, а подменяется новым.
+"""
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка только внутри процесса.
+    fcntl = None
+
+
+MAGIC = b'YMDBCACH'
+HEADER = struct.Struct('<8sIIQ')
+SLOT_HEADER = struct.Struct('<IQ16sdBBI')
+SEQ = struct.Struct('<I')
+GENERATION_OFFSET = 16
+HEADER_SIZE = 64
+WAYS = 8
+
+# Смещения полей внутри заголовка слота.
+DIGEST_OFFSET = 12
+EXPIRES_OFFSET = 28
+REF_OFFSET = 36
+FLAGS_OFFSET = 37
+
+EMPTY, PICKLED, RAW = 0, 1, 2
+
+
+class MmapCache(BaseCache):
+    """Django cache backend поверх общего mmap-файла.
+
+    LOCATION - путь к файлу. OPTIONS: SLOTS - число слотов (кратно WAYS),
+    SLOT_SIZE - размер слота в байтах; значения, не помещающиеся в слот,
+    не кэшируются.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = str(location)
+        self._slot_size = int(options.get('SLOT_SIZE', 32 * 1024))
+        slots = int(options.get('SLOTS', 2048))
+        self._slots = max(WAYS, slots // WAYS * WAYS)
+        self._capacity = self._slot_size - SLOT_HEADER.size
+        self._lock = threading.RLock()
+        self._pid = None
+        self._file = None
+        self._map = None
+
+    # Файл и блокировки
+
+    def _mapping(self):
+        if self._pid == os.getpid():
+            return self._map
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+        return self._map
+
+    def _open(self):
+        size = HEADER_SIZE + self._slots * self._slot_size
+        os.makedirs(os.path.dirname(os.path.abspath(self._path)),
+                    exist_ok=True)
+        file = self._locked_file()
+        try:
+            header = file.read(HEADER.size)
+            valid = (
+                len(header) == HEADER.size
+                and HEADER.unpack(header)[:3] == (
+                    MAGIC, self._slots, self._slot_size)
+            )
+            if not valid and header.strip(b'\0'):
+                # Файл с другими SLOTS или SLOT_SIZE могут читать другие
+                # процессы: усечение уронило бы их чтения (SIGBUS). Новый
+                # файл подменяет старый атомарно, а процессы со старым
+                # отображением дорабатывают на нём.
+                file = self._replace(file, size)
+            elif not valid:
+                self._initialize(file, size)
+        finally:
+            if fcntl:
+                fcntl.lockf(file, fcntl.LOCK_UN)
+        self._file = file
+        self._map = mmap.mmap(file.fileno(), size)
+        self._pid = os.getpid()
+
+    def _locked_file(self):
+        """Открывает файл под блокировкой, дождавшись его подмены."""
+        while True:
+            file = os.fdopen(
+                os.open(self._path, os.O_RDWR | os.O_CREAT), 'r+b'
+            )
+            if not fcntl:
+                return file
+            fcntl.lockf(file, fcntl.LOCK_EX)
+            try:
+                current = os.stat(self._path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current == os.fstat(file.fileno()).st_ino:
+                return file
+            file.close()
+
+    def _initialize(self, file, size):
+        # Файл пуст или не дописан: отобразить его никто не успел.
+        file.truncate(0)
+        file.truncate(size)
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, self._slots, self._slot_size, 1))
+        file.flush()
+
+    def _replace(self, file, size):
+        temporary = f'{self._path}.{os.getpid()}.tmp'
+        new = open(temporary, 'w+b')
+        self._initialize(new, size)
+        os.replace(temporary, self._path)
+        file.close()
+        return new
+
+    @contextmanager
+    def _write_lock(self):
+        self._mapping()
+        with self._lock:
+            if fcntl:
+                fcntl.lockf(self._file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.lockf(self._file, fcntl.LOCK_UN)
+
+    # Слоты
+
+    def _generation(self, mm):
+        return struct.unpack_from('<Q', mm, GENERATION_OFFSET)[0]
+
+    def _offset(self, index):
+        return HEADER_SIZE + index * self._slot_size
+
+    def _set_slots(self, digest):
+        first = int.from_bytes(digest[:8], 'little') % (self._slots // WAYS)
+        return range(first * WAYS, first * WAYS + WAYS)
+
+    def _digest(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+    def _is_live(self, slot, generation, now):
+        _, slot_generation, _, expires, _, flags, _ = slot
+        return (
+            flags != EMPTY and slot_generation == generation
+            and (not expires or expires > now)
+        )
+
+    def _find(self, mm, digest, now):
+        generation = self._generation(mm)
+        for index in self._set_slots(digest):
+            slot = SLOT_HEADER.unpack_from(mm, self._offset(index))
+            if slot[2] == digest and self._is_live(slot, generation, now):
+                return index, slot
+        return None, None
+
+    def _read(self, digest):
+        """Читает значение без блокировки; None, если ключа нет."""
+        mm = self._mapping()
+        for _ in range(5):
+            index, slot = self._find(mm, digest, time.time())
+            if index is None:
+                return None
+            offset = self._offset(index)
+            seq, flags, length = slot[0], slot[5], slot[6]
+            if seq % 2:
+                continue
+            start = offset + SLOT_HEADER.size
+            view = memoryview(mm)[start:start + length]
+            try:
+                value = (
+                    pickle.loads(view) if flags == PICKLED else bytes(view)
+                )
+            except Exception:
+                value = None
+            finally:
+                view.release()
+            if SEQ.unpack_from(mm, offset)[0] == seq:
+                mm[offset + REF_OFFSET] = 1
+                return (value,)
+        return None
+
+    def _victim(self, mm, digest, now):
+        """Выбирает слот для записи: свой, свободный или по CLOCK."""
+        generation = self._generation(mm)
+        candidates = list(self._set_slots(digest))
+        for index in candidates:
+            slot = SLOT_HEADER.unpack_from(mm, self._offset(index))
+            if slot[2] == digest or not self._is_live(slot, generation, now):
+                return index
+        for _ in range(2):
+            for index in candidates:
+                ref = self._offset(index) + REF_OFFSET
+                if not mm[ref]:
+                    return index
+                mm[ref] = 0
+        return candidates[0]
+
+    def _store(self, mm, index, digest, value, expires):
+        if isinstance(value, bytes):
+            flags, payload = RAW, value
+        else:
+            flags = PICKLED
+            payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        offset = self._offset(index)
+        if len(payload) > self._capacity:
+            # Старое значение того же ключа устарело и тоже удаляется.
+            digest_at = offset + DIGEST_OFFSET
+            if mm[digest_at:digest_at + len(digest)] == digest:
+                self._clear_slot(mm, index)
+            return False
+        seq = SEQ.unpack_from(mm, offset)[0]
+        SEQ.pack_into(mm, offset, seq + 1)
+        start = offset + SLOT_HEADER.size
+        mm[start:start + len(payload)] = payload
+        SLOT_HEADER.pack_into(
+            mm, offset, seq + 1, self._generation(mm), digest,
+            expires or 0.0, 1, flags, len(payload)
+        )
+        SEQ.pack_into(mm, offset, seq + 2)
+        return True
+
+    def _clear_slot(self, mm, index):
+        offset = self._offset(index)
+        seq = SEQ.unpack_from(mm, offset)[0]
+        SEQ.pack_into(mm, offset, seq + 1)
+        mm[offset + FLAGS_OFFSET] = EMPTY
+        SEQ.pack_into(mm, offset, seq + 2)
+
+    def _set(self, digest, value, timeout, only_if_missing=False):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        with self._write_lock():
+            mm = self._map
+            if only_if_missing and self._find(mm, digest, now)[0] is not None:
+                return False
+            index = self._victim(mm, digest, now)
+            if expires is not None and expires <= now:
+                self._clear_slot(mm, index)
+                return False
+            return self._store(mm, index, digest, value, expires)
+
+    # API кэша Django
+
+    def get(self, key, default=None, version=None):
+        found = self._read(self._digest(key, version))
+        return default if found is None else found[0]
+
+    def get_many(self, keys, version=None):
+        result = {}
+        for key in keys:
+            found = self._read(self._digest(key, version))
+            if found is not None:
+                result[key] = found[0]
+        return result
+
+    def has_key(self, key, version=None):
+        return self._read(self._digest(key, version)) is not None
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set(self._digest(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._set(
+            self._digest(key, version), value, timeout, only_if_missing=True
+        )
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        digest = self._digest(key, version)
+        with self._write_lock():
+            index, _ = self._find(self._map, digest, time.time())
+            if index is None:
+                return False
+            offset = self._offset(index)
+            struct.pack_into(
+                '<d', self._map, offset + EXPIRES_OFFSET,
+                self.get_backend_timeout(timeout) or 0.0
+            )
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно для всех процессов увеличивает числовое значение."""
+        digest = self._digest(key, version)
+        with self._write_lock():
+            mm = self._map
+            index, slot = self._find(mm, digest, time.time())
+            found = index is not None and self._read(digest)
+            if not found:
+                raise ValueError(f"Key '{key}' not found")
+            value = found[0] + delta
+            self._store(mm, index, digest, value, slot[3])
+            return value
+
+    def delete(self, key, version=None):
+        digest = self._digest(key, version)
+        with self._write_lock():
+            index, _ = self._find(self._map, digest, time.time())
+            if index is None:
+                return False
+            self._clear_slot(self._map, index)
+            return True
+
+    def clear(self):
+        with self._write_lock():
+            generation = self._generation(self._map)
+            struct.pack_into('<Q', self._map, GENERATION_OFFSET,
+                             generation + 1)
+
+    def close(self, **kwargs):
+        # Отображение живёт всё время жизни процесса и переиспользуется.
+        pass
@@ -0,0 +1,215 @@
+"""Массовая модерация отзывов и комментариев.
+
+Отзывы и комментарии выбираются по автору или по парам (произведение, id)
+и удаляются или скрываются пачками по MODERATION_CHUNK строк: на пачку
+приходится одна выборка id и по одному UPDATE или DELETE на таблицу в
+отдельной транзакции шарда, поэтому блокировка записи держится недолго
+при любом числе строк. Записи идут мимо сигналов ORM, и кэш страниц
+сбрасывается один раз на каждое затронутое произведение и отзыв.
+Архивные отзывы и комментарии (см. api.archive) обрабатываются так же.
+
+В запросе выполняется не больше MODERATION_INLINE_CHUNKS пачек, остальное
+доделывает фоновый поток. Повтор задания идемпотентен: удалённые строки
+и строки с уже нужным is_hidden в выборку не попадают, поэтому новое
+задание продолжает с места остановки. Очереди на диске нет: если процесс
+завершится раньше потока, тот же запрос модерации нужно повторить.
+"""
+import logging
+import threading
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+
+from . import caching, db
+from reviews.models import ArchivedComment, ArchivedReview, Comments, Review
+from reviews.sharding import group_by_shard, on_shard, shard_for, shards
+
+logger = logging.getLogger(__name__)
+
+# Архивные комментарии ссылаются на отзывы обеих таблиц по id.
+COMMENT_MODELS = (Comments, ArchivedComment)
+
+DELETE = 'delete'
+HIDE = 'hide'
+UNHIDE = 'unhide'
+ACTIONS = (DELETE, HIDE, UNHIDE)
+
+
+class Moderation:
+    """Применяет действие к наборам отзывов и комментариев на шардах.
+
+    chunks - сколько пачек можно записать, None - без ограничения. Когда
+    бюджет кончился, а строки остались, done становится False.
+    """
+
+    def __init__(self, action, chunks=None):
+        self.action = action
+        self.chunks = chunks
+        self.done = True
+        self.reviews = 0
+        self.comments = 0
+        self.titles = set()
+        self.review_ids = set()
+
+    def _pending(self, queryset):
+        # Скрытые строки выпадают из выборки, поэтому цикл по пачкам
+        # заканчивается сам, как и при удалении.
+        if self.action == HIDE:
+            return queryset.filter(is_hidden=False)
+        if self.action == UNHIDE:
+            return queryset.filter(is_hidden=True)
+        return queryset
+
+    def _chunks(self, queryset, fields):
+        pending = self._pending(queryset)
+        while True:
+            rows = list(
+                pending.order_by('pk').values_list('pk', *fields)[
+                    :settings.MODERATION_CHUNK
+                ]
+            )
+            if not rows:
+                return
+            if self.chunks is not None:
+                if not self.chunks:
+                    self.done = False
+                    return
+                self.chunks -= 1
+            yield rows
+
+    def _write(self, shard, queryset):
+        with transaction.atomic(using=shard):
+            if self.action == DELETE:
+                return queryset._raw_delete(shard)
+            return queryset.update(is_hidden=self.action == HIDE)
+
+    def apply_reviews(self, shard, queryset):
+        model = queryset.model
+        for rows in self._chunks(queryset, ('title_id',)):
+            ids = [pk for pk, _ in rows]
+            if self.action == DELETE:
+                # Комментарии лежат на шарде своего отзыва.
+                for comments in COMMENT_MODELS:
+                    self.comments += db.retry_on_locked(
+                        self._write, shard,
+                        on_shard(comments.objects, shard).filter(
+                            review_id__in=ids
+                        )
+                    )
+            self.reviews += db.retry_on_locked(
+                self._write, shard,
+                on_shard(model.objects, shard).filter(pk__in=ids)
+            )
+            self.titles.update(title_id for _, title_id in rows)
+            self.review_ids.update(ids)
+
+    def apply_comments(self, shard, queryset):
+        model = queryset.model
+        for rows in self._chunks(queryset, ('review_id',)):
+            self.comments += db.retry_on_locked(
+                self._write, shard,
+                on_shard(model.objects, shard).filter(
+                    pk__in=[pk for pk, _ in rows]
+                )
+            )
+            self.review_ids.update(review_id for _, review_id in rows)
+
+    def by_author(self, author_id):
+        for shard in shards():
+            for model in (Review, ArchivedReview):
+                self.apply_reviews(shard, on_shard(
+                    model.objects, shard
+                ).filter(author_id=author_id))
+            for model in COMMENT_MODELS:
+                self.apply_comments(shard, on_shard(
+                    model.objects, shard
+                ).filter(author_id=author_id))
+
+    def by_ids(self, reviews, comments):
+        """Принимает списки пар (id произведения, id объекта)."""
+        for targets, model, title_field, apply in (
+            (reviews, Review, 'title_id', self.apply_reviews),
+            (reviews, ArchivedReview, 'title_id', self.apply_reviews),
+            (comments, Comments, 'review__title_id', self.apply_comments),
+            (comments, ArchivedComment, 'title_id', self.apply_comments),
+        ):
+            by_title = {}
+            for title_id, pk in targets:
+                by_title.setdefault(title_id, set()).add(pk)
+            for shard, title_ids in group_by_shard(by_title).items():
+                condition = reduce(or_, (
+                    Q(**{title_field: title_id, 'pk__in': by_title[title_id]})
+                    for title_id in title_ids
+                ))
+                apply(shard, on_shard(model.objects, shard).filter(condition))
+
+    def run(self, author_id=None, reviews=(), comments=()):
+        """Обрабатывает строки автора или пары из списков и сбрасывает кэш."""
+        if author_id is not None:
+            self.by_author(author_id)
+        else:
+            self.by_ids(reviews, comments)
+        self.invalidate()
+        return self
+
+    def invalidate(self):
+        for title_id in self.titles:
+            caching.bump_generation(
+                caching.REVIEWS_GENERATION_KEY.format(title_id=title_id)
+            )
+        for review_id in self.review_ids:
+            caching.bump_generation(
+                caching.COMMENTS_GENERATION_KEY.format(review_id=review_id)
+            )
+
+    def result(self):
+        return {
+            'action': self.action, 'reviews': self.reviews,
+            'comments': self.comments, 'titles': len(self.titles),
+        }
+
+
+def finish_in_background(action, **target):
+    """Доделывает в фоне задание, прерванное бюджетом пачек."""
+
+    def run():
+        try:
+            Moderation(action).run(**target)
+        except Exception:
+            logger.exception('Ошибка фоновой модерации')
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=run, name='moderation', daemon=True).start()
+
+
+def invalidate_author(author_id):
+    """Сбрасывает страницы со всеми отзывами и комментариями автора.
+
+    Нужно, когда меняется то, что выводится в списках как автор.
+    """
+    job = Moderation(None)
+    for shard in shards():
+        for model in (Review, ArchivedReview):
+            job.titles.update(on_shard(model.objects, shard).filter(
+                author_id=author_id
+            ).values_list('title_id', flat=True).distinct())
+        for model in COMMENT_MODELS:
+            job.review_ids.update(on_shard(model.objects, shard).filter(
+                author_id=author_id
+            ).values_list('review_id', flat=True).distinct())
+    job.invalidate()
+
+
+def invalidate_title(title_id):
+    """Сбрасывает страницы отзывов произведения и комментариев к ним."""
+    job = Moderation(None)
+    job.titles.add(title_id)
+    for model in (Review, ArchivedReview):
+        job.review_ids.update(on_shard(model.objects, shard_for(title_id))
+                              .filter(title_id=title_id)
+                              .values_list('pk', flat=True))
+    job.invalidate()
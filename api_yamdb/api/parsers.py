@@ -0,0 +1,48 @@
+import json
+
+from django.conf import settings
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """Поток JSON-объектов по одному на строку (application/x-ndjson).
+
+    Строки читаются лениво по мере обработки. Строка, которая не
+    разбирается как JSON, возвращается как есть и отклоняется при
+    валидации элемента, не прерывая остальную загрузку.
+    """
+
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return []
+        encoding = (parser_context or {}).get(
+            'encoding', settings.DEFAULT_CHARSET
+        )
+        return self._items(stream, encoding)
+
+    @staticmethod
+    def _items(stream, encoding):
+        for _, item in read_lines(stream, encoding):
+            yield item
+
+
+class NumberedNDJSONParser(NDJSONParser):
+    """NDJSON, элементы которого - пары (номер строки, значение)."""
+
+    @staticmethod
+    def _items(stream, encoding):
+        return read_lines(stream, encoding)
+
+
+def read_lines(stream, encoding):
+    """Лениво читает поток NDJSON, пропуская пустые строки."""
+    for number, line in enumerate(iter(stream.readline, b''), 1):
+        line = line.decode(encoding, 'replace').strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, line
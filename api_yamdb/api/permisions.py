@@ -73,3 +73,13 @@ class AdminOnly(permissions.BasePermission):
             request.user.is_admin
             or request.user.is_superuser
         )
+
+
+class StaffOnly(permissions.BasePermission):
+    """Даёт доступ только модераторам и админам"""
+
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and (
+            request.user.is_staff
+            or request.user.is_superuser
+        )
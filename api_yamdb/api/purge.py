@@ -0,0 +1,176 @@
+"""Отложенное удаление пользователей, произведений, жанров и категорий.
+
+Объект с небольшим числом зависимых строк удаляется сразу. Иначе он
+только помечается is_deleted и пропадает из менеджеров по умолчанию, а
+уникальные username, email и slug освобождаются переименованием. Фоновый
+обработчик затем удаляет зависимые строки пачками по PURGE_CHUNK, каждая
+в своей короткой транзакции, и последним удаляет сам объект: блокировка
+записи SQLite не держится на время всего каскада.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from . import caching, db
+from .moderation import (DELETE, Moderation, invalidate_author,
+                         invalidate_title)
+from reviews.models import (ArchivedComment, ArchivedReview, Category,
+                            Comments, Genre, GenreTitle, Review, Title, User)
+from reviews.sharding import on_shard, shard_for, shards
+
+logger = logging.getLogger(__name__)
+
+# Порядок обработки: сначала владельцы отзывов, затем справочники.
+MODELS = (User, Title, Genre, Category)
+
+
+def _count(queryset, limit):
+    return queryset[:limit + 1].count()
+
+
+def dependents(instance, limit):
+    """Число зависимых строк объекта, но не больше limit + 1."""
+    if isinstance(instance, User):
+        return sum(
+            _count(on_shard(model.objects, shard).filter(
+                author_id=instance.pk
+            ), limit)
+            for shard in shards()
+            for model in (Review, Comments, ArchivedReview, ArchivedComment)
+        )
+    if isinstance(instance, Title):
+        return sum(
+            _count(on_shard(model.objects, shard_for(instance.pk)).filter(
+                title_id=instance.pk
+            ), limit)
+            for model in (Review, ArchivedReview)
+        ) + _count(GenreTitle.objects.filter(title_id=instance.pk), limit)
+    if isinstance(instance, Genre):
+        return _count(GenreTitle.objects.filter(genre_id=instance.pk), limit)
+    return _count(Title.all_objects.filter(category_id=instance.pk), limit)
+
+
+def _released_values(instance):
+    # Двоеточие не пропускают валидаторы username, slug и email, поэтому
+    # новое значение не совпадёт ни с одним настоящим.
+    tag = f'deleted:{instance.pk}'
+    if isinstance(instance, User):
+        return {'username': tag, 'email': f'{tag}@deleted.invalid'}
+    if isinstance(instance, (Genre, Category)):
+        return {'slug': tag}
+    return {}
+
+
+def mark(instance):
+    """Помечает объект удалённым и освобождает его уникальные значения."""
+    values = {'is_deleted': True, **_released_values(instance)}
+    type(instance).all_objects.filter(pk=instance.pk).update(**values)
+    for field, value in values.items():
+        setattr(instance, field, value)
+    if isinstance(instance, User):
+        # До фоновой очистки отзывы и комментарии остаются в списках,
+        # а имя автора в них поменялось.
+        invalidate_author(instance.pk)
+    elif isinstance(instance, Title):
+        # Списки отзывов и комментариев произведения кэшируются отдельно
+        # и до фоновой очистки иначе отдавались бы из кэша.
+        caching.bump_generation(
+            caching.TITLE_GENERATION_KEY.format(title_id=instance.pk)
+        )
+        invalidate_title(instance.pk)
+    elif isinstance(instance, (Genre, Category)):
+        caching.bump_generation(caching.CATALOGUE_GENERATION_KEY)
+
+
+def delete(instance):
+    """Удаляет объект сразу или помечает его для фонового удаления."""
+    limit = settings.INLINE_DELETE_LIMIT
+    if dependents(instance, limit) <= limit:
+        instance.delete()
+        return
+    mark(instance)
+    if settings.PURGE_IN_BACKGROUND:
+        # Обработчик работает в своём соединении и должен видеть пометку.
+        transaction.on_commit(purge_in_background)
+
+
+def _delete_chunks(queryset):
+    """Удаляет строки queryset'а пачками, каждая в своей транзакции."""
+    model = queryset.model
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[
+            :settings.PURGE_CHUNK
+        ])
+        if not ids:
+            return
+        chunk = model._default_manager.filter(pk__in=ids)
+        db.retry_on_locked(chunk._raw_delete, chunk.db)
+
+
+def _clear_category(category_id):
+    titles = Title.all_objects.filter(category_id=category_id)
+    while True:
+        ids = list(titles.values_list('pk', flat=True)[:settings.PURGE_CHUNK])
+        if not ids:
+            return
+        db.retry_on_locked(
+            Title.all_objects.filter(pk__in=ids).update, category=None
+        )
+
+
+def purge(instance):
+    """Удаляет зависимые строки помеченного объекта, затем его самого."""
+    if isinstance(instance, User):
+        job = Moderation(DELETE)
+        job.by_author(instance.pk)
+        job.invalidate()
+    elif isinstance(instance, Title):
+        _delete_chunks(GenreTitle.objects.filter(title_id=instance.pk))
+        shard = shard_for(instance.pk)
+        job = Moderation(DELETE)
+        for model in (Review, ArchivedReview):
+            job.apply_reviews(shard, on_shard(model.objects, shard).filter(
+                title_id=instance.pk
+            ))
+        job.invalidate()
+    elif isinstance(instance, Genre):
+        _delete_chunks(GenreTitle.objects.filter(genre_id=instance.pk))
+    else:
+        _clear_category(instance.pk)
+    # Зависимых строк не осталось: каскад ORM сводится к пустым выборкам.
+    db.retry_on_locked(instance.delete)
+    if isinstance(instance, (Genre, Category)):
+        caching.bump_generation(caching.CATALOGUE_GENERATION_KEY)
+
+
+def purge_deleted():
+    """Обрабатывает все помеченные объекты и возвращает их число."""
+    purged = 0
+    for model in MODELS:
+        for instance in model.all_objects.filter(is_deleted=True):
+            purge(instance)
+            purged += 1
+    return purged
+
+
+_worker_lock = threading.Lock()
+
+
+def purge_in_background():
+    """Запускает фоновый обработчик, если он ещё не работает."""
+    if not _worker_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            while purge_deleted():
+                pass
+        except Exception:
+            logger.exception('Ошибка фонового удаления')
+        finally:
+            connections.close_all()
+            _worker_lock.release()
+
+    threading.Thread(target=run, name='purge', daemon=True).start()
@@ -0,0 +1,21 @@
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+
+from . import timing
+
+
+class TimedRenderMixin:
+    """Учитывает время рендеринга ответа в фазе render."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timing.phase('render'):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+
+
+class TimedJSONRenderer(TimedRenderMixin, JSONRenderer):
+    pass
+
+
+class TimedBrowsableAPIRenderer(TimedRenderMixin, BrowsableAPIRenderer):
+    pass
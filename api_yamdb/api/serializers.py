@@ -1,20 +1,39 @@
 from datetime import datetime
-from random import randint
 from smtplib import SMTPException
 
+from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.core.mail import send_mail
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 from rest_framework.exceptions import APIException
 from rest_framework_simplejwt.tokens import AccessToken
 
-from reviews.models import Category, Comments, Genre, Review, Title, User
+from . import archive, codes, db, moderation, timing
+from .fields import CachedSlugRelatedField, SlugMap
+from .metrics import registry
+from reviews.models import (Category, Comments, Genre, GenreTitle, Review,
+                            Title, User)
+from reviews.sharding import attach_ratings
 
 
 EMAIL_SUBJECT = 'Код подтверждения'
 EMAIL_SOURCE = 'from yamdb@mail.com'
 EMAIL_ERROR = 'Произошла следующая ошибка при попытке отправки письма:\n'
 
+CATEGORY_SLUGS = SlugMap(Category)
+GENRE_SLUGS = SlugMap(Genre)
+
+
+class TimedRepresentationMixin:
+    """Учитывает to_representation в фазе serialize Server-Timing."""
+
+    def to_representation(self, instance):
+        with timing.phase('serialize'):
+            return super().to_representation(instance)
+
 
 class ValidateUsernameMixin:
     """Миксин, запрещающий пользователю создать username "me"."""
@@ -27,7 +46,19 @@ class ValidateUsernameMixin:
         return value
 
 
-class BaseUserSerializer(serializers.ModelSerializer):
+class ValidateYearMixin:
+    """Миксин, запрещающий добавлять произведения, которые ещё не вышли."""
+
+    def validate_year(self, value):
+        if value > datetime.today().year:
+            raise serializers.ValidationError(
+                'Нельзя добавлять произведения, которые еще не вышли.'
+            )
+        return value
+
+
+class BaseUserSerializer(TimedRepresentationMixin,
+                         serializers.ModelSerializer):
 
     class Meta:
         model = User
@@ -35,8 +66,19 @@ class BaseUserSerializer(serializers.ModelSerializer):
                   'last_name', 'bio', 'role')
 
 
-class SignUpSerializer(ValidateUsernameMixin, serializers.ModelSerializer):
-    """Сериализатор для эндпоинта api/v1/auth/signup/"""
+class SignUpSerializer(TimedRepresentationMixin, ValidateUsernameMixin,
+                       serializers.ModelSerializer):
+    """Сериализатор для эндпоинта api/v1/auth/signup/.
+
+    Уникальность username и email проверяется не валидаторами, а при
+    сохранении: один запрос находит пользователя по любому из полей, и
+    затем выполняется одна вставка или одно обновление кода.
+    """
+
+    username = serializers.CharField(
+        max_length=150, validators=(UnicodeUsernameValidator(),)
+    )
+    email = serializers.EmailField(max_length=254)
 
     class Meta:
         model = User
@@ -44,35 +86,56 @@ class SignUpSerializer(ValidateUsernameMixin, serializers.ModelSerializer):
         read_only_fields = ('password',)
 
     def create(self, validated_data):
-        """Метод create создаёт нового пользователя."""
-        username = validated_data.get('username')
-        email = validated_data.get('email')
-        user, _ = User.objects.get_or_create(
-            username=username,
-            email=email,
-        )
-        confirmation_code = self.send_code(email)
-        user.confirmation_code = confirmation_code
-        user.set_unusable_password()
-        user.save()
-        return user
+        """Создаёт пользователя или выдаёт код существующему.
 
-    def update(self, instance, validated_data):
-        """Метод .update() создаёт пользователю новый код."""
-        confirmation_code = self.send_code(validated_data.get('email'))
-        instance.confirmation_code = confirmation_code
-        instance.save()
-        return instance
+        Если такого же пользователя одновременно создал другой запрос,
+        вставка нарушит уникальность, и поиск повторяется.
+        """
+        try:
+            user, confirmation_code = db.retry_on_locked(
+                self.upsert, validated_data
+            )
+        except IntegrityError:
+            user, confirmation_code = db.retry_on_locked(
+                self.upsert, validated_data
+            )
+        if confirmation_code is not None:
+            self.send_code(user.email, confirmation_code)
+        return user
 
-    def send_code(self, recipient_email):
-        """Отвечает за создание кода подтверждения и отправку писем.
-        Функция randint создаёт 6-значный код.
-        Отправка письма осуществляется на почту, которую указал пользователь
+    @staticmethod
+    def upsert(validated_data):
+        username = validated_data['username']
+        email = validated_data['email']
+        found = list(
+            User.objects.filter(
+                Q(username=username) | Q(email=email)
+            ).select_related('confirmation')[:2]
+        )
+        if not found:
+            user = User(username=username, email=email)
+            user.set_unusable_password()
+            user.save(force_insert=True)
+            return user, codes.issue(user)
+        user = found[0]
+        if len(found) > 1 or (user.username, user.email) != (username, email):
+            errors = {}
+            if any(other.username == username for other in found):
+                errors['username'] = ['Это имя пользователя уже занято.']
+            if any(other.email == email for other in found):
+                errors['email'] = ['Этот email уже используется.']
+            raise serializers.ValidationError(errors)
+        return user, codes.issue(user, getattr(user, 'confirmation', None))
+
+    def send_code(self, recipient_email, confirmation_code):
+        """Отправляет письмо с кодом на почту, которую указал пользователь.
+
+        Письмо уходит после коммита: транзакция не держит блокировку
+        записи на время обращения к почтовому серверу.
         """
-        confirmation_code = randint(100000, 999999)
         message = f'Код для получения токена - {confirmation_code}'
         try:
-            send_mail(
+            sent = send_mail(
                 EMAIL_SUBJECT,
                 message,
                 EMAIL_SOURCE,
@@ -80,8 +143,11 @@ class SignUpSerializer(ValidateUsernameMixin, serializers.ModelSerializer):
                 fail_silently=True
             )
         except SMTPException as error:
-            raise APIException(EMAIL_ERROR + error)
-        return confirmation_code
+            registry.inc('yamdb_email_send_total', outcome='error')
+            raise APIException(EMAIL_ERROR + str(error))
+        registry.inc(
+            'yamdb_email_send_total', outcome='sent' if sent else 'failed'
+        )
 
 
 class GetTokenSerializer(serializers.Serializer):
@@ -90,9 +156,15 @@ class GetTokenSerializer(serializers.Serializer):
     confirmation_code = serializers.IntegerField(write_only=True)
 
     def validate(self, data):
-        user = get_object_or_404(User, username=data['username'])
-        if data['confirmation_code'] != user.confirmation_code:
+        try:
+            user_id = codes.verify(
+                data['username'], data['confirmation_code']
+            )
+        except User.DoesNotExist:
+            raise Http404
+        if user_id is None:
             raise serializers.ValidationError('Неверный код подтверждения')
+        user = User.objects.get(pk=user_id)
         data['token'] = str(AccessToken.for_user(user))
         return data
 
@@ -111,31 +183,26 @@ class UserSerializer(ValidateUsernameMixin, BaseUserSerializer):
         read_only_fields = ('password', 'role')
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedRepresentationMixin,
+                         serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ('name', 'slug')
         lookup_field = 'slug',
 
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = Genre
         fields = ('name', 'slug')
         lookup_field = 'slug',
 
 
-class TitleSerializer(serializers.ModelSerializer):
+class TitleSerializer(TimedRepresentationMixin, ValidateYearMixin,
+                      serializers.ModelSerializer):
     rating = serializers.IntegerField(read_only=True)
-    category = serializers.SlugRelatedField(
-        queryset=Category.objects.all(),
-        slug_field='slug'
-    )
-    genre = serializers.SlugRelatedField(
-        queryset=Genre.objects.all(),
-        many=True,
-        slug_field='slug'
-    )
+    category = CachedSlugRelatedField(CATEGORY_SLUGS)
+    genre = CachedSlugRelatedField(GENRE_SLUGS, many=True)
 
     class Meta:
         fields = (
@@ -144,14 +211,14 @@ class TitleSerializer(serializers.ModelSerializer):
         model = Title
 
     def to_representation(self, instance):
-        return TitleReadSerializer(instance).data
-
-    def validate_year(self, value):
-        if value > datetime.today().year:
-            raise serializers.ValidationError(
-                'Нельзя добавлять произведения, которые еще не вышли.'
-            )
-        return value
+        # Ответ на запись собирается из уже загруженных объектов: жанры
+        # и категория взяты из словаря slug'ов, рейтинг - из get_object()
+        # либо отсутствует у нового произведения.
+        if not hasattr(instance, 'rating'):
+            attach_ratings((instance,))
+        return TitleReadSerializer(instance, context={
+            **self.context, 'genres': getattr(self, '_genres', None)
+        }).data
 
     def validate_genre(self, value):
         if not value:
@@ -160,11 +227,57 @@ class TitleSerializer(serializers.ModelSerializer):
             )
         return value
 
+    def create(self, validated_data):
+        genres = validated_data.pop('genre')
+        with transaction.atomic():
+            title = Title.objects.create(**validated_data)
+            GenreTitle.objects.bulk_create(
+                GenreTitle(title=title, genre=genre) for genre in genres
+            )
+        title.rating = None
+        self._genres = genres
+        return title
+
+    def update(self, instance, validated_data):
+        genres = validated_data.pop('genre', None)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if genres is None:
+                # UpdateModelMixin сбросит prefetch, жанры сохраняются
+                # для ответа заранее.
+                genres = list(instance.genre.all())
+            else:
+                self.set_genres(instance, [genre.pk for genre in genres])
+        self._genres = genres
+        return instance
+
+    @staticmethod
+    def set_genres(title, genre_ids):
+        """Приводит жанры к списку: одно удаление и одна вставка."""
+        links = GenreTitle.objects.filter(title=title)
+        current = set(links.values_list('genre_id', flat=True))
+        links.filter(genre_id__in=current - set(genre_ids)).delete()
+        GenreTitle.objects.bulk_create(
+            GenreTitle(title=title, genre_id=genre_id)
+            for genre_id in genre_ids if genre_id not in current
+        )
+
+
+class TitleGenresSerializer(serializers.ListSerializer):
+    """Жанры произведения; уже загруженные передаются в context['genres']."""
+
+    def get_attribute(self, instance):
+        genres = self.context.get('genres')
+        if genres is not None:
+            return genres
+        return super().get_attribute(instance)
+
 
-class TitleReadSerializer(serializers.ModelSerializer):
+class TitleReadSerializer(TimedRepresentationMixin,
+                          serializers.ModelSerializer):
     rating = serializers.IntegerField(read_only=True, default=None)
     category = CategorySerializer(read_only=True)
-    genre = GenreSerializer(read_only=True, many=True)
+    genre = TitleGenresSerializer(child=GenreSerializer(), read_only=True)
 
     class Meta:
         fields = (
@@ -172,8 +285,17 @@ class TitleReadSerializer(serializers.ModelSerializer):
         )
         model = Title
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Категория, помеченная на удаление, ещё не отвязана фоновой
+        # очисткой (см. api.purge).
+        if instance.category is not None and instance.category.is_deleted:
+            data['category'] = None
+        return data
 
-class AuthorForReviewAndCommentSerializer(serializers.ModelSerializer):
+
+class AuthorForReviewAndCommentSerializer(TimedRepresentationMixin,
+                                          serializers.ModelSerializer):
     """Миксин для переопределения поля автора."""
 
     author = serializers.SlugRelatedField(
@@ -200,6 +322,11 @@ class CommentSerializer(AuthorForReviewAndCommentSerializer):
             )
         return data
 
+    def create(self, validated_data):
+        # Через related manager комментарий попадает на шард отзыва.
+        review = validated_data.pop('review')
+        return review.comments.create(**validated_data)
+
 
 class ReviewSerializer(AuthorForReviewAndCommentSerializer):
     """Сериализатор для отзывов."""
@@ -215,10 +342,120 @@ class ReviewSerializer(AuthorForReviewAndCommentSerializer):
         title_id = self.context['view'].kwargs['title_id']
         title = get_object_or_404(Title, pk=title_id)
 
-        if (
-            Review.objects.filter(author=author, title=title).exists()
-            and self.context['request'].method != 'PATCH'
+        if self.context['request'].method != 'PATCH' and (
+            title.reviews.filter(author=author).exists()
+            or archive.reviews_of(title.pk).filter(author=author).exists()
         ):
             raise serializers.ValidationError(
                 'Нельзя оставить более одного отзыва одним автором')
         return data
+
+    def create(self, validated_data):
+        # Через related manager отзыв попадает на шард произведения.
+        title = validated_data.pop('title')
+        return title.reviews.create(**validated_data)
+
+
+class BulkReviewItemSerializer(serializers.Serializer):
+    """Элемент пакетной загрузки отзывов."""
+
+    title = serializers.IntegerField()
+    author = serializers.CharField(max_length=150)
+    text = serializers.CharField()
+    score = serializers.IntegerField(min_value=1, max_value=10)
+
+
+class TitleImportItemSerializer(ValidateYearMixin, serializers.Serializer):
+    """Строка потоковой загрузки произведений."""
+
+    name = serializers.CharField(max_length=256)
+    year = serializers.IntegerField()
+    description = serializers.CharField(
+        required=False, allow_blank=True, default=''
+    )
+    genre = serializers.ListField(
+        child=serializers.SlugField(), allow_empty=False
+    )
+    category = serializers.SlugField()
+
+
+class TitleChangesSerializer(ValidateYearMixin, serializers.Serializer):
+    """Изменения, применяемые к набору произведений."""
+
+    name = serializers.CharField(max_length=256, required=False)
+    year = serializers.IntegerField(required=False)
+    category = CachedSlugRelatedField(CATEGORY_SLUGS, required=False)
+    add_genres = CachedSlugRelatedField(
+        GENRE_SLUGS, many=True, required=False
+    )
+    remove_genres = CachedSlugRelatedField(
+        GENRE_SLUGS, many=True, required=False
+    )
+
+    def validate(self, data):
+        if not data:
+            raise serializers.ValidationError('Не указано ни одно изменение.')
+        return data
+
+
+class BulkTitleUpdateSerializer(serializers.Serializer):
+    """Массовое изменение: список ids или фильтр и набор изменений."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False
+    )
+    filter = serializers.DictField(required=False, allow_empty=False)
+    changes = TitleChangesSerializer()
+
+    def validate(self, data):
+        if ('ids' in data) == ('filter' in data):
+            raise serializers.ValidationError(
+                'Укажите либо ids, либо filter.'
+            )
+        changes, selection = data['changes'], data.get('filter', {})
+        if self._removes(data, selection.get('genre')) and any(
+            field in selection for field in ('name', 'year', 'category')
+            if field in changes
+        ):
+            # Фильтр входит в запросы подзапросом, и набор произведений
+            # сузился бы после первого же из них.
+            raise serializers.ValidationError(
+                'Фильтр не может зависеть одновременно от удаляемого '
+                'жанра и от изменяемых полей, укажите ids.'
+            )
+        return data
+
+    @staticmethod
+    def _removes(data, slug):
+        return slug in {
+            genre.slug for genre in data['changes'].get('remove_genres', ())
+        }
+
+    def filters_by_removed_genre(self):
+        """Фильтр выбирает произведения по жанру, который удаляется."""
+        data = self.validated_data
+        return self._removes(data, data.get('filter', {}).get('genre'))
+
+
+class ModerationTargetSerializer(serializers.Serializer):
+    title = serializers.IntegerField()
+    id = serializers.IntegerField()
+
+
+class ModerationSerializer(serializers.Serializer):
+    """Массовое действие модератора: по автору или по спискам id."""
+
+    action = serializers.ChoiceField(choices=moderation.ACTIONS)
+    author = serializers.SlugRelatedField(
+        queryset=User.objects.all(), slug_field='username', required=False
+    )
+    reviews = ModerationTargetSerializer(many=True, required=False)
+    comments = ModerationTargetSerializer(many=True, required=False)
+
+    def validate(self, data):
+        by_ids = 'reviews' in data or 'comments' in data
+        if ('author' in data) == by_ids:
+            raise serializers.ValidationError(
+                'Укажите либо author, либо reviews и comments.'
+            )
+        return data
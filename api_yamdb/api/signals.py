@@ -0,0 +1,73 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import caching
+from .moderation import invalidate_author
+from reviews.models import (Category, Comments, Genre, GenreTitle, Review,
+                            Title, User)
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_delete, sender=Title)
+def title_changed(sender, instance, **kwargs):
+    caching.bump_generation(
+        caching.TITLE_GENERATION_KEY.format(title_id=instance.pk)
+    )
+
+
+@receiver(post_save, sender=GenreTitle)
+@receiver(post_delete, sender=GenreTitle)
+def title_genre_changed(sender, instance, **kwargs):
+    caching.bump_generation(
+        caching.TITLE_GENERATION_KEY.format(title_id=instance.title_id)
+    )
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def title_genres_set(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse and pk_set is None:
+        # Жанр отвязан от всех произведений: затронутые id неизвестны.
+        caching.bump_generation(caching.CATALOGUE_GENERATION_KEY)
+        return
+    for title_id in pk_set if reverse else (instance.pk,):
+        caching.bump_generation(
+            caching.TITLE_GENERATION_KEY.format(title_id=title_id)
+        )
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def catalogue_changed(sender, **kwargs):
+    caching.bump_generation(caching.CATALOGUE_GENERATION_KEY)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, **kwargs):
+    # Срабатывает и при каскадном удалении отзывов вместе с автором
+    # или произведением.
+    caching.bump_generation(
+        caching.REVIEWS_GENERATION_KEY.format(title_id=instance.title_id)
+    )
+
+
+@receiver(post_save, sender=Comments)
+@receiver(post_delete, sender=Comments)
+def comment_changed(sender, instance, **kwargs):
+    caching.bump_generation(
+        caching.COMMENTS_GENERATION_KEY.format(review_id=instance.review_id)
+    )
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields, **kwargs):
+    # Имя автора выводится в списках отзывов и комментариев.
+    if created or (
+        update_fields is not None and 'username' not in update_fields
+    ):
+        return
+    invalidate_author(instance.pk)
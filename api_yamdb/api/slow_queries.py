@@ -0,0 +1,152 @@
+"""Журнал медленных SQL-запросов.
+
+Execute wrapper пишет в SLOW_QUERY_LOG (JSON lines) запросы, которые
+выполнялись дольше SLOW_QUERY_THRESHOLD миллисекунд. Журнал ограничен
+по размеру, а EXPLAIN для одного и того же запроса выполняется не чаще
+раза в SLOW_QUERY_EXPLAIN_INTERVAL секунд, поэтому обёртка дёшева и
+может работать без DEBUG.
+"""
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+STACK_DEPTH = 6
+PARAM_MAX_LENGTH = 200
+EXPLAIN_CACHE_SIZE = 1024
+
+current_view = ContextVar('slow_query_view', default=('unresolved', ''))
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LISTS = re.compile(r'\bIN\s*\((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Нормализует SQL: литералы и списки IN заменяются заглушками."""
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _IN_LISTS.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def _short(value):
+    text = repr(value)
+    if len(text) > PARAM_MAX_LENGTH:
+        return text[:PARAM_MAX_LENGTH] + '...'
+    return text
+
+
+def _stack_excerpt():
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(base_dir)
+        and 'site-packages' not in frame.filename
+    ]
+    return [
+        f'{os.path.relpath(frame.filename, base_dir)}:{frame.lineno} '
+        f'in {frame.name}'
+        for frame in frames[-STACK_DEPTH:]
+    ]
+
+
+class SlowQueryLogger:
+    """Execute wrapper, записывающий медленные запросы в журнал."""
+
+    def __init__(self):
+        self._explained = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(self._local, 'explaining', False):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            if duration >= settings.SLOW_QUERY_THRESHOLD:
+                self.log(sql, params, many, duration, context['connection'])
+
+    def _should_explain(self, sql, many):
+        if many or not sql.lstrip().upper().startswith('SELECT'):
+            return False
+        now = time.monotonic()
+        key = fingerprint(sql)
+        with self._lock:
+            last = self._explained.get(key)
+            if last and now - last < settings.SLOW_QUERY_EXPLAIN_INTERVAL:
+                return False
+            if len(self._explained) >= EXPLAIN_CACHE_SIZE:
+                self._explained.clear()
+            self._explained[key] = now
+        return True
+
+    def explain(self, connection, sql, params):
+        self._local.explaining = True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'{connection.ops.explain_prefix} {sql}', params
+                )
+                return [' '.join(map(str, row)) for row in cursor.fetchall()]
+        except Exception as error:
+            return [f'EXPLAIN failed: {error}']
+        finally:
+            self._local.explaining = False
+
+    def log(self, sql, params, many, duration, connection):
+        view, action = current_view.get()
+        entry = {
+            'ts': time.time(),
+            'duration_ms': round(duration, 3),
+            'database': connection.alias,
+            'sql': sql,
+            'params': None if many else [_short(p) for p in params or ()],
+            'view': view,
+            'action': action,
+            'stack': _stack_excerpt(),
+            'plan': (
+                self.explain(connection, sql, params)
+                if self._should_explain(sql, many) else None
+            ),
+        }
+        write_entry(entry)
+
+
+def write_entry(entry):
+    """Дописывает запись в журнал, ротируя его при превышении размера."""
+    path = settings.SLOW_QUERY_LOG
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    try:
+        if os.path.getsize(path) >= settings.SLOW_QUERY_LOG_MAX_BYTES:
+            os.replace(path, f'{path}.1')
+    except FileNotFoundError:
+        pass
+    line = json.dumps(entry, ensure_ascii=False, default=str) + '\n'
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write(line)
+
+
+def read_entries(path):
+    """Читает записи журнала и его предыдущей ротированной части."""
+    for name in (f'{path}.1', path):
+        try:
+            with open(name, encoding='utf-8') as file:
+                for line in file:
+                    if line.strip():
+                        yield json.loads(line)
+        except FileNotFoundError:
+            continue
+
+
+logger = SlowQueryLogger()
@@ -0,0 +1,65 @@
+"""Разбивка времени обработки запроса по фазам для Server-Timing."""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_current = ContextVar('server_timing', default=None)
+
+
+class ServerTiming:
+    """Накопитель длительностей фаз одного запроса.
+
+    Фазы реентерабельны: вложенный замер той же фазы (например,
+    сериализатор категории внутри сериализатора произведения) не
+    учитывается повторно.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self._active = set()
+
+    def add(self, name, duration):
+        self.phases[name] = self.phases.get(name, 0.0) + duration
+
+    @contextmanager
+    def phase(self, name):
+        if name in self._active:
+            yield
+            return
+        self._active.add(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._active.discard(name)
+            self.add(name, time.perf_counter() - start)
+
+    def header(self, db_count, db_duration, total):
+        entries = [
+            f'db;dur={db_duration * 1000:.2f};desc="{db_count} queries"'
+        ]
+        for name, duration in self.phases.items():
+            entries.append(f'{name};dur={duration * 1000:.2f}')
+        entries.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(entries)
+
+
+@contextmanager
+def activate(timing):
+    token = _current.set(timing)
+    try:
+        yield timing
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def phase(name):
+    """Замеряет фазу, если для текущего запроса включён Server-Timing."""
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    with timing.phase(name):
+        yield
@@ -28,6 +28,8 @@ urlpatterns = [
         'get': 'retrieve',
         'patch': 'partial_update',
     })),
+    path(f'{api_ver}/reviews/bulk/', views.BulkReviewView.as_view()),
+    path(f'{api_ver}/moderation/', views.ModerationView.as_view()),
     path(f'{api_ver}/', include(router.urls)),
     path(f'{api_ver}/auth/token/', views.GetTokenView.as_view()),
 ]
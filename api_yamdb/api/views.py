@@ -1,25 +1,50 @@
-from django.db.models import Avg
+import json
+from collections import Counter
+from types import GeneratorType
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter
 from rest_framework.mixins import (CreateModelMixin,
                                    RetrieveModelMixin,
                                    UpdateModelMixin)
 from rest_framework.pagination import LimitOffsetPagination
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import (SAFE_METHODS, AllowAny,
+                                        IsAuthenticated)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet, ModelViewSet
 from rest_framework_simplejwt.views import TokenObtainPairView
 
-from . import permisions, serializers
+from . import (archive, bulk, caching, db, moderation, permisions,
+               serializers)
 from .filters import TitleFilter
-from .mixin import CreateListDestroyMixin
-from reviews.models import Category, Genre, Title, User
+from .metrics import registry
+from .mixin import (ArchiveFallThroughMixin, CoalescingMixin,
+                    CreateListDestroyMixin, DeferredDeleteMixin,
+                    GenerationPageCacheMixin, LockRetryMixin,
+                    ReplicaReadMixin, ServerTimingMixin)
+from .parsers import NDJSONParser, NumberedNDJSONParser
+from reviews.models import (ArchivedReview, Category, Comments, Genre,
+                            Title, User)
+from reviews.sharding import attach_ratings
+
 
+def metrics(request):
+    """Отдаёт метрики всех воркеров узла в формате Prometheus."""
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
+    )
 
-class SignUpViewSet(CreateModelMixin, GenericViewSet):
+
+class SignUpViewSet(ServerTimingMixin, CreateModelMixin, GenericViewSet):
     """ViewSet, обслуживающий эндпоинт api/v1/auth/signup/."""
 
     queryset = User.objects.all()
@@ -33,26 +58,15 @@ class SignUpViewSet(CreateModelMixin, GenericViewSet):
         В случае, если пользователя с заданными username и email
         не существует, то происходит его создание.
         В случае, если пользователь с заданными username и email
-        существует, то сериализатор обновляет его confirmation_code.
+        существует, то ему выдаётся новый confirmation_code.
         """
-        try:
-            user = User.objects.get(
-                username=request.data.get('username'),
-                email=request.data.get('email')
-            )
-            serializer = self.get_serializer(user, data=request.data)
-        except User.DoesNotExist:
-            serializer = self.get_serializer(data=request.data)
-
+        serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
-        headers = self.get_success_headers(serializer.data)
-        return Response(
-            serializer.data, status=status.HTTP_200_OK, headers=headers
-        )
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class GetTokenView(TokenObtainPairView):
+class GetTokenView(ServerTimingMixin, TokenObtainPairView):
     """ViewSet для получения токенов."""
 
     serializer_class = serializers.GetTokenSerializer
@@ -71,7 +85,8 @@ class GetTokenView(TokenObtainPairView):
         )
 
 
-class AdminViewSet(ModelViewSet):
+class AdminViewSet(ServerTimingMixin, LockRetryMixin, DeferredDeleteMixin,
+                   ModelViewSet):
     """ViewSet для функционала админов."""
 
     queryset = User.objects.all()
@@ -86,10 +101,11 @@ class AdminViewSet(ModelViewSet):
     def perform_create(self, serializer):
         user = serializer.save()
         user.set_unusable_password()
-        user.save()
+        user.save(update_fields=('password',))
 
 
-class UserViewSet(RetrieveModelMixin, UpdateModelMixin, GenericViewSet):
+class UserViewSet(ServerTimingMixin, LockRetryMixin, RetrieveModelMixin,
+                  UpdateModelMixin, GenericViewSet):
     """ViewSet для просмотра пользователем своих данных."""
 
     serializer_class = serializers.UserSerializer
@@ -104,9 +120,10 @@ class UserViewSet(RetrieveModelMixin, UpdateModelMixin, GenericViewSet):
         return self.request.user
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+class TitleViewSet(ServerTimingMixin, CoalescingMixin, ReplicaReadMixin,
+                   LockRetryMixin, DeferredDeleteMixin, viewsets.ModelViewSet):
     queryset = Title.objects.select_related('category').prefetch_related(
-        'genre').annotate(rating=Avg('reviews__score'))
+        'genre')
     permission_classes = (permisions.AdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = TitleFilter
@@ -118,8 +135,92 @@ class TitleViewSet(viewsets.ModelViewSet):
             return serializers.TitleReadSerializer
         return serializers.TitleSerializer
 
+    def paginate_queryset(self, queryset):
+        # Отзывы могут лежать на разных шардах, поэтому рейтинг считается
+        # отдельным запросом к каждому шарду только для текущей страницы.
+        page = super().paginate_queryset(queryset)
+        return None if page is None else attach_ratings(page)
+
+    def get_object(self):
+        title = super().get_object()
+        attach_ratings((title,))
+        return title
+
+    def list(self, request, *args, **kwargs):
+        # JSON страницы собирается из закэшированных фрагментов
+        # произведений, сериализуются только промахи кэша.
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, JSONRenderer):
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        if page is None:
+            return super().list(request, *args, **kwargs)
+        envelope = self.paginator.get_paginated_response(None).data
+        del envelope['results']
+        fragments = caching.title_fragments(
+            page, self.get_serializer_class(), renderer
+        )
+        content = b''.join((
+            renderer.render(envelope)[:-1],
+            b',"results":[', b','.join(fragments), b']}'
+        ))
+        return HttpResponse(content, content_type=renderer.media_type)
+
+    def retrieve(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, JSONRenderer):
+            return super().retrieve(request, *args, **kwargs)
+        fragment, = caching.title_fragments(
+            (self.get_object(),), self.get_serializer_class(), renderer
+        )
+        return HttpResponse(fragment, content_type=renderer.media_type)
+
+    @action(methods=('patch',), detail=False, url_path='bulk')
+    def bulk_update(self, request):
+        """Изменение набора произведений, заданного ids или фильтром."""
+        serializer = serializers.BulkTitleUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if 'ids' in data:
+            titles = Title.objects.filter(pk__in=data['ids'])
+        else:
+            filterset = TitleFilter(data['filter'], Title.objects.all())
+            if not filterset.is_valid():
+                return Response(
+                    {'filter': filterset.errors},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            # Фильтр по жанру размножает строки: подзапрос их схлопывает.
+            titles = Title.objects.filter(pk__in=filterset.qs.values('pk'))
+        return Response(db.retry_on_locked(
+            bulk.update_titles, titles, data['changes'],
+            remove_last=serializer.filters_by_removed_genre()
+        ))
+
+    @action(methods=('post',), detail=False, url_path='import',
+            parser_classes=(NumberedNDJSONParser,))
+    def import_titles(self, request):
+        """Потоковая загрузка произведений из NDJSON.
+
+        Тело читается по мере обработки, ответ - NDJSON с результатом
+        по каждой строке и прогрессом после каждой пачки.
+        """
+        lines = request.data
+        if isinstance(lines, dict):
+            lines = ()
+        return StreamingHttpResponse(
+            (
+                json.dumps(record, ensure_ascii=False).encode() + b'\n'
+                for record in bulk.import_titles(lines)
+            ),
+            content_type='application/x-ndjson'
+        )
+
 
 class BaseForGenreAndCategoryViewSet(
+    ServerTimingMixin, ReplicaReadMixin, LockRetryMixin, DeferredDeleteMixin,
     CreateListDestroyMixin, viewsets.GenericViewSet
 ):
     permission_classes = (permisions.AdminOrReadOnly,)
@@ -139,7 +240,9 @@ class CategoryViewSet(BaseForGenreAndCategoryViewSet):
     serializer_class = serializers.CategorySerializer
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ServerTimingMixin, CoalescingMixin, ReplicaReadMixin,
+                    LockRetryMixin, GenerationPageCacheMixin,
+                    ArchiveFallThroughMixin, viewsets.ModelViewSet):
     """Класс обработки отзывов."""
 
     serializer_class = serializers.ReviewSerializer
@@ -147,19 +250,29 @@ class ReviewViewSet(viewsets.ModelViewSet):
     permission_classes = (permisions.UserStaffOrReadOnly,)
     pagination_class = LimitOffsetPagination
     http_method_names = ('get', 'post', 'patch', 'delete', 'head')
+    page_generation_key = caching.REVIEWS_GENERATION_KEY
 
     def get_title(self):
         """Забираю необходимое произведение."""
         return get_object_or_404(Title, pk=self.kwargs['title_id'])
 
     def get_queryset(self):
-        return self.get_title().reviews.all()
+        return self.get_title().reviews.filter(
+            is_hidden=False
+        ).prefetch_related('author')
+
+    def archive_queryset(self):
+        return archive.reviews_of(int(self.kwargs['title_id'])).filter(
+            is_hidden=False
+        ).prefetch_related('author')
 
     def perform_create(self, serializer):
         serializer.save(title=self.get_title(), author=self.request.user)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ServerTimingMixin, CoalescingMixin, ReplicaReadMixin,
+                     LockRetryMixin, GenerationPageCacheMixin,
+                     ArchiveFallThroughMixin, viewsets.ModelViewSet):
     """Класс обработки комментариев."""
 
     serializer_class = serializers.CommentSerializer
@@ -167,14 +280,95 @@ class CommentViewSet(viewsets.ModelViewSet):
     pagination_class = LimitOffsetPagination
     pk_url_kwarg = 'comment_id'
     http_method_names = ('get', 'post', 'patch', 'delete', 'head')
+    page_generation_key = caching.COMMENTS_GENERATION_KEY
 
     def get_review(self):
-        # Забираю отзыв.
-        title = get_object_or_404(Title, pk=self.kwargs['title_id'])
-        return get_object_or_404(title.reviews, pk=self.kwargs['review_id'])
+        # Забираю отзыв. Комментарии архивного отзыва можно только читать.
+        if getattr(self, '_review', None) is None:
+            title = get_object_or_404(Title, pk=self.kwargs['title_id'])
+            lookup = {'is_hidden': False, 'pk': self.kwargs['review_id']}
+            review = title.reviews.filter(**lookup).first()
+            if review is None and self.request.method in SAFE_METHODS:
+                review = archive.reviews_of(title.pk).filter(**lookup).first()
+            if review is None:
+                raise Http404
+            self._review = review
+        return self._review
 
     def get_queryset(self):
-        return self.get_review().comments.select_related('author')
+        review = self.get_review()
+        if isinstance(review, ArchivedReview):
+            return Comments.objects.none()
+        return review.comments.filter(
+            is_hidden=False
+        ).prefetch_related('author')
+
+    def archive_queryset(self):
+        return archive.comments_of(self.get_review()).filter(
+            is_hidden=False
+        ).prefetch_related('author')
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user, review=self.get_review())
+
+
+class BulkReviewView(ServerTimingMixin, ReplicaReadMixin, APIView):
+    """Пакетная загрузка отзывов к разным произведениям.
+
+    Принимает JSON-массив или NDJSON с полями title, author (username),
+    text и score и возвращает результат по каждому элементу.
+    """
+
+    permission_classes = (permisions.AdminOnly,)
+    parser_classes = (JSONParser, NDJSONParser)
+
+    def post(self, request):
+        items = request.data
+        # NDJSONParser отдаёт генератор элементов, JSONParser - любое
+        # JSON-значение.
+        if not isinstance(items, (list, GeneratorType)):
+            return Response(
+                {'detail': 'Ожидается массив отзывов.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        results = bulk.import_reviews(items)
+        totals = Counter(result['status'] for result in results)
+        return Response({
+            'created': totals[bulk.CREATED],
+            'duplicates': totals[bulk.DUPLICATE],
+            'errors': totals[bulk.ERROR],
+            'results': results,
+        })
+
+
+class ModerationView(ServerTimingMixin, ReplicaReadMixin, APIView):
+    """Удаление и скрытие отзывов и комментариев пачками.
+
+    Если строк больше, чем помещается в MODERATION_INLINE_CHUNKS пачек,
+    остаток обрабатывается в фоне, а ответ приходит со статусом 202.
+    """
+
+    permission_classes = (permisions.StaffOnly,)
+
+    def post(self, request):
+        serializer = serializers.ModerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if 'author' in data:
+            target = {'author_id': data['author'].pk}
+        else:
+            target = {
+                name: [
+                    (item['title'], item['id'])
+                    for item in data.get(name, ())
+                ]
+                for name in ('reviews', 'comments')
+            }
+        job = moderation.Moderation(
+            data['action'], chunks=settings.MODERATION_INLINE_CHUNKS
+        ).run(**target)
+        if job.done:
+            return Response(job.result())
+        # Остаток доделывается в фоне, в ответе - уже обработанное.
+        moderation.finish_in_background(data['action'], **target)
+        return Response(job.result(), status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,164 @@
+"""Прогрев кэшей после деплоя или перезапуска.
+
+Запросы к самым популярным страницам каталога выполняются внутри
+процесса обработчиком WSGI с обычным набором middleware, но без
+сигналов начала и конца запроса: ответы попадают в общий кэш узла, а
+страницы БД - в кэш ОС. В метриках запросов прогрев не учитывается.
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.db.models import Count
+from django.test import RequestFactory
+
+from . import metrics
+from reviews.models import Category, Genre, Review, Title
+from reviews.sharding import on_shard, shards
+
+try:
+    import fcntl
+except ImportError:  # Windows: каждый воркер прогревает кэш сам.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = '/api/v1'
+
+
+def paths_from_file(path, limit):
+    """Читает файл частот: строки вида "<число>\\t<путь>" или "<путь>"."""
+    counts = Counter()
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            parts = line.split()
+            if not parts:
+                continue
+            if len(parts) > 1 and parts[0].isdigit():
+                counts[parts[1]] += int(parts[0])
+            else:
+                counts[parts[0]] += 1
+    return [path for path, _ in counts.most_common(limit)]
+
+
+def popular_titles(limit):
+    """Произведения с наибольшим числом отзывов на всех шардах.
+
+    Помеченные на удаление произведения пропускаются (см. api.purge).
+    """
+    counts = Counter()
+    for shard in shards():
+        rows = on_shard(Review.objects, shard).values('title_id').annotate(
+            total=Count('id')
+        ).order_by('-total')[:limit]
+        counts.update({row['title_id']: row['total'] for row in rows})
+    # Отзывы лежат на шардах, поэтому живые произведения проверяются
+    # отдельным запросом к основной БД.
+    live = set(Title.objects.filter(pk__in=counts).values_list(
+        'pk', flat=True
+    ))
+    return [
+        title_id for title_id, _ in counts.most_common() if title_id in live
+    ][:limit]
+
+
+def default_paths(limit):
+    """Встроенный набор: первые страницы фильтров и популярные тайтлы."""
+    paths = [f'{API_PREFIX}/titles/']
+    paths += [
+        f'{API_PREFIX}/titles/?genre={slug}'
+        for slug in Genre.objects.values_list('slug', flat=True)[:limit]
+    ]
+    paths += [
+        f'{API_PREFIX}/titles/?category={slug}'
+        for slug in Category.objects.values_list('slug', flat=True)[:limit]
+    ]
+    for title_id in popular_titles(limit):
+        paths.append(f'{API_PREFIX}/titles/{title_id}/')
+        paths.append(f'{API_PREFIX}/titles/{title_id}/reviews/')
+    return paths[:limit]
+
+
+def _fetch(handler, path):
+    # get_response() сам превращает исключения представлений в ответы
+    # 500; здесь ловится то, что случилось до него, например плохой путь.
+    try:
+        request = RequestFactory().get(path, HTTP_ACCEPT='application/json')
+        with metrics.muted():
+            return handler.get_response(request).status_code
+    except Exception:
+        logger.exception('Ошибка прогрева %s', path)
+        return 500
+    finally:
+        connections.close_all()
+
+
+def warm(paths, concurrency):
+    """Выполняет запросы и возвращает (успешных, ошибок, секунд)."""
+    start = time.perf_counter()
+    handler = WSGIHandler()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        statuses = list(pool.map(lambda path: _fetch(handler, path), paths))
+    succeeded = sum(1 for status in statuses if status < 400)
+    return succeeded, len(statuses) - succeeded, time.perf_counter() - start
+
+
+def collect_paths(limit, source=None):
+    """Адреса из файла частот, а если его нет - встроенный набор."""
+    source = source or settings.WARMCACHE_FILE
+    if source and os.path.exists(source):
+        return paths_from_file(source, limit)
+    return default_paths(limit)
+
+
+@contextmanager
+def _node_lock(path):
+    with open(path, 'a+') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield lock
+
+
+def warm_in_background():
+    """Хук запуска: прогревает кэши в фоне, не задерживая старт воркера.
+
+    Прогрев выполняется один раз на узел: воркеры ждут flock файла
+    WARMCACHE_LOCK_FILE, и первый записывает в него pid родительского
+    процесса сервера. Остальные воркеры того же запуска, в том числе
+    перезапущенные, находят там свой pid и прогрев пропускают.
+    """
+
+    def run():
+        try:
+            with _node_lock(settings.WARMCACHE_LOCK_FILE) as lock:
+                server = str(os.getppid())
+                lock.seek(0)
+                if lock.read() == server:
+                    return
+                try:
+                    paths = collect_paths(settings.WARMCACHE_LIMIT)
+                finally:
+                    connections.close_all()
+                succeeded, failed, seconds = warm(
+                    paths, settings.WARMCACHE_CONCURRENCY
+                )
+                lock.truncate(0)
+                lock.write(server)
+        except Exception:
+            logger.exception('Ошибка прогрева кэша')
+            return
+        logger.info(
+            'Прогрев кэша: %s адресов за %.2f с, ошибок: %s',
+            succeeded, seconds, failed
+        )
+
+    thread = threading.Thread(target=run, name='warmcache', daemon=True)
+    thread.start()
+    return thread
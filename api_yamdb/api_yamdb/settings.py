@@ -28,6 +28,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.ServerTimingMiddleware',
+    'api.middleware.SlowQueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,9 +68,83 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': 5,
+        },
+    }
+}
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+SQLITE_LOCK_RETRIES = 5
+
+SQLITE_LOCK_BACKOFF = 0.05
+
+# Aliases from DATABASES that serve safe-method reads of the catalogue and
+# reviews; each replica is a read-only copy of 'default'.
+DATABASE_REPLICAS = []
+
+# Seconds a user's reads stay on 'default' after a write.
+REPLICA_LAG = 5
+
+# Aliases from DATABASES holding reviews and comments, chosen by title_id.
+REVIEW_SHARDS = ['default']
+
+DATABASE_ROUTERS = [
+    'reviews.sharding.ShardRouter',
+    'api.db.ReadReplicaRouter',
+]
+
+
+# Cache shared by all worker processes of the node
+
+CACHES = {
+    'default': {
+        'BACKEND': 'api.mmap_cache.MmapCache',
+        'LOCATION': BASE_DIR / 'cache.mmap',
+        'OPTIONS': {
+            'SLOTS': 4096,
+            'SLOT_SIZE': 32 * 1024,
+        },
     }
 }
 
+TITLE_FRAGMENT_TIMEOUT = 60 * 60
+
+# Query results of catalogue models, keyed by table generations.
+QUERY_CACHE = True
+
+QUERY_CACHE_TIMEOUT = 5 * 60
+
+# Pages of reviews and comments; invalidated by generation counters.
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Identical concurrent safe requests wait for the first one's response.
+REQUEST_COALESCING = True
+
+REQUEST_COALESCING_TIMEOUT = 5
+
+# Cache warm-up: access-frequency file with "<count>\t<path>" lines; the
+# built-in set of popular pages is used when the file is missing.
+WARMCACHE_FILE = BASE_DIR / 'warmcache.txt'
+
+WARMCACHE_LIMIT = 100
+
+WARMCACHE_CONCURRENCY = 4
+
+WARMCACHE_ON_STARTUP = False
+
+# Startup warm-up runs once per node: workers take turns on this flock and
+# skip the warm-up already done for the same server process.
+WARMCACHE_LOCK_FILE = BASE_DIR / 'warmcache.lock'
+
 
 # Password validation
 
@@ -108,7 +185,7 @@ STATICFILES_DIRS = ((BASE_DIR / 'static/'),)
 
 AUTH_USER_MODEL = 'reviews.User'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_BACKEND = 'api.mail_spool.SpoolEmailBackend'
 
 EMAIL_FILE_PATH = 'emails/'
 
@@ -116,6 +193,10 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.TimedJSONRenderer',
+        'api.renderers.TimedBrowsableAPIRenderer',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
 }
@@ -127,7 +208,7 @@ SIMPLE_JWT = {
 
 AUTH_USER_MODEL = 'reviews.User'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_BACKEND = 'api.mail_spool.SpoolEmailBackend'
 
 EMAIL_FILE_PATH = 'emails/'
 
@@ -135,6 +216,10 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.TimedJSONRenderer',
+        'api.renderers.TimedBrowsableAPIRenderer',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
 }
@@ -143,3 +228,69 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',)
 }
+
+# Bulk review import: items validated and inserted per chunk.
+BULK_REVIEW_CHUNK = 500
+
+# Bulk moderation: reviews and comments deleted or hidden per transaction.
+MODERATION_CHUNK = 500
+
+# Chunks written inside the request; the rest is finished by a background
+# thread and the endpoint answers 202 Accepted.
+MODERATION_INLINE_CHUNKS = 4
+
+# Deletes with more dependent rows than this are marked and purged in the
+# background in chunks of PURGE_CHUNK rows.
+INLINE_DELETE_LIMIT = 100
+
+PURGE_CHUNK = 500
+
+PURGE_IN_BACKGROUND = True
+
+# Confirmation codes expire after CONFIRMATION_CODE_TTL seconds or after
+# CONFIRMATION_CODE_ATTEMPTS wrong tries. No new code is issued or mailed
+# within CONFIRMATION_CODE_RESEND_WINDOW seconds of the previous one.
+CONFIRMATION_CODE_TTL = 15 * 60
+
+CONFIRMATION_CODE_ATTEMPTS = 5
+
+CONFIRMATION_CODE_RESEND_WINDOW = 60
+
+# Reviews and comments older than this move to the archive tables of their
+# shard, ARCHIVE_CHUNK rows per transaction.
+ARCHIVE_AFTER_DAYS = 365
+
+ARCHIVE_CHUNK = 500
+
+# Streaming title import: titles inserted per transaction.
+TITLE_IMPORT_CHUNK = 500
+
+# Metrics
+
+METRICS_FILE = BASE_DIR / 'metrics.json'
+
+METRICS_FLUSH_INTERVAL = 1
+
+
+# Server-Timing
+
+SERVER_TIMING = True
+
+
+# Slow query log
+
+SLOW_QUERY_LOG = BASE_DIR / 'slow_queries.jsonl'
+
+SLOW_QUERY_THRESHOLD = 100
+
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+
+SLOW_QUERY_EXPLAIN_INTERVAL = 60
+
+
+# Mail spool (api.mail_spool): messages are appended to segments in
+# EMAIL_FILE_PATH, rotated by size; old segments are removed on rotation.
+
+MAIL_SPOOL_SEGMENT_BYTES = 64 * 1024 * 1024
+
+MAIL_SPOOL_RETENTION_DAYS = 7
@@ -4,3 +4,21 @@ from django.apps import AppConfig
 class ReviewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reviews'
+
+    def ready(self):
+        from django.db.models.signals import (post_delete, post_save,
+                                              pre_delete)
+
+        from . import query_cache, sharding
+        from .models import (ArchivedReview, Category, Genre, GenreTitle,
+                             Review, Title, User)
+
+        pre_delete.connect(sharding.delete_title_reviews, sender=Title)
+        pre_delete.connect(sharding.delete_author_content, sender=User)
+        for model in (Review, ArchivedReview):
+            post_delete.connect(
+                sharding.delete_archived_comments, sender=model
+            )
+        for model in (Category, Genre, GenreTitle, Title):
+            post_save.connect(query_cache.model_saved, sender=model)
+            post_delete.connect(query_cache.model_deleted, sender=model)
@@ -0,0 +1,106 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reviews.models import ArchivedComment, ArchivedReview, Comments, Review
+from reviews.sharding import shard_for, shards
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит отзывы и комментарии на шарды, которые им назначает '
+        'текущий REVIEW_SHARDS. Повторный запуск продолжает прерванный '
+        'перенос.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', nargs='*',
+            help='Базы для проверки. По умолчанию все шарды; можно указать '
+                 'и выведенную из REVIEW_SHARDS базу.'
+        )
+        parser.add_argument('--chunk', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        moved = skipped = 0
+        for source in options['source'] or shards():
+            # Все отзывы произведения могут лежать в архиве.
+            title_ids = set()
+            for model in (Review, ArchivedReview, ArchivedComment):
+                title_ids.update(model.objects.using(source).values_list(
+                    'title_id', flat=True
+                ).distinct())
+            for title_id in sorted(title_ids):
+                target = shard_for(title_id)
+                if target == source:
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(
+                        f'Произведение {title_id}: {source} -> {target}'
+                    )
+                    continue
+                if self.move(title_id, source, target, options['chunk']):
+                    moved += 1
+                else:
+                    skipped += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено произведений: {moved}, пропущено: {skipped}'
+        ))
+
+    def copy(self, model, rows, target, parent_field, chunk):
+        """Копирует строки с сохранением pk; False при конфликте pk."""
+        existing = dict(
+            model.objects.using(target).filter(
+                pk__in=[row.pk for row in rows]
+            ).values_list('pk', parent_field)
+        )
+        for row in rows:
+            if row.pk in existing and (
+                existing[row.pk] != getattr(row, parent_field)
+            ):
+                return False
+        model.objects.using(target).bulk_create(
+            (row for row in rows if row.pk not in existing),
+            batch_size=chunk
+        )
+        return True
+
+    def move(self, title_id, source, target, chunk):
+        reviews = list(Review.objects.using(source).filter(title_id=title_id))
+        comments = list(Comments.objects.using(source).filter(
+            review__title_id=title_id
+        ))
+        archived_reviews = list(ArchivedReview.objects.using(source).filter(
+            title_id=title_id
+        ))
+        archived_comments = list(ArchivedComment.objects.using(source).filter(
+            title_id=title_id
+        ))
+        with transaction.atomic(using=target):
+            copied = (
+                self.copy(Review, reviews, target, 'title_id', chunk)
+                and self.copy(Comments, comments, target, 'review_id', chunk)
+                and self.copy(
+                    ArchivedReview, archived_reviews, target, 'title_id',
+                    chunk
+                )
+                and self.copy(
+                    ArchivedComment, archived_comments, target, 'review_id',
+                    chunk
+                )
+            )
+            if not copied:
+                transaction.set_rollback(True, using=target)
+                self.stderr.write(
+                    f'Произведение {title_id}: pk отзывов или комментариев '
+                    f'уже заняты в {target}, перенос пропущен.'
+                )
+                return False
+        with transaction.atomic(using=source):
+            Comments.objects.using(source).filter(
+                review__title_id=title_id
+            ).delete()
+            Review.objects.using(source).filter(title_id=title_id).delete()
+            for model in (ArchivedComment, ArchivedReview):
+                model.objects.using(source).filter(title_id=title_id).delete()
+        return True
@@ -0,0 +1,42 @@
+# Generated by Django 3.2 on 2026-10-19 08:57
+
+import django.contrib.auth.models
+from django.db import migrations, models
+import reviews.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_moderation_hidden'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', reviews.models.LiveUserManager()),
+                ('all_objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='is_deleted',
+            field=models.BooleanField(default=False, verbose_name='Помечен на удаление'),
+        ),
+        migrations.AddField(
+            model_name='genre',
+            name='is_deleted',
+            field=models.BooleanField(default=False, verbose_name='Помечен на удаление'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='is_deleted',
+            field=models.BooleanField(default=False, verbose_name='Помечен на удаление'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='is_deleted',
+            field=models.BooleanField(default=False, verbose_name='Помечен на удаление'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.2 on 2026-10-19 09:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0008_deferred_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedReview',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField(verbose_name='Текст отзыва')),
+                ('score', models.IntegerField(verbose_name='Оценка')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('is_hidden', models.BooleanField(default=False, verbose_name='Скрыт модератором')),
+                ('author', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('title', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reviews.title')),
+            ],
+            options={
+                'verbose_name': 'Архивный отзыв',
+                'verbose_name_plural': 'Архивные отзывы',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField(verbose_name='Текст комментария')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('is_hidden', models.BooleanField(default=False, verbose_name='Скрыт модератором')),
+                ('review_id', models.BigIntegerField(db_index=True, verbose_name='Отзыв')),
+                ('author', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('title', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reviews.title')),
+            ],
+            options={
+                'verbose_name': 'Архивный комментарий',
+                'verbose_name_plural': 'Архивные комментарии',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedreview',
+            index=models.Index(fields=['title', 'author'], name='archived_review'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2 on 2026-10-19 09:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0009_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfirmationCode',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='confirmation', serialize=False, to='reviews.user')),
+                ('code', models.PositiveIntegerField(verbose_name='Код подтверждения')),
+                ('issued_at', models.DateTimeField(verbose_name='Время выдачи')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Неверных попыток')),
+            ],
+            options={
+                'verbose_name': 'код подтверждения',
+                'verbose_name_plural': 'Коды подтверждения',
+            },
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='confirmation_code',
+        ),
+    ]
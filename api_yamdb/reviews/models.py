@@ -1,8 +1,10 @@
 from datetime import datetime
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 
+from .query_cache import CachingQuerySet
+
 
 USER_ROLES = (
     ('user', 'Пользователь'),
@@ -13,7 +15,93 @@ USER_ROLES = (
 STAFF_ROLES = ('moderator', 'admin')
 
 
-class User(AbstractUser):
+class DirtyFieldsMixin:
+    """Отслеживает изменённые поля объекта, загруженного из БД.
+
+    save() без update_fields записывает только изменённые столбцы, а если
+    ничего не изменилось - не обращается к БД и не отправляет сигналы.
+    Новые объекты и объекты со сменённым pk сохраняются целиком.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance._field_values()
+        return instance
+
+    def _field_values(self):
+        # Отложенные поля не загружены и в сравнении не участвуют.
+        return {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def get_dirty_fields(self):
+        """Имена изменённых полей или None, если объект не отслеживается."""
+        loaded = self.__dict__.get('_loaded_values')
+        if loaded is None or self._state.adding:
+            return None
+        pk_name = self._meta.pk.attname
+        if self.pk is None or loaded.get(pk_name) != self.pk:
+            return None
+        return [
+            name for name, value in self._field_values().items()
+            if name != pk_name
+            and (name not in loaded or loaded[name] != value)
+        ]
+
+    def save(self, *args, **kwargs):
+        if (
+            not args and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            dirty = self.get_dirty_fields()
+            if dirty is not None:
+                kwargs['update_fields'] = dirty
+        super().save(*args, **kwargs)
+        self._remember(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._remember(kwargs.get('fields'))
+
+    def _remember(self, fields):
+        # Словарь создаётся заново: копии объекта делят старый.
+        values = self._field_values()
+        loaded = self.__dict__.get('_loaded_values')
+        if fields is None or loaded is None:
+            self._loaded_values = values
+            return
+        fields = set(fields)
+        self._loaded_values = {
+            **loaded,
+            **{
+                field.attname: values[field.attname]
+                for field in self._meta.concrete_fields
+                if field.attname in values and (
+                    field.primary_key or field.name in fields
+                    or field.attname in fields
+                )
+            },
+        }
+
+
+class LiveManager(models.Manager.from_queryset(CachingQuerySet)):
+    """Менеджер по умолчанию: без строк, помеченных на удаление."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
+class LiveUserManager(UserManager):
+    """Менеджер пользователей без помеченных на удаление."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
+class User(DirtyFieldsMixin, AbstractUser):
     bio = models.TextField('Биография', blank=True)
     role = models.CharField(
         'Роль пользователя',
@@ -21,20 +109,23 @@ class User(AbstractUser):
         max_length=15,
         default=USER_ROLES[0][0]
     )
-    confirmation_code = models.PositiveIntegerField(
-        'Код подтверждения',
-        null=True
-    )
     email = models.EmailField(('email address'), unique=True, max_length=254)
+    is_deleted = models.BooleanField('Помечен на удаление', default=False)
+
+    objects = LiveUserManager()
+    all_objects = UserManager()
 
-    def save(self, **kwargs):
+    def save(self, *args, **kwargs):
         # Если роль admin или moderator, то у пользователя is_staff меняется
         # на True. Если роль user - то is_staff меняется на False
         if self.role in STAFF_ROLES:
             self.is_staff = True
         else:
             self.is_staff = False
-        super().save()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'role' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'is_staff'}
+        super().save(*args, **kwargs)
 
     @property
     def is_admin(self):
@@ -43,10 +134,33 @@ class User(AbstractUser):
         return False
 
 
-class Category(models.Model):
+class ConfirmationCode(models.Model):
+    """Код подтверждения пользователя (см. api.codes)."""
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True,
+        related_name='confirmation'
+    )
+    code = models.PositiveIntegerField('Код подтверждения')
+    issued_at = models.DateTimeField('Время выдачи')
+    attempts = models.PositiveSmallIntegerField(
+        'Неверных попыток', default=0
+    )
+
+    class Meta:
+        verbose_name = 'код подтверждения'
+        verbose_name_plural = 'Коды подтверждения'
+
+
+class Category(DirtyFieldsMixin, models.Model):
     name = models.CharField('Название категории', max_length=256)
     slug = models.SlugField('Слаг', max_length=50, unique=True)
 
+    is_deleted = models.BooleanField('Помечен на удаление', default=False)
+
+    objects = LiveManager()
+    all_objects = CachingQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -55,10 +169,15 @@ class Category(models.Model):
         verbose_name_plural = 'Категории'
 
 
-class Genre(models.Model):
+class Genre(DirtyFieldsMixin, models.Model):
     name = models.CharField('Название жанра', max_length=256)
     slug = models.SlugField('Слаг', max_length=50, unique=True)
 
+    is_deleted = models.BooleanField('Помечен на удаление', default=False)
+
+    objects = LiveManager()
+    all_objects = CachingQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -67,7 +186,7 @@ class Genre(models.Model):
         verbose_name_plural = 'Жанры'
 
 
-class Title(models.Model):
+class Title(DirtyFieldsMixin, models.Model):
     name = models.CharField('Название', max_length=256)
     year = models.IntegerField(
         'Год', validators=[
@@ -92,6 +211,11 @@ class Title(models.Model):
         related_name='titles'
     )
 
+    is_deleted = models.BooleanField('Помечен на удаление', default=False)
+
+    objects = LiveManager()
+    all_objects = CachingQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -114,6 +238,8 @@ class GenreTitle(models.Model):
         verbose_name='Жанр'
     )
 
+    objects = CachingQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Жанр произведения'
         verbose_name_plural = 'Жанры произведения'
@@ -125,7 +251,7 @@ class GenreTitle(models.Model):
         ]
 
 
-class Review(models.Model):
+class Review(DirtyFieldsMixin, models.Model):
     """Модель для отзывов."""
 
     text = models.TextField('Текст отзыва')
@@ -136,10 +262,15 @@ class Review(models.Model):
             MaxValueValidator(10)
         ])
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    is_hidden = models.BooleanField('Скрыт модератором', default=False)
+    # Отзывы могут лежать на шарде, отличном от основной БД (см.
+    # reviews.sharding), поэтому ограничения внешних ключей в БД не создаются.
     title = models.ForeignKey(
-        Title, on_delete=models.CASCADE, related_name='reviews')
+        Title, on_delete=models.CASCADE, related_name='reviews',
+        db_constraint=False)
     author = models.ForeignKey(
-        User, on_delete=models.CASCADE, related_name='reviews')
+        User, on_delete=models.CASCADE, related_name='reviews',
+        db_constraint=False)
 
     def __str__(self):
         return self.text
@@ -155,13 +286,15 @@ class Review(models.Model):
         ]
 
 
-class Comments(models.Model):
+class Comments(DirtyFieldsMixin, models.Model):
     """Модель для отзывов."""
 
     text = models.TextField('Текст комментария')
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    is_hidden = models.BooleanField('Скрыт модератором', default=False)
     author = models.ForeignKey(
-        User, on_delete=models.CASCADE, related_name='comments')
+        User, on_delete=models.CASCADE, related_name='comments',
+        db_constraint=False)
     review = models.ForeignKey(
         Review, on_delete=models.CASCADE, related_name='comments')
 
@@ -171,3 +304,60 @@ class Comments(models.Model):
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+
+
+class ArchivedReview(models.Model):
+    """Отзыв, перенесённый в архив (см. api.archive).
+
+    Хранится на шарде произведения и сохраняет id исходного отзыва.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    text = models.TextField('Текст отзыва')
+    score = models.IntegerField('Оценка')
+    pub_date = models.DateTimeField('Дата публикации')
+    is_hidden = models.BooleanField('Скрыт модератором', default=False)
+    title = models.ForeignKey(
+        Title, on_delete=models.CASCADE, related_name='+',
+        db_constraint=False)
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='+',
+        db_constraint=False)
+
+    def __str__(self):
+        return self.text
+
+    class Meta:
+        verbose_name = 'Архивный отзыв'
+        verbose_name_plural = 'Архивные отзывы'
+        indexes = [
+            models.Index(fields=['title', 'author'], name='archived_review'),
+        ]
+
+
+class ArchivedComment(models.Model):
+    """Комментарий, перенесённый в архив (см. api.archive).
+
+    Отзыв комментария может лежать как в Review, так и в ArchivedReview,
+    поэтому вместо внешнего ключа хранится его id, а для каскадного
+    удаления и шардирования - id произведения.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    text = models.TextField('Текст комментария')
+    pub_date = models.DateTimeField('Дата публикации')
+    is_hidden = models.BooleanField('Скрыт модератором', default=False)
+    review_id = models.BigIntegerField('Отзыв', db_index=True)
+    title = models.ForeignKey(
+        Title, on_delete=models.CASCADE, related_name='+',
+        db_constraint=False)
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='+',
+        db_constraint=False)
+
+    def __str__(self):
+        return self.text
+
+    class Meta:
+        verbose_name = 'Архивный комментарий'
+        verbose_name_plural = 'Архивные комментарии'
@@ -0,0 +1,197 @@
+"""Кэш результатов запросов к моделям каталога.
+
+Результат queryset'а кэшируется по отпечатку SQL и параметров, а ключ
+включает поколения всех таблиц, к которым обращается запрос. Любая запись
+в таблицу через save/delete, bulk_create, update или delete queryset'а
+увеличивает её поколение после коммита, и закэшированные результаты
+перестают запрашиваться. Внутри транзакции кэш не используется для
+таблиц, в которые она уже писала.
+
+Запросы, затрагивающие таблицы без CachingQuerySet, не кэшируются:
+записи в такие таблицы поколений не увеличивают.
+"""
+import re
+import threading
+from functools import lru_cache
+from hashlib import blake2b
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.models.query import (FlatValuesListIterable, ModelIterable,
+                                    ValuesIterable, ValuesListIterable)
+
+from api import caching
+
+TABLE_GENERATION_KEY = 'gen:table:{table}'
+QUERY_KEY = 'query:{digest}'
+
+# NamedValuesListIterable создаёт классы строк на лету, их не сериализовать.
+CACHEABLE_ITERABLES = (
+    ModelIterable, ValuesIterable, ValuesListIterable, FlatValuesListIterable
+)
+QUOTED_NAME = re.compile(r'["`]([^"`]+)["`]')
+MISSING = object()
+
+
+class _Writes(threading.local):
+    """Таблицы, в которые писали незакоммиченные транзакции потока."""
+
+    def __init__(self):
+        self.tables = {}
+
+
+_writes = _Writes()
+
+
+@lru_cache(maxsize=None)
+def all_tables():
+    return frozenset(
+        model._meta.db_table
+        for model in apps.get_models(include_auto_created=True)
+    )
+
+
+@lru_cache(maxsize=None)
+def cached_tables():
+    """Таблицы моделей, чей менеджер по умолчанию кэширует запросы."""
+    return frozenset(
+        model._meta.db_table for model in apps.get_models()
+        if issubclass(model._default_manager._queryset_class, CachingQuerySet)
+    )
+
+
+def table_generations(tables):
+    """Текущие поколения таблиц в порядке списка tables."""
+    keys = [TABLE_GENERATION_KEY.format(table=table) for table in tables]
+    generations = caching.get_generations(keys)
+    return [generations[key] for key in keys]
+
+
+def _pending(using):
+    if not connections[using].in_atomic_block:
+        # Транзакция закончилась коммитом или откатом.
+        _writes.tables.pop(using, None)
+    return _writes.tables.setdefault(using, set())
+
+
+def bump_tables(tables, using=DEFAULT_DB_ALIAS):
+    """Увеличивает поколения таблиц после коммита текущей транзакции."""
+    if connections[using].in_atomic_block:
+        _pending(using).update(tables)
+
+    def bump():
+        _writes.tables.pop(using, None)
+        for table in tables:
+            caching.bump_generation(TABLE_GENERATION_KEY.format(table=table))
+
+    transaction.on_commit(bump, using=using)
+
+
+def pending_tables(using=DEFAULT_DB_ALIAS):
+    """Таблицы, в которые писала ещё не закоммиченная транзакция.
+
+    Набор сбрасывается при коммите. После отката таблицы могут остаться
+    в нём до следующего коммита или чтения вне транзакции: кэш по ним
+    лишь дольше не используется.
+    """
+    return set(_pending(using))
+
+
+def delete_tables(model):
+    """Таблицы, меняющиеся при удалении объекта модели.
+
+    Кроме самой таблицы это таблицы ссылающихся моделей: Collector
+    обнуляет их внешние ключи запросом UPDATE без сигналов.
+    """
+    tables = {model._meta.db_table}
+    for relation in model._meta.related_objects:
+        tables.add(relation.related_model._meta.db_table)
+        if relation.many_to_many:
+            tables.add(relation.through._meta.db_table)
+    return tables
+
+
+class CachingQuerySet(models.QuerySet):
+    """QuerySet, отдающий повторные чтения из общего кэша."""
+
+    def _cache_key(self, kind):
+        if (
+            not settings.QUERY_CACHE
+            or self._iterable_class not in CACHEABLE_ITERABLES
+            or self.query.select_for_update
+        ):
+            return None
+        try:
+            sql, params = self.query.get_compiler(using=self.db).as_sql()
+        except EmptyResultSet:
+            return None
+        tables = set(QUOTED_NAME.findall(sql)) & all_tables()
+        if (
+            not tables or not tables <= cached_tables()
+            or tables & pending_tables(self.db)
+        ):
+            return None
+        raw = '\n'.join((
+            kind, self.db, self._iterable_class.__name__, sql, repr(params),
+            repr(table_generations(sorted(tables))),
+        ))
+        return QUERY_KEY.format(
+            digest=blake2b(raw.encode(), digest_size=16).hexdigest()
+        )
+
+    def _cached(self, kind, compute):
+        key = self._cache_key(kind)
+        if key is None:
+            return compute()
+        result = cache.get(key, MISSING)
+        if result is MISSING:
+            result = compute()
+            timeout = settings.QUERY_CACHE_TIMEOUT
+            if self.db != DEFAULT_DB_ALIAS:
+                # Реплика может отставать от уже увеличенного поколения.
+                timeout = min(timeout, settings.REPLICA_LAG)
+            cache.set(key, result, timeout=timeout)
+        return result
+
+    def _fetch_all(self):
+        if self._result_cache is None:
+            self._result_cache = self._cached(
+                'rows', lambda: list(self._iterable_class(self))
+            )
+        super()._fetch_all()
+
+    def count(self):
+        if self._result_cache is not None:
+            return len(self._result_cache)
+        return self._cached('count', super().count)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        bump_tables({self.model._meta.db_table}, self.db)
+        return objs
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        bump_tables({self.model._meta.db_table}, self.db)
+        return rows
+
+    def delete(self):
+        result = super().delete()
+        bump_tables(delete_tables(self.model), self.db)
+        return result
+
+    def _raw_delete(self, using):
+        rows = super()._raw_delete(using)
+        bump_tables(delete_tables(self.model), using)
+        return rows
+
+
+def model_saved(sender, using, **kwargs):
+    bump_tables({sender._meta.db_table}, using)
+
+
+def model_deleted(sender, using, **kwargs):
+    bump_tables(delete_tables(sender), using)
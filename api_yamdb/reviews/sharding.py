@@ -0,0 +1,147 @@
+"""Шардирование отзывов и комментариев по title_id.
+
+Отзывы произведения и комментарии к ним хранятся в одной БД из списка
+REVIEW_SHARDS, номер которой определяется остатком от деления title_id.
+Архивные отзывы и комментарии лежат на том же шарде. Остальные модели
+живут в основной БД, поэтому внешние ключи отзывов на произведения и
+пользователей не создают ограничений в базе.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, Sum
+
+SHARDED_MODELS = ('review', 'comments', 'archivedreview', 'archivedcomment')
+
+
+def shards():
+    return list(settings.REVIEW_SHARDS)
+
+
+def shard_for(title_id):
+    """Возвращает alias БД, в которой хранятся отзывы произведения."""
+    aliases = shards()
+    return aliases[int(title_id) % len(aliases)]
+
+
+def on_shard(queryset, shard):
+    """Направляет queryset на шард.
+
+    Основная БД не указывается явно, чтобы чтения из неё могли уйти на
+    реплику через ReadReplicaRouter.
+    """
+    if shard == DEFAULT_DB_ALIAS:
+        return queryset
+    return queryset.using(shard)
+
+
+def group_by_shard(title_ids):
+    groups = {}
+    for title_id in title_ids:
+        groups.setdefault(shard_for(title_id), []).append(title_id)
+    return groups
+
+
+def ratings_for(title_ids):
+    """Средние оценки произведений: по одному запросу на каждый шард.
+
+    Учитываются и архивные отзывы: суммы и количества оценок обеих
+    таблиц приходят одним запросом UNION ALL.
+    """
+    from .models import ArchivedReview, Review
+
+    totals = {}
+    for shard, ids in group_by_shard(title_ids).items():
+        hot, archived = (
+            on_shard(model.objects, shard).filter(
+                title_id__in=ids, is_hidden=False
+            ).values_list('title_id').annotate(
+                total=Sum('score'), count=Count('pk')
+            ).order_by()
+            for model in (Review, ArchivedReview)
+        )
+        for title_id, total, count in hot.union(archived, all=True):
+            previous = totals.get(title_id, (0, 0))
+            totals[title_id] = (previous[0] + total, previous[1] + count)
+    return {
+        title_id: total / count for title_id, (total, count) in totals.items()
+    }
+
+
+def attach_ratings(titles):
+    """Проставляет произведениям атрибут rating."""
+    titles = list(titles)
+    ratings = ratings_for([title.pk for title in titles])
+    for title in titles:
+        title.rating = ratings.get(title.pk)
+    return titles
+
+
+class ShardRouter:
+    """Роутер отзывов и комментариев по шардам.
+
+    Шард определяется по подсказке instance: произведению, отзыву или
+    комментарию, уже загруженному из шарда. Для основной БД роутер
+    ничего не решает и передаёт выбор следующему роутеру.
+    """
+
+    def _shard(self, model, hints):
+        if model._meta.model_name not in SHARDED_MODELS:
+            return None
+        instance = hints.get('instance')
+        model_name = instance._meta.model_name if instance else None
+        if model_name == 'title':
+            shard = shard_for(instance.pk)
+        elif model_name == 'review' and instance.title_id:
+            shard = shard_for(instance.title_id)
+        elif model_name in SHARDED_MODELS:
+            if instance._state.db not in shards():
+                return None
+            shard = instance._state.db
+        else:
+            return None
+        return None if shard == DEFAULT_DB_ALIAS else shard
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS or db not in shards():
+            return None
+        return app_label == 'reviews' and model_name in SHARDED_MODELS
+
+
+def delete_title_reviews(sender, instance, using, **kwargs):
+    """Удаляет отзывы произведения, если они лежат не в основной БД."""
+    from .models import ArchivedComment, ArchivedReview, Review
+
+    shard = shard_for(instance.pk)
+    if shard != using:
+        for model in (Review, ArchivedReview, ArchivedComment):
+            model.objects.using(shard).filter(title_id=instance.pk).delete()
+
+
+def delete_author_content(sender, instance, using, **kwargs):
+    """Удаляет отзывы и комментарии пользователя на остальных шардах."""
+    from .models import ArchivedComment, ArchivedReview, Comments, Review
+
+    for shard in shards():
+        if shard == using:
+            continue
+        for model in (Comments, Review, ArchivedComment, ArchivedReview):
+            model.objects.using(shard).filter(author_id=instance.pk).delete()
+
+
+def delete_archived_comments(sender, instance, using, **kwargs):
+    """Удаляет архивные комментарии удалённого отзыва.
+
+    Они ссылаются на отзыв по id без внешнего ключа, поэтому каскад ORM
+    до них не доходит.
+    """
+    from .models import ArchivedComment
+
+    ArchivedComment.objects.using(using).filter(
+        review_id=instance.pk
+    )._raw_delete(using)
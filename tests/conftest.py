@@ -1,6 +1,7 @@
 import os
 import sys
 
+import pytest
 from django.utils.version import get_version
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -32,4 +33,32 @@ assert get_version() < '4.0.0', 'Пожалуйста, используйте в
 
 pytest_plugins = [
     'tests.fixtures.fixture_user',
+    'tests.fixtures.fixture_databases',
 ]
+
+
+@pytest.fixture(scope='session', autouse=True)
+def cache_file(tmp_path_factory):
+    """Тесты пишут в свой файл кэша, а не в файл проекта."""
+    from django.conf import settings
+    from django.test.utils import override_settings
+
+    override = override_settings(CACHES={
+        name: {
+            **options,
+            'LOCATION': tmp_path_factory.mktemp('cache') / f'{name}.mmap',
+        }
+        for name, options in settings.CACHES.items()
+    })
+    override.enable()
+    yield
+    override.disable()
+
+
+@pytest.fixture(autouse=True)
+def clear_caches(cache_file):
+    """Кэш лежит в общем файле, поэтому очищается перед каждым тестом."""
+    from django.core.cache import caches
+
+    for cache in caches.all():
+        cache.clear()
@@ -0,0 +1,24 @@
+import pytest
+from django.db import connection, connections
+
+
+@pytest.fixture
+def sqlite_copy(tmp_path):
+    """Создаёт копию тестовой БД в файле и регистрирует её как alias."""
+    aliases = []
+
+    def make_copy(alias):
+        path = tmp_path / f'{alias}.sqlite3'
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM INTO %s', (str(path),))
+        connections.settings[alias] = {
+            **connections.settings['default'], 'NAME': str(path)
+        }
+        aliases.append(alias)
+        return alias
+
+    yield make_copy
+    for alias in aliases:
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
@@ -0,0 +1,60 @@
+from http import HTTPStatus
+
+import pytest
+
+from api.metrics import registry
+from tests.utils import create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08Metrics:
+
+    URL_METRICS = '/metrics'
+
+    @pytest.fixture(autouse=True)
+    def metrics_file(self, settings, tmp_path):
+        settings.METRICS_FILE = tmp_path / 'previous.json'
+        registry.flush()
+        settings.METRICS_FILE = tmp_path / 'metrics.json'
+
+    def test_01_view_and_sql_series(self, client, admin_client):
+        create_titles(admin_client)
+        client.get('/api/v1/titles/')
+
+        response = client.get(self.URL_METRICS)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что эндпоинт `{self.URL_METRICS}` доступен.'
+        )
+        content = response.content.decode()
+        assert (
+            'yamdb_requests_total{action="list",method="GET",status="200",'
+            'view="TitleViewSet"} 1' in content
+        ), 'Счётчик запросов должен размечаться по viewset и action.'
+        assert (
+            'yamdb_requests_total{action="create",method="POST",'
+            'status="201",view="TitleViewSet"} 2' in content
+        )
+        assert (
+            'yamdb_sql_queries_per_request_count{action="list",'
+            'view="TitleViewSet"} 1' in content
+        )
+        assert '# TYPE yamdb_request_duration_seconds histogram' in content
+
+    def test_02_email_outcome(self, client):
+        client.post(
+            '/api/v1/auth/signup/',
+            data={'username': 'metrics', 'email': 'metrics@yamdb.fake'}
+        )
+        content = client.get(self.URL_METRICS).content.decode()
+        assert 'yamdb_email_send_total{outcome="sent"} 1' in content
+
+    def test_03_shared_file(self, client, settings):
+        settings.METRICS_FILE.write_text(
+            '{"yamdb_email_send_total\\tyamdb_email_send_total'
+            '{outcome=\\"failed\\"}": 3}'
+        )
+        content = client.get(self.URL_METRICS).content.decode()
+        assert 'yamdb_email_send_total{outcome="failed"} 3' in content, (
+            'Эндпоинт должен отдавать значения, накопленные другими '
+            'процессами в общем файле.'
+        )
@@ -0,0 +1,29 @@
+import re
+
+import pytest
+
+from tests.utils import create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09ServerTiming:
+
+    def test_01_header_phases(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        response = client.get(f'/api/v1/titles/{titles[0]["id"]}/')
+        header = response.get('Server-Timing')
+        assert header, 'Ответ API должен содержать заголовок Server-Timing.'
+        phases = dict(
+            re.match(r'(\w+);dur=([\d.]+)', entry.strip()).groups()
+            for entry in header.split(',')
+        )
+        for name in ('db', 'perm', 'serialize', 'render', 'total'):
+            assert name in phases, (
+                f'Заголовок Server-Timing должен содержать фазу `{name}`.'
+            )
+        assert re.search(r'db;dur=[\d.]+;desc="\d+ queries"', header)
+
+    def test_02_disabled_by_setting(self, client, settings):
+        settings.SERVER_TIMING = False
+        response = client.get('/api/v1/genres/')
+        assert not response.has_header('Server-Timing')
@@ -0,0 +1,49 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from api.slow_queries import fingerprint
+from tests.utils import create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10SlowQueryLog:
+
+    def test_01_entries_and_summary(self, client, admin_client, settings,
+                                    tmp_path):
+        create_titles(admin_client)
+        settings.SLOW_QUERY_LOG = tmp_path / 'slow.jsonl'
+        settings.SLOW_QUERY_THRESHOLD = 0
+        client.get('/api/v1/titles/')
+
+        entries = [
+            json.loads(line)
+            for line in settings.SLOW_QUERY_LOG.read_text().splitlines()
+        ]
+        assert entries, 'При нулевом пороге в журнал попадают все запросы.'
+        entry = entries[0]
+        assert (entry['view'], entry['action']) == ('TitleViewSet', 'list')
+        for key in ('duration_ms', 'sql', 'params', 'stack', 'plan'):
+            assert key in entry
+        assert any(item['plan'] for item in entries), (
+            'Для SELECT-запросов в журнал должен попадать EXPLAIN QUERY PLAN.'
+        )
+
+        out = StringIO()
+        call_command('slowqueries', log=settings.SLOW_QUERY_LOG, stdout=out)
+        assert 'TitleViewSet.list' in out.getvalue()
+
+    def test_02_threshold(self, client, settings, tmp_path):
+        settings.SLOW_QUERY_LOG = tmp_path / 'slow.jsonl'
+        settings.SLOW_QUERY_THRESHOLD = 10 ** 6
+        client.get('/api/v1/genres/')
+        assert not settings.SLOW_QUERY_LOG.exists()
+
+    def test_03_fingerprint(self):
+        assert fingerprint(
+            "SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 5"
+        ) == fingerprint(
+            "SELECT * FROM t WHERE id IN (%s) AND name = 'y'  LIMIT 10"
+        )
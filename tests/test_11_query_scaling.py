@@ -0,0 +1,113 @@
+import time
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import (
+    Category, Comments, Genre, GenreTitle, Review, Title, User
+)
+
+SCALES = (1, 10, 100)
+# Уже на первом масштабе страница заполнена горячими строками и не
+# продолжается архивом.
+BASE_SIZE = 5
+
+
+class Dataset:
+    """Растущий набор данных: на масштабе N каждой сущности BASE_SIZE * N."""
+
+    def __init__(self):
+        self.size = 0
+        self.category = Category.objects.create(name='Фильм', slug='films')
+        self.title = Title.objects.create(
+            name='Терминатор', year=1984, category=self.category
+        )
+        author = User.objects.create(username='author', email='a@yamdb.fake')
+        self.review = Review.objects.create(
+            title=self.title, author=author, text='review', score=5
+        )
+
+    def grow(self, scale):
+        start, self.size = self.size, BASE_SIZE * scale
+        numbers = range(start, self.size)
+        users = User.objects.bulk_create(
+            User(username=f'user{i}', email=f'user{i}@yamdb.fake')
+            for i in numbers
+        )
+        users = User.objects.filter(username__in=[u.username for u in users])
+        genres = Genre.objects.bulk_create(
+            Genre(name=f'genre {i}', slug=f'genre-{i}') for i in numbers
+        )
+        genres = list(Genre.objects.filter(slug__in=[g.slug for g in genres]))
+        Category.objects.bulk_create(
+            Category(name=f'category {i}', slug=f'category-{i}')
+            for i in numbers
+        )
+        Title.objects.bulk_create(
+            Title(name=f'title {i}', year=2000, category=self.category)
+            for i in numbers
+        )
+        GenreTitle.objects.bulk_create(
+            GenreTitle(title=title, genre=genre)
+            for title in Title.objects.filter(name__startswith='title ')
+            .exclude(genre__isnull=False)
+            for genre in genres[:2]
+        )
+        Review.objects.bulk_create(
+            Review(title=self.title, author=user, text='text', score=7)
+            for user in users
+        )
+        Comments.objects.bulk_create(
+            Comments(review=self.review, author=user, text='text')
+            for user in users
+        )
+
+
+def measure(client, url):
+    durations = []
+    for _ in range(3):
+        # bulk_create не сбрасывает кэши: измеряется обработка без них.
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.get(url)
+            durations.append(time.perf_counter() - start)
+        assert response.status_code == 200, url
+    return len(queries), min(durations)
+
+
+@pytest.mark.django_db
+class Test11QueryScaling:
+
+    URLS = (
+        '/api/v1/titles/',
+        '/api/v1/titles/{title}/',
+        '/api/v1/titles/{title}/reviews/',
+        '/api/v1/titles/{title}/reviews/{review}/',
+        '/api/v1/titles/{title}/reviews/{review}/comments/',
+        '/api/v1/genres/',
+        '/api/v1/categories/',
+        '/api/v1/users/',
+        '/api/v1/users/author/',
+    )
+
+    @pytest.mark.parametrize('url', URLS)
+    def test_01_constant_query_count(self, admin_client, url):
+        dataset = Dataset()
+        url = url.format(title=dataset.title.id, review=dataset.review.id)
+        results = {}
+        for scale in SCALES:
+            dataset.grow(scale)
+            results[scale] = measure(admin_client, url)
+
+        counts = {scale: count for scale, (count, _) in results.items()}
+        assert len(set(counts.values())) == 1, (
+            f'Количество SQL-запросов к `{url}` не должно зависеть от '
+            f'объёма данных, получено {counts}.'
+        )
+        smallest, largest = results[SCALES[0]][1], results[SCALES[-1]][1]
+        assert largest < smallest * SCALES[-1], (
+            f'Время ответа `{url}` должно расти медленнее объёма данных.'
+        )
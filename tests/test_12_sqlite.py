@@ -0,0 +1,50 @@
+import sqlite3
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import OperationalError
+
+from api.db import apply_sqlite_pragmas, retry_on_locked
+
+
+def test_01_pragmas_applied(settings, tmp_path):
+    connection = sqlite3.connect(tmp_path / 'db.sqlite3')
+    apply_sqlite_pragmas(connection.cursor(), settings.SQLITE_PRAGMAS)
+    assert connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert connection.execute('PRAGMA busy_timeout').fetchone()[0] == (
+        settings.SQLITE_PRAGMAS['busy_timeout']
+    )
+
+
+@pytest.mark.django_db
+def test_02_retry_on_locked(settings):
+    settings.SQLITE_LOCK_BACKOFF = 0
+    calls = []
+
+    def write():
+        calls.append(1)
+        if len(calls) < 3:
+            raise OperationalError('database is locked')
+        return 'ok'
+
+    assert retry_on_locked(write) == 'ok'
+    assert len(calls) == 3
+
+    def broken():
+        raise OperationalError('no such table: x')
+
+    with pytest.raises(OperationalError):
+        retry_on_locked(broken)
+
+
+def test_03_stress_command():
+    out = StringIO()
+    call_command('sqlite_stress', duration=0.3, stdout=out)
+    lines = out.getvalue().splitlines()
+    assert lines[0].startswith('default:')
+    assert lines[1].startswith('tuned:')
+    assert lines[1].endswith('ошибок блокировки: 0'), (
+        'С WAL и busy_timeout писатели не должны получать '
+        '"database is locked".'
+    )
@@ -0,0 +1,46 @@
+from http import HTTPStatus
+
+import pytest
+
+from api.db import ReadReplicaRouter, read_alias
+from reviews.models import Title
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test13ReadReplicas:
+
+    def test_01_router(self, settings):
+        router = ReadReplicaRouter()
+        assert router.db_for_read(Title) == 'default'
+        token = read_alias.set('replica')
+        try:
+            assert router.db_for_read(Title) == 'replica'
+            assert router.db_for_write(Title) == 'default'
+        finally:
+            read_alias.reset(token)
+        settings.DATABASE_REPLICAS = ['replica']
+        assert not router.allow_migrate('replica', 'reviews')
+
+    def test_02_reads_from_replica(self, client, admin_client, user_client,
+                                   settings, sqlite_copy):
+        titles, _, _ = create_titles(admin_client)
+        settings.DATABASE_REPLICAS = [sqlite_copy('replica')]
+        Title.objects.create(name='Только на primary', year=2000)
+
+        response = client.get('/api/v1/titles/')
+        assert response.json()['count'] == len(titles), (
+            'Безопасные запросы к каталогу должны читать из реплики.'
+        )
+        response = admin_client.get('/api/v1/titles/')
+        assert response.json()['count'] == len(titles)
+
+        review_url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        create_single_review(user_client, titles[0]['id'], 'Отзыв', 7)
+        response = user_client.get(review_url)
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['count'] == 1, (
+            'После записи пользователь должен читать с основной БД и '
+            'видеть собственный отзыв.'
+        )
+        assert client.get(review_url).json()['count'] == 0
@@ -0,0 +1,107 @@
+from datetime import timedelta
+from http import HTTPStatus
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from api.archive import archive
+from reviews.models import (ArchivedComment, ArchivedReview, Comments, Review,
+                            Title)
+from reviews.sharding import shard_for
+from tests.utils import create_single_comment, create_single_review
+
+
+@pytest.mark.django_db(transaction=True)
+class Test14ReviewSharding:
+
+    @pytest.fixture
+    def shard_title(self, settings, sqlite_copy):
+        settings.REVIEW_SHARDS = ['default', sqlite_copy('shard1')]
+        titles = [Title.objects.create(name=str(i), year=2000)
+                  for i in range(2)]
+        return next(t for t in titles if shard_for(t.id) == 'shard1')
+
+    def test_01_reviews_on_shard(self, client, user_client, moderator_client,
+                                 shard_title):
+        review = create_single_review(
+            user_client, shard_title.id, 'Отзыв', 4
+        ).json()
+        create_single_review(moderator_client, shard_title.id, 'Ещё', 9)
+        create_single_comment(
+            user_client, shard_title.id, review['id'], 'Комментарий'
+        )
+        assert Review.objects.using('shard1').count() == 2
+        assert not Review.objects.using('default').exists(), (
+            'Отзывы произведения должны сохраняться на его шарде.'
+        )
+        assert Comments.objects.using('shard1').count() == 1
+
+        url = f'/api/v1/titles/{shard_title.id}/reviews/'
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['count'] == 2
+        response = client.get(f'{url}{review["id"]}/comments/')
+        assert response.json()['results'][0]['author'] == 'TestUser'
+
+        response = client.get(f'/api/v1/titles/{shard_title.id}/')
+        assert response.json()['rating'] == 6, (
+            'Рейтинг должен считаться по отзывам на шарде произведения.'
+        )
+
+        response = user_client.post(url, data={'text': 'x', 'score': 1})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_02_cascades_across_shards(self, admin_client, user_client,
+                                       user, shard_title):
+        create_single_review(user_client, shard_title.id, 'Отзыв', 4)
+        user.delete()
+        assert not Review.objects.using('shard1').exists()
+
+        create_single_review(admin_client, shard_title.id, 'Отзыв', 4)
+        shard_title.delete()
+        assert not Review.objects.using('shard1').exists()
+
+    def test_03_rebalance(self, user_client, settings, shard_title):
+        review = create_single_review(
+            user_client, shard_title.id, 'Отзыв', 4
+        ).json()
+        create_single_comment(
+            user_client, shard_title.id, review['id'], 'Комментарий'
+        )
+        settings.REVIEW_SHARDS = ['default']
+        call_command('rebalance_shards', source=['shard1'])
+
+        assert not Review.objects.using('shard1').exists()
+        assert Review.objects.using('default').get().id == review['id']
+        assert Comments.objects.using('default').count() == 1
+
+    def test_04_rebalance_archive(self, client, user_client, settings,
+                                  shard_title):
+        review = create_single_review(
+            user_client, shard_title.id, 'Отзыв', 4
+        ).json()
+        create_single_comment(
+            user_client, shard_title.id, review['id'], 'Комментарий'
+        )
+        for model in (Review, Comments):
+            model.objects.using('shard1').update(
+                pub_date=timezone.now() - timedelta(days=400)
+            )
+        assert archive() == {'reviews': 1, 'comments': 1}
+        settings.REVIEW_SHARDS = ['default']
+        call_command('rebalance_shards', source=['shard1'])
+
+        assert not ArchivedReview.objects.using('shard1').exists()
+        assert not ArchivedComment.objects.using('shard1').exists()
+        assert ArchivedComment.objects.using('default').count() == 1, (
+            'Архивные комментарии должны переноситься вместе с отзывами.'
+        )
+        url = f'/api/v1/titles/{shard_title.id}/'
+        assert client.get(f'{url}reviews/').json()['count'] == 1
+        assert client.get(
+            f'{url}reviews/{review["id"]}/comments/'
+        ).json()['count'] == 1
+        assert client.get(url).json()['rating'] == 4, (
+            'После переноса архивные отзывы должны учитываться в рейтинге.'
+        )
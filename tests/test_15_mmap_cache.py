@@ -0,0 +1,85 @@
+import multiprocessing
+
+import pytest
+
+from api.mmap_cache import MmapCache
+
+
+def make_cache(path, slots=64, slot_size=1024):
+    return MmapCache(path, {
+        'OPTIONS': {'SLOTS': slots, 'SLOT_SIZE': slot_size}
+    })
+
+
+def increment(path, times):
+    cache = make_cache(path)
+    for _ in range(times):
+        cache.incr('counter')
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / 'cache.mmap'
+
+
+def test_01_basic_operations(path):
+    cache = make_cache(path)
+    cache.set('page', {'results': [1, 2]})
+    cache.set('raw', b'{"id": 1}')
+    assert cache.get('page') == {'results': [1, 2]}
+    assert cache.get('raw') == b'{"id": 1}'
+    assert cache.get_many(['page', 'missing']) == {
+        'page': {'results': [1, 2]}
+    }
+    assert not cache.add('page', 'other')
+    assert cache.delete('page')
+    assert cache.get('page', 'default') == 'default'
+    cache.set('expired', 1, timeout=0)
+    assert not cache.has_key('expired')
+    cache.set('big', b'x' * 2048)
+    assert cache.get('big') is None, (
+        'Значения больше слота не должны кэшироваться.'
+    )
+
+
+def test_02_eviction_is_bounded(path):
+    cache = make_cache(path, slots=16)
+    for number in range(200):
+        cache.set(f'key-{number}', number)
+    stored = [n for n in range(200) if cache.get(f'key-{n}') == n]
+    assert 0 < len(stored) <= 16
+    assert 199 in stored
+
+
+def test_03_shared_between_processes(path):
+    cache = make_cache(path)
+    cache.set('counter', 0)
+    workers = [
+        multiprocessing.Process(target=increment, args=(path, 100))
+        for _ in range(3)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert cache.get('counter') == 300, (
+        'incr должен быть атомарным для всех процессов узла.'
+    )
+
+    other = make_cache(path)
+    other.clear()
+    assert cache.get('counter') is None, (
+        'clear() должен инвалидировать записи во всех процессах.'
+    )
+
+
+def test_04_resized_file_is_replaced(path):
+    old = make_cache(path, slots=64)
+    old.set('page', b'old')
+    new = make_cache(path, slots=16)
+    assert new.get('page') is None
+    new.set('page', b'new')
+    assert old.get('page') == b'old', (
+        'Процесс со старым отображением не должен терять файл кэша.'
+    )
+    assert make_cache(path, slots=16).get('page') == b'new'
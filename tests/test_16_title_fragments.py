@@ -0,0 +1,69 @@
+import pytest
+
+from api import serializers
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test16TitleFragments:
+
+    URL_TITLES = '/api/v1/titles/'
+
+    @pytest.fixture
+    def serialized(self, monkeypatch):
+        calls = []
+        original = serializers.TitleReadSerializer.to_representation
+
+        def to_representation(self, instance):
+            calls.append(instance.pk)
+            return original(self, instance)
+
+        monkeypatch.setattr(
+            serializers.TitleReadSerializer, 'to_representation',
+            to_representation
+        )
+        return calls
+
+    def test_01_fragments_reused(self, client, admin_client, serialized):
+        titles, _, _ = create_titles(admin_client)
+        first = client.get(self.URL_TITLES).json()
+        assert first['count'] == len(titles)
+        assert {title['id'] for title in first['results']} == {
+            title['id'] for title in titles
+        }
+        serialized.clear()
+        assert client.get(self.URL_TITLES).json() == first
+        assert client.get(
+            f'{self.URL_TITLES}{titles[0]["id"]}/'
+        ).json() == next(
+            t for t in first['results'] if t['id'] == titles[0]['id']
+        )
+        assert not serialized, (
+            'Повторные запросы должны собираться из закэшированных '
+            'фрагментов без повторной сериализации.'
+        )
+
+    def test_02_invalidation(self, client, admin_client, user_client,
+                             serialized):
+        titles, _, genres = create_titles(admin_client)
+        title_id = titles[0]['id']
+        url = f'{self.URL_TITLES}{title_id}/'
+        client.get(self.URL_TITLES)
+
+        admin_client.patch(url, data={'name': 'Новое имя'})
+        assert client.get(url).json()['name'] == 'Новое имя'
+
+        admin_client.patch(url, data={'genre': [genres[2]['slug']]})
+        assert [g['slug'] for g in client.get(url).json()['genre']] == [
+            genres[2]['slug']
+        ]
+
+        create_single_review(user_client, title_id, 'Отзыв', 8)
+        serialized.clear()
+        response = client.get(self.URL_TITLES).json()
+        rated = next(t for t in response['results'] if t['id'] == title_id)
+        assert rated['rating'] == 8
+        assert serialized == [title_id], (
+            'После нового отзыва пересериализовано должно быть только '
+            'изменившееся произведение.'
+        )
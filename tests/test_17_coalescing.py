@@ -0,0 +1,115 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.test import Client
+
+from api import caching
+from api.coalescing import SingleFlight
+from tests.utils import create_titles
+
+
+def test_01_single_flight():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'result'
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        leader = pool.submit(flight.do, 'key', compute, 5)
+        started.wait(5)
+        followers = [
+            pool.submit(flight.do, 'key', compute, 5) for _ in range(4)
+        ]
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert len(calls) == 1, 'Ведущий запрос должен выполняться один раз.'
+    assert results[0] == ('result', 'leader')
+    assert all(result == ('result', 'follower') for result in results[1:])
+
+
+def test_02_follower_timeout():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return 'slow'
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, 'key', slow, 5)
+        started.wait(5)
+        assert flight.do('key', lambda: 'own', 0.01) == ('own', 'own')
+        release.set()
+        assert leader.result() == ('slow', 'leader')
+
+
+@pytest.mark.django_db(transaction=True)
+def test_03_identical_requests_share_response(admin_client, monkeypatch):
+    create_titles(admin_client)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    original = caching.title_fragments
+
+    def slow_fragments(*args, **kwargs):
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(caching, 'title_fragments', slow_fragments)
+
+    def get(url):
+        return Client().get(url)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(get, '/api/v1/titles/?year=1984&name=Т')
+        started.wait(5)
+        followers = [
+            pool.submit(get, '/api/v1/titles/?name=Т&year=1984')
+            for _ in range(3)
+        ]
+        release.set()
+        responses = [leader.result()] + [f.result() for f in followers]
+
+    assert len(calls) == 1, (
+        'Одинаковые одновременные запросы должны обрабатываться один раз.'
+    )
+    assert all(r.status_code == 200 for r in responses)
+    assert all(r.json() == responses[0].json() for r in responses)
+    assert responses[0].json()['count'] == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_04_credentials_are_not_coalesced(admin_client, monkeypatch):
+    create_titles(admin_client)
+    started, release = threading.Event(), threading.Event()
+    original = caching.title_fragments
+
+    def slow_fragments(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(caching, 'title_fragments', slow_fragments)
+    url = '/api/v1/titles/'
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(admin_client.get, url)
+        started.wait(5)
+        other = pool.submit(
+            Client(HTTP_AUTHORIZATION='Bearer invalid').get, url
+        )
+        threading.Timer(0.2, release.set).start()
+        assert leader.result().status_code == 200
+        response = other.result()
+    assert response.status_code == 401, (
+        'Запрос с неверным токеном не должен получать ответ запроса '
+        'другого пользователя.'
+    )
@@ -0,0 +1,102 @@
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api import caching, purge, warmup
+from api.metrics import registry
+from reviews.models import Title
+from reviews.sharding import attach_ratings
+from tests.utils import create_reviews
+
+
+@pytest.mark.django_db(transaction=True)
+class Test18WarmCache:
+
+    def test_01_default_paths(self, admin_client, admin, user_client, user):
+        _, titles = create_reviews(
+            admin_client, {admin: admin_client, user: user_client}
+        )
+        paths = warmup.default_paths(limit=100)
+        assert '/api/v1/titles/' in paths
+        assert '/api/v1/titles/?genre=horror' in paths
+        assert '/api/v1/titles/?category=films' in paths
+        assert f'/api/v1/titles/{titles[0]["id"]}/reviews/' in paths
+
+        purge.mark(Title.objects.get(pk=titles[0]['id']))
+        assert not [
+            path for path in warmup.default_paths(limit=100)
+            if path.startswith(f'/api/v1/titles/{titles[0]["id"]}/')
+        ], 'Помеченные на удаление произведения не должны прогреваться.'
+
+    def test_02_frequency_file(self, tmp_path):
+        source = tmp_path / 'access.txt'
+        source.write_text(
+            '3\t/api/v1/titles/?genre=horror\n'
+            '/api/v1/genres/\n'
+            '10\t/api/v1/titles/\n'
+        )
+        assert warmup.paths_from_file(source, limit=2) == [
+            '/api/v1/titles/', '/api/v1/titles/?genre=horror'
+        ]
+
+    def test_03_command(self, client, admin_client, admin, tmp_path,
+                        settings):
+        _, titles = create_reviews(admin_client, {admin: admin_client})
+        reviews_url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        source = tmp_path / 'access.txt'
+        source.write_text(
+            f'/api/v1/titles/\n/api/v1/genres/\n{reviews_url}\n'
+        )
+        settings.METRICS_FILE = tmp_path / 'metrics.json'
+        registry.flush()
+        settings.METRICS_FILE.unlink(missing_ok=True)
+        out = StringIO()
+        call_command('warmcache', file=source, concurrency=2, stdout=out)
+        assert 'Прогрето адресов: 3' in out.getvalue()
+        assert 'ошибок: 0' in out.getvalue()
+        assert not any(
+            key.startswith('yamdb_requests_total')
+            for key in registry.flush()
+        ), 'Запросы прогрева не должны попадать в метрики.'
+
+        titles = attach_ratings(Title.objects.prefetch_related('genre'))
+        keys = caching.title_fragment_keys(titles)
+        assert len(cache.get_many(keys)) == len(keys), (
+            'После прогрева JSON произведений должен лежать в кэше.'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            client.get(reviews_url)
+        assert not queries.captured_queries, (
+            'После прогрева страница отзывов должна отдаваться из кэша.'
+        )
+
+    def test_04_startup_once_per_node(self, tmp_path, settings, monkeypatch):
+        settings.WARMCACHE_LOCK_FILE = tmp_path / 'warmcache.lock'
+        runs = []
+        monkeypatch.setattr(warmup, 'collect_paths', lambda limit: [])
+        monkeypatch.setattr(
+            warmup, 'warm',
+            lambda paths, concurrency: runs.append(paths) or (0, 0, 0.0)
+        )
+        for _ in range(3):
+            warmup.warm_in_background().join()
+        assert len(runs) == 1, (
+            'Воркеры одного запуска сервера должны прогревать кэш один раз.'
+        )
+        settings.WARMCACHE_LOCK_FILE.write_text('1')
+        warmup.warm_in_background().join()
+        assert len(runs) == 2, (
+            'После перезапуска сервера кэш должен прогреваться снова.'
+        )
+
+    def test_05_failures_are_counted(self):
+        succeeded, failed, _ = warmup.warm(
+            ['/api/v1/missing/', '/api/v1/titles/'], concurrency=2
+        )
+        assert (succeeded, failed) == (1, 1), (
+            'Ошибка одного адреса не должна прерывать прогрев.'
+        )
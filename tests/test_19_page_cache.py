@@ -0,0 +1,108 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from tests.utils import create_comments, create_single_review
+
+
+@pytest.mark.django_db(transaction=True)
+class Test19PageCache:
+
+    def test_01_cached_pages(self, client, admin_client, admin, user_client,
+                             user):
+        comments, reviews, titles = create_comments(
+            admin_client, {admin: admin_client, user: user_client}
+        )
+        title_id, review_id = titles[0]['id'], reviews[0]['id']
+        urls = (
+            f'/api/v1/titles/{title_id}/reviews/?limit=1&offset=1',
+            f'/api/v1/titles/{title_id}/reviews/{review_id}/comments/',
+        )
+        for url in urls:
+            first = client.get(url).json()
+            with CaptureQueriesContext(connection) as queries:
+                assert client.get(url).json() == first
+            assert not queries.captured_queries, (
+                f'Повторный GET-запрос к `{url}` без изменений должен '
+                'отдаваться из кэша без запросов к БД.'
+            )
+        other = client.get(
+            f'/api/v1/titles/{title_id}/reviews/?limit=1&offset=0'
+        ).json()
+        assert other['results'] != first and len(other['results']) == 1, (
+            'Страницы с разными параметрами пагинации кэшируются отдельно.'
+        )
+
+    def test_02_invalidation(self, client, admin_client, admin, user_client,
+                             user, moderator_client):
+        comments, reviews, titles = create_comments(
+            admin_client, {admin: admin_client}
+        )
+        title_id, review_id = titles[0]['id'], reviews[0]['id']
+        reviews_url = f'/api/v1/titles/{title_id}/reviews/'
+        comments_url = f'{reviews_url}{review_id}/comments/'
+        assert client.get(reviews_url).json()['count'] == 1
+        assert client.get(comments_url).json()['count'] == 1
+        other_url = f'/api/v1/titles/{titles[1]["id"]}/reviews/'
+        client.get(other_url)
+
+        create_single_review(user_client, title_id, 'Новый отзыв', 3)
+        assert client.get(reviews_url).json()['count'] == 2, (
+            'Создание отзыва должно сбрасывать кэш страниц отзывов.'
+        )
+        moderator_client.patch(
+            f'{reviews_url}{review_id}/', data={'text': 'Исправлено'}
+        )
+        texts = [r['text'] for r in client.get(reviews_url).json()['results']]
+        assert 'Исправлено' in texts
+
+        with CaptureQueriesContext(connection) as queries:
+            client.get(other_url)
+        assert not queries.captured_queries, (
+            'Запись в отзывы одного произведения не должна сбрасывать кэш '
+            'страниц другого.'
+        )
+
+        moderator_client.delete(f'{comments_url}{comments[0]["id"]}/')
+        assert client.get(comments_url).json()['count'] == 0
+
+        admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert client.get(reviews_url).json()['count'] == 1, (
+            'Удаление пользователя должно сбрасывать кэш страниц с его '
+            'отзывами.'
+        )
+
+    def test_03_username_change(self, client, admin_client, admin):
+        comments, reviews, titles = create_comments(
+            admin_client, {admin: admin_client}
+        )
+        reviews_url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        comments_url = f'{reviews_url}{reviews[0]["id"]}/comments/'
+        for url in (reviews_url, comments_url):
+            assert client.get(url).json()['results'][0]['author'] == (
+                admin.username
+            )
+
+        admin_client.patch('/api/v1/users/me/', data={'username': 'renamed'})
+        for url in (reviews_url, comments_url):
+            assert client.get(url).json()['results'][0]['author'] == (
+                'renamed'
+            ), (
+                'Смена имени пользователя должна сбрасывать кэш страниц '
+                'с его отзывами и комментариями.'
+            )
+
+    def test_04_format_suffix(self, client, admin_client, admin):
+        comments, reviews, titles = create_comments(
+            admin_client, {admin: admin_client}
+        )
+        reviews_url = f'/api/v1/titles/{titles[0]["id"]}/reviews'
+        for url in (
+            f'{reviews_url}.json',
+            f'{reviews_url}/{reviews[0]["id"]}/comments.json',
+        ):
+            response = client.get(url)
+            assert response.status_code == 200, (
+                f'Список с суффиксом формата `{url}` должен отдаваться.'
+            )
+            assert response.json()['count'] == 1
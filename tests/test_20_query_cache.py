@@ -0,0 +1,86 @@
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Genre, Title, User
+
+
+def queries_for(func):
+    with CaptureQueriesContext(connection) as queries:
+        result = func()
+    return result, len(queries.captured_queries)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test20QueryCache:
+
+    def test_01_repeat_reads_from_cache(self):
+        Genre.objects.create(name='Ужасы', slug='horror')
+
+        def read():
+            return Genre.objects.get(slug='horror').name
+
+        assert queries_for(read) == ('Ужасы', 1)
+        assert queries_for(read) == ('Ужасы', 0), (
+            'Повторный запрос к модели каталога должен отдаваться из кэша.'
+        )
+        count = Genre.objects.filter(slug='horror').count
+        assert queries_for(count) == (1, 1)
+        assert queries_for(count) == (1, 0)
+
+    def test_02_invalidation(self):
+        category = Category.objects.create(name='Фильм', slug='films')
+        title = Title.objects.create(name='Чужой', year=1979,
+                                     category=category)
+        genre = Genre.objects.create(name='Ужасы', slug='horror')
+
+        def genres():
+            return list(
+                Title.objects.filter(genre__slug='horror')
+                .values_list('name', flat=True)
+            )
+
+        assert genres() == []
+        title.genre.set([genre])
+        assert genres() == ['Чужой'], (
+            'Изменение связей жанров должно сбрасывать кэш запросов.'
+        )
+        Genre.objects.bulk_create([Genre(name='Драма', slug='drama')])
+        assert Genre.objects.filter(slug='drama').exists()
+        assert Genre.objects.count() == 2, (
+            'bulk_create должен сбрасывать кэш запросов.'
+        )
+        Title.objects.filter(pk=title.pk).update(name='Чужие')
+        assert genres() == ['Чужие']
+
+        assert Title.objects.get(pk=title.pk).category_id == category.pk
+        category.delete()
+        assert Title.objects.get(pk=title.pk).category_id is None, (
+            'Удаление категории обнуляет ссылки на неё в произведениях, '
+            'кэш запросов к произведениям должен сброситься.'
+        )
+
+    def test_03_not_cached(self):
+        Genre.objects.create(name='Ужасы', slug='horror')
+        Genre.objects.get(slug='horror')
+        with transaction.atomic():
+            _, count = queries_for(lambda: Genre.objects.get(slug='horror'))
+            assert count == 0, (
+                'Транзакция без записей в таблицу может читать из кэша.'
+            )
+            Genre.objects.create(name='Драма', slug='drama')
+            _, count = queries_for(lambda: Genre.objects.get(slug='horror'))
+            assert count == 1, (
+                'После записи в таблицу транзакция должна читать её из БД.'
+            )
+
+        author = User.objects.create(username='author')
+
+        def read():
+            return list(Title.objects.filter(reviews__author=author))
+
+        queries_for(read)
+        _, count = queries_for(read)
+        assert count == 1, (
+            'Запросы с таблицами вне кэша (отзывы) не должны кэшироваться.'
+        )
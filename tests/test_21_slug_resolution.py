@@ -0,0 +1,71 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from tests.utils import create_categories, create_genre
+
+
+@pytest.mark.django_db(transaction=True)
+class Test21SlugResolution:
+
+    URL_TITLES = '/api/v1/titles/'
+
+    def post_title(self, admin_client, genres, category='films'):
+        data = {
+            'name': 'Поезд', 'year': 2000, 'category': category,
+            'genre': genres,
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_client.post(self.URL_TITLES, data=data)
+        sql = [query['sql'] for query in queries.captured_queries]
+        return response, sql
+
+    def test_01_bulk_resolution(self, admin_client):
+        genres = [genre['slug'] for genre in create_genre(admin_client)]
+        create_categories(admin_client)
+
+        response, sql = self.post_title(admin_client, genres)
+        assert response.status_code == HTTPStatus.CREATED
+        assert sorted(g['slug'] for g in response.json()['genre']) == sorted(
+            genres
+        )
+        genre_lookups = [
+            q for q in sql
+            if q.startswith('SELECT') and 'FROM "reviews_genre"' in q
+            and '"reviews_genretitle"' not in q
+        ]
+        assert len(genre_lookups) <= 1, (
+            'Все slug жанров должны разрешаться одним запросом IN.'
+        )
+        inserts = [q for q in sql if 'INSERT INTO "reviews_genretitle"' in q]
+        assert len(inserts) == 1, (
+            'Связи с жанрами должны записываться одной вставкой.'
+        )
+
+        _, sql = self.post_title(admin_client, genres)
+        assert not [
+            q for q in sql
+            if q.startswith('SELECT') and 'FROM "reviews_genre"' in q
+            and '"reviews_genretitle"' not in q
+        ], 'Повторные slug жанров должны браться из словаря процесса.'
+
+    def test_02_unknown_and_new_slugs(self, admin_client):
+        create_genre(admin_client)
+        create_categories(admin_client)
+        response, _ = self.post_title(admin_client, ['horror', 'western'])
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert 'genre' in response.json()
+
+        response, _ = self.post_title(admin_client, ['horror'], 'music')
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert 'category' in response.json()
+
+        admin_client.post(
+            '/api/v1/genres/', data={'name': 'Вестерн', 'slug': 'western'}
+        )
+        response, _ = self.post_title(admin_client, ['horror', 'western'])
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Словарь slug должен сбрасываться при добавлении жанра.'
+        )
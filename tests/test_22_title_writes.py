@@ -0,0 +1,70 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from tests.utils import create_single_review, create_titles
+
+
+def selects_after_last_write(queries):
+    """SELECT-запросы, выполненные после последней записи в БД."""
+    sql = [query['sql'] for query in queries.captured_queries]
+    writes = [
+        index for index, query in enumerate(sql)
+        if query.startswith(('INSERT', 'UPDATE', 'DELETE'))
+    ]
+    assert writes, 'Запрос на запись должен изменять БД.'
+    return [q for q in sql[writes[-1] + 1:] if q.startswith('SELECT')]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test22TitleWrites:
+
+    URL_TITLES = '/api/v1/titles/'
+
+    def test_01_create(self, admin_client):
+        titles, categories, genres = create_titles(admin_client)
+        data = {
+            'name': 'Чужой', 'year': 1979, 'category': categories[0]['slug'],
+            'genre': [genres[0]['slug'], genres[2]['slug']],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_client.post(self.URL_TITLES, data=data)
+        assert response.status_code == HTTPStatus.CREATED
+        assert not selects_after_last_write(queries), (
+            'Ответ на создание произведения должен собираться без '
+            'дополнительных запросов к БД.'
+        )
+        body = response.json()
+        assert body['rating'] is None
+        assert body['category'] == categories[0]
+        assert [genre['slug'] for genre in body['genre']] == data['genre']
+        assert body == admin_client.get(
+            f'{self.URL_TITLES}{body["id"]}/'
+        ).json()
+
+    def test_02_partial_update(self, admin_client, user_client):
+        titles, categories, genres = create_titles(admin_client)
+        title_id = titles[0]['id']
+        url = f'{self.URL_TITLES}{title_id}/'
+        create_single_review(user_client, title_id, 'Отзыв', 8)
+
+        for data in (
+            {'name': 'Терминатор 2'},
+            {'genre': [genres[2]['slug']], 'category': categories[1]['slug']},
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                response = admin_client.patch(url, data=data)
+            assert response.status_code == HTTPStatus.OK
+            assert not selects_after_last_write(queries), (
+                'Ответ на изменение произведения должен собираться без '
+                'дополнительных запросов к БД.'
+            )
+            body = response.json()
+            assert body['rating'] == 8, (
+                'Ответ на изменение произведения должен содержать рейтинг.'
+            )
+            assert body == admin_client.get(url).json()
+        assert body['category'] == categories[1]
+        assert body['genre'] == [genres[2]]
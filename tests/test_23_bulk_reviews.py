@@ -0,0 +1,116 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Review, Title
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test23BulkReviews:
+
+    URL = '/api/v1/reviews/bulk/'
+
+    def post(self, client, items, ndjson=False):
+        if ndjson:
+            body = '\n'.join(
+                item if isinstance(item, str) else json.dumps(item)
+                for item in items
+            )
+            content_type = 'application/x-ndjson'
+        else:
+            body, content_type = json.dumps(items), 'application/json'
+        return client.post(self.URL, data=body, content_type=content_type)
+
+    def test_01_per_item_results(self, admin_client, admin, user_client,
+                                 user, settings):
+        settings.BULK_REVIEW_CHUNK = 3
+        titles, _, _ = create_titles(admin_client)
+        first, second = titles[0]['id'], titles[1]['id']
+        create_single_review(user_client, first, 'Уже есть', 5)
+        url = f'/api/v1/titles/{second}/reviews/'
+        assert admin_client.get(url).json()['count'] == 0
+
+        items = [
+            {'title': first, 'author': admin.username, 'text': 'a',
+             'score': 7},
+            {'title': first, 'author': user.username, 'text': 'b',
+             'score': 3},
+            {'title': second, 'author': user.username, 'text': 'c',
+             'score': 11},
+            {'title': 0, 'author': 'nobody', 'text': 'd', 'score': 5},
+            {'title': second, 'author': user.username, 'text': 'e',
+             'score': 9},
+            {'title': second, 'author': user.username, 'text': 'f',
+             'score': 1},
+        ]
+        response = self.post(admin_client, items)
+        assert response.status_code == HTTPStatus.OK
+        body = response.json()
+        assert [r['status'] for r in body['results']] == [
+            'created', 'duplicate', 'error', 'error', 'created', 'duplicate'
+        ]
+        assert [r['index'] for r in body['results']] == list(range(6))
+        assert (body['created'], body['duplicates'], body['errors']) == (
+            2, 2, 2
+        )
+        assert set(body['results'][3]['errors']) == {'title', 'author'}
+        review = Review.objects.get(pk=body['results'][4]['id'])
+        assert (review.title_id, review.author, review.text) == (
+            second, user, 'e'
+        )
+        assert admin_client.get(url).json()['count'] == 1, (
+            'Пакетная загрузка должна сбрасывать кэш страниц отзывов.'
+        )
+        assert admin_client.get(
+            f'/api/v1/titles/{first}/'
+        ).json()['rating'] == 6
+
+    def test_02_ndjson(self, admin_client, admin):
+        titles, _, _ = create_titles(admin_client)
+        items = [
+            {'title': titles[0]['id'], 'author': admin.username,
+             'text': 'a', 'score': 7},
+            '{не json',
+            {'title': titles[1]['id'], 'author': admin.username,
+             'text': 'b', 'score': 8},
+        ]
+        body = self.post(admin_client, items, ndjson=True).json()
+        assert [r['status'] for r in body['results']] == [
+            'created', 'error', 'created'
+        ]
+
+    def test_03_constant_queries(self, admin_client, admin):
+        create_titles(admin_client)
+        title_ids = [
+            Title.objects.create(name=f'Title {i}', year=2000).pk
+            for i in range(12)
+        ]
+
+        def upload(ids):
+            items = [
+                {'title': pk, 'author': admin.username, 'text': 'x',
+                 'score': 5}
+                for pk in ids
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post(admin_client, items)
+            assert response.json()['created'] == len(ids)
+            return len(queries.captured_queries)
+
+        assert upload(title_ids[:2]) == upload(title_ids[2:]), (
+            'Число запросов пакетной загрузки не должно зависеть от '
+            'количества отзывов в пачке.'
+        )
+
+    def test_04_permissions(self, client, user_client, admin_client):
+        assert self.post(client, []).status_code == HTTPStatus.UNAUTHORIZED
+        assert self.post(user_client, []).status_code == HTTPStatus.FORBIDDEN
+        for body in ({'title': 1}, 5, None, 'text'):
+            response = self.post(admin_client, body)
+            assert response.status_code == HTTPStatus.BAD_REQUEST, (
+                'Тело запроса, не являющееся массивом, должно отклоняться.'
+            )
@@ -0,0 +1,82 @@
+import json
+from http import HTTPStatus
+
+import pytest
+
+from reviews.models import Title
+from tests.utils import create_categories, create_genre
+
+
+@pytest.mark.django_db(transaction=True)
+class Test24TitleImport:
+
+    URL = '/api/v1/titles/import/'
+
+    def upload(self, client, lines):
+        body = '\n'.join(
+            line if isinstance(line, str) else json.dumps(line)
+            for line in lines
+        )
+        return client.post(
+            self.URL, data=body, content_type='application/x-ndjson'
+        )
+
+    def test_01_import(self, admin_client, settings):
+        settings.TITLE_IMPORT_CHUNK = 2
+        create_genre(admin_client)
+        create_categories(admin_client)
+        lines = [
+            {'name': 'Чужой', 'year': 1979, 'genre': ['horror', 'drama'],
+             'category': 'films'},
+            '{битая строка',
+            '',
+            {'name': 'Будущее', 'year': 3000, 'genre': ['drama'],
+             'category': 'films'},
+            {'name': 'Вестерн', 'year': 1960, 'genre': ['western'],
+             'category': 'music'},
+            {'name': 'Мастер', 'year': 1967, 'genre': ['drama'],
+             'category': 'books', 'description': 'Роман'},
+        ]
+        response = self.upload(admin_client, lines)
+        assert response.status_code == HTTPStatus.OK
+        assert response.streaming, 'Ответ должен отдаваться потоком.'
+        records = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        errors = {
+            r['line']: r['errors'] for r in records
+            if 'line' in r and 'errors' in r
+        }
+        assert set(errors) == {2, 4, 5}, (
+            'Ошибки должны сообщаться с номерами строк загрузки.'
+        )
+        assert set(errors[5]) == {'genre', 'category'}
+        assert 'year' in errors[4]
+        ids = {r['line']: r['id'] for r in records if 'id' in r}
+        assert set(ids) == {1, 6}
+        progress = [r for r in records if 'processed' in r]
+        assert len(progress) == 3, 'Прогресс выводится после каждой пачки.'
+        assert progress[-1] == {'processed': 5, 'created': 2, 'errors': 3}
+
+        title = Title.objects.get(pk=ids[1])
+        assert sorted(title.genre.values_list('slug', flat=True)) == [
+            'drama', 'horror'
+        ]
+        body = admin_client.get(f'/api/v1/titles/{ids[6]}/').json()
+        assert body['category']['slug'] == 'books'
+        assert body['description'] == 'Роман'
+
+        title = Title.objects.create(name='Новый', year=2000)
+        assert title.pk > max(ids.values()), (
+            'Импорт должен сдвигать счётчик идентификаторов.'
+        )
+
+    def test_02_permissions(self, client, user_client):
+        line = [{'name': 'x', 'year': 2000, 'genre': ['a'], 'category': 'b'}]
+        assert self.upload(client, line).status_code == (
+            HTTPStatus.UNAUTHORIZED
+        )
+        assert self.upload(user_client, line).status_code == (
+            HTTPStatus.FORBIDDEN
+        )
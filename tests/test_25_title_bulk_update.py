@@ -0,0 +1,155 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api import caching
+from reviews.models import Title
+from tests.utils import create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test25TitleBulkUpdate:
+
+    URL = '/api/v1/titles/bulk/'
+
+    def patch(self, client, data):
+        return client.patch(
+            self.URL, data=json.dumps(data), content_type='application/json'
+        )
+
+    def test_01_by_ids(self, admin_client):
+        titles, categories, genres = create_titles(admin_client)
+        ids = [title['id'] for title in titles]
+        admin_client.get('/api/v1/titles/')
+        response = self.patch(admin_client, {
+            'ids': ids,
+            'changes': {
+                'category': categories[1]['slug'], 'year': 1990,
+                'add_genres': [genres[2]['slug']],
+                'remove_genres': [genres[0]['slug']],
+            },
+        })
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {
+            'matched': 2, 'updated': 2, 'genres_added': 1,
+            'genres_removed': 1,
+        }
+        results = admin_client.get('/api/v1/titles/').json()['results']
+        assert {r['category']['slug'] for r in results} == {
+            categories[1]['slug']
+        }, 'Массовое изменение должно сбрасывать кэш произведений.'
+        assert {r['year'] for r in results} == {1990}
+        genres_by_id = {
+            r['id']: sorted(g['slug'] for g in r['genre']) for r in results
+        }
+        assert genres_by_id == {
+            ids[0]: sorted([genres[1]['slug'], genres[2]['slug']]),
+            ids[1]: [genres[2]['slug']],
+        }
+
+    def test_02_by_filter_fixed_queries(self, admin_client, monkeypatch):
+        titles, categories, genres = create_titles(admin_client)
+        for index in range(20):
+            Title.objects.create(name=f'Сериал {index}', year=2000)
+
+        def run(data):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.patch(admin_client, data)
+            assert response.status_code == HTTPStatus.OK
+            return response.json(), [
+                q['sql'] for q in queries.captured_queries
+                if q['sql'].startswith(('UPDATE', 'DELETE', 'INSERT'))
+                and 'reviews_' in q['sql']
+            ]
+
+        body, writes = run({
+            'filter': {'name': 'Сериал'},
+            'changes': {
+                'category': categories[0]['slug'],
+                'add_genres': [genres[1]['slug'], genres[2]['slug']],
+            },
+        })
+        assert body['matched'] == 20 and body['genres_added'] == 40
+        assert len(writes) == 2, (
+            'Массовое изменение должно выполняться фиксированным числом '
+            'запросов UPDATE и INSERT.'
+        )
+        assert Title.objects.filter(
+            name__startswith='Сериал', category__slug=categories[0]['slug']
+        ).count() == 20
+
+        bumps = []
+        bump_generation = caching.bump_generation
+
+        def counting_bump(key):
+            bumps.append(key)
+            return bump_generation(key)
+
+        monkeypatch.setattr(caching, 'bump_generation', counting_bump)
+        body, writes = run({
+            'filter': {'genre': genres[2]['slug']},
+            'changes': {'remove_genres': [genres[2]['slug']]},
+        })
+        assert body['matched'] == 21 and body['genres_removed'] == 21
+        assert writes == [writes[0]] and writes[0].startswith('DELETE'), (
+            'Жанры должны удаляться у всех произведений одним DELETE.'
+        )
+        assert len(bumps) <= 2, (
+            'Удаление жанров не должно вызывать сигналы и сброс кэша '
+            'для каждой связи.'
+        )
+
+    def test_03_filter_on_changed_values(self, admin_client):
+        titles, categories, genres = create_titles(admin_client)
+        slugs = [genre['slug'] for genre in genres]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch(admin_client, {
+                'filter': {'year': 1984},
+                'changes': {'year': 2000, 'remove_genres': [slugs[0]]},
+            })
+        assert response.json() == {
+            'matched': 1, 'updated': 1, 'genres_added': 0,
+            'genres_removed': 1,
+        }, 'Изменение полей из фильтра не должно сужать набор до удаления.'
+        assert any(
+            q['sql'].startswith('UPDATE') and 'IN (SELECT' in q['sql']
+            for q in queries.captured_queries
+        ), 'Отфильтрованный набор должен передаваться подзапросом.'
+
+        response = self.patch(admin_client, {
+            'filter': {'genre': slugs[1]},
+            'changes': {
+                'category': categories[1]['slug'], 'remove_genres': [slugs[1]]
+            },
+        })
+        assert response.json()['updated'] == 1
+        assert response.json()['genres_removed'] == 1
+        assert Title.objects.get(pk=titles[0]['id']).category.slug == (
+            categories[1]['slug']
+        )
+
+        response = self.patch(admin_client, {
+            'filter': {'genre': slugs[2], 'year': 1988},
+            'changes': {'year': 1990, 'remove_genres': [slugs[2]]},
+        })
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_04_validation(self, admin_client, user_client):
+        titles, _, _ = create_titles(admin_client)
+        ids = [title['id'] for title in titles]
+        for data in (
+            {'changes': {'year': 2000}},
+            {'ids': ids, 'filter': {'year': 1984}, 'changes': {'year': 2000}},
+            {'ids': ids, 'changes': {}},
+            {'ids': ids, 'changes': {'year': 3000}},
+            {'ids': ids, 'changes': {'add_genres': ['western']}},
+        ):
+            response = self.patch(admin_client, data)
+            assert response.status_code == HTTPStatus.BAD_REQUEST, data
+        response = self.patch(
+            user_client, {'ids': ids, 'changes': {'year': 2000}}
+        )
+        assert response.status_code == HTTPStatus.FORBIDDEN
@@ -0,0 +1,162 @@
+import json
+import time
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Comments, Review
+from tests.utils import (create_comments, create_single_comment,
+                         create_single_review)
+
+
+@pytest.mark.django_db(transaction=True)
+class Test26Moderation:
+
+    URL = '/api/v1/moderation/'
+
+    def moderate(self, client, data):
+        return client.post(
+            self.URL, data=json.dumps(data), content_type='application/json'
+        )
+
+    def test_01_hide_and_unhide_by_author(self, admin_client, admin,
+                                          user_client, user,
+                                          moderator_client):
+        comments, reviews, titles = create_comments(
+            admin_client, {admin: admin_client, user: user_client}
+        )
+        title_id = titles[0]['id']
+        reviews_url = f'/api/v1/titles/{title_id}/reviews/'
+        comments_url = f'{reviews_url}{reviews[0]["id"]}/comments/'
+        assert admin_client.get(reviews_url).json()['count'] == 2
+        assert admin_client.get(comments_url).json()['count'] == 2
+
+        response = self.moderate(
+            moderator_client, {'action': 'hide', 'author': user.username}
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {
+            'action': 'hide', 'reviews': 1, 'comments': 1, 'titles': 1
+        }
+        assert admin_client.get(reviews_url).json()['count'] == 1, (
+            'Скрытые отзывы не должны попадать в выдачу.'
+        )
+        assert admin_client.get(comments_url).json()['count'] == 1
+        hidden_review = f'{reviews_url}{reviews[1]["id"]}/comments/'
+        assert admin_client.get(hidden_review).status_code == (
+            HTTPStatus.NOT_FOUND
+        )
+
+        self.moderate(
+            moderator_client, {'action': 'unhide', 'author': user.username}
+        )
+        assert admin_client.get(reviews_url).json()['count'] == 2
+        assert admin_client.get(comments_url).json()['count'] == 2
+
+    def test_02_delete_by_ids(self, admin_client, admin, user_client, user,
+                              moderator_client):
+        comments, reviews, titles = create_comments(
+            admin_client, {admin: admin_client, user: user_client}
+        )
+        first, second = titles[0]['id'], titles[1]['id']
+        other = create_single_review(user_client, second, 'Спам', 1).json()
+        create_single_comment(admin_client, second, other['id'], 'Ответ')
+        assert admin_client.get(
+            f'/api/v1/titles/{second}/'
+        ).json()['rating'] == 1
+
+        response = self.moderate(moderator_client, {
+            'action': 'delete',
+            'reviews': [{'title': second, 'id': other['id']}],
+            'comments': [
+                {'title': first, 'id': comments[1]['id']},
+                {'title': second, 'id': comments[0]['id']},
+            ],
+        })
+        assert response.json() == {
+            'action': 'delete', 'reviews': 1, 'comments': 2, 'titles': 1
+        }, 'Комментарий к чужому произведению не должен удаляться.'
+        assert not Review.objects.filter(pk=other['id']).exists()
+        assert list(Comments.objects.values_list('pk', flat=True)) == [
+            comments[0]['id']
+        ]
+        assert admin_client.get(
+            f'/api/v1/titles/{second}/'
+        ).json()['rating'] is None
+
+    def test_03_chunked_constant_queries(self, admin_client, admin,
+                                         user_client, user,
+                                         moderator_client, settings):
+        settings.MODERATION_CHUNK = 2
+        titles = create_comments(
+            admin_client, {admin: admin_client, user: user_client}
+        )[2]
+        review = create_single_review(
+            user_client, titles[1]['id'], 'Ещё', 4
+        ).json()
+        for index in range(3):
+            create_single_comment(
+                user_client, titles[1]['id'], review['id'], f'Спам {index}'
+            )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.moderate(
+                moderator_client, {'action': 'delete', 'author': user.username}
+            )
+        assert response.json()['reviews'] == 2
+        assert not Review.objects.filter(author=user).exists()
+        assert not Comments.objects.filter(author=user).exists()
+        deletes = [
+            q for q in queries.captured_queries
+            if q['sql'].startswith('DELETE')
+        ]
+        assert len(deletes) <= 4, (
+            'Удаление должно выполняться пачками, а не по одной строке.'
+        )
+
+    def test_04_permissions(self, client, user_client, user, admin_client):
+        data = {'action': 'hide', 'author': user.username}
+        assert self.moderate(client, data).status_code == (
+            HTTPStatus.UNAUTHORIZED
+        )
+        assert self.moderate(user_client, data).status_code == (
+            HTTPStatus.FORBIDDEN
+        )
+        assert self.moderate(admin_client, {
+            'action': 'hide', 'author': user.username,
+            'reviews': [{'title': 1, 'id': 1}],
+        }).status_code == HTTPStatus.BAD_REQUEST
+
+    def test_05_rest_in_background(self, admin_client, admin, user_client,
+                                   user, moderator_client, settings):
+        settings.MODERATION_CHUNK = 1
+        settings.MODERATION_INLINE_CHUNKS = 1
+        titles = create_comments(
+            admin_client, {admin: admin_client, user: user_client}
+        )[2]
+        reviews_url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        assert admin_client.get(reviews_url).json()['count'] == 2
+        response = self.moderate(
+            moderator_client, {'action': 'hide', 'author': user.username}
+        )
+        assert response.status_code == HTTPStatus.ACCEPTED, (
+            'Модерация сверх MODERATION_INLINE_CHUNKS пачек должна '
+            'доделываться в фоне.'
+        )
+        assert response.json()['reviews'] + response.json()['comments'] == 1
+
+        def finished():
+            # Кэш сбрасывается последним, после всех пачек.
+            return admin_client.get(reviews_url).json()['count'] == 1
+
+        deadline = time.monotonic() + 5
+        while not finished() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert finished(), 'Фоновая модерация должна сбрасывать кэш страниц.'
+        assert not Review.objects.filter(
+            author=user, is_hidden=False
+        ).exists()
+        assert not Comments.objects.filter(
+            author=user, is_hidden=False
+        ).exists()
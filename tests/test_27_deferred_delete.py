@@ -0,0 +1,124 @@
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from reviews.models import Comments, Genre, GenreTitle, Review, Title, User
+from tests.utils import create_comments, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test27DeferredDelete:
+
+    @pytest.fixture(autouse=True)
+    def deferred(self, settings):
+        settings.INLINE_DELETE_LIMIT = 1
+        settings.PURGE_CHUNK = 1
+        settings.PURGE_IN_BACKGROUND = False
+
+    def purge(self):
+        out = StringIO()
+        call_command('purge_deleted', stdout=out)
+        return out.getvalue()
+
+    def test_01_user(self, admin_client, admin, user_client, user):
+        comments, reviews, titles = create_comments(
+            admin_client, {admin: admin_client, user: user_client}
+        )
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        authors = {r['author'] for r in admin_client.get(url).json()['results']}
+        assert user.username in authors
+        response = admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert not User.objects.filter(pk=user.pk).exists(), (
+            'Помеченный пользователь должен сразу пропадать из выдачи.'
+        )
+        marked = User.all_objects.get(pk=user.pk)
+        assert marked.is_deleted and marked.username != user.username
+        assert Review.objects.filter(author_id=user.pk).exists()
+        authors = {r['author'] for r in admin_client.get(url).json()['results']}
+        assert user.username not in authors, (
+            'Пометка пользователя должна сбрасывать кэш страниц с его '
+            'отзывами.'
+        )
+        response = admin_client.post('/api/v1/auth/signup/', data={
+            'username': marked.username, 'email': marked.email
+        })
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Имя помеченного пользователя не должно быть допустимым.'
+        )
+
+        assert 'Удалено помеченных объектов: 1' in self.purge()
+        assert not User.all_objects.filter(pk=user.pk).exists()
+        assert not Review.objects.filter(author_id=user.pk).exists()
+        assert not Comments.objects.filter(author_id=user.pk).exists()
+        assert admin_client.get(url).json()['count'] == 1
+
+        response = self.client_signup(admin_client, user)
+        assert response.status_code == HTTPStatus.OK
+
+    def client_signup(self, client, user):
+        return client.post('/api/v1/auth/signup/', data={
+            'username': user.username, 'email': user.email
+        })
+
+    def test_02_title_genre_category(self, admin_client, settings):
+        titles, categories, genres = create_titles(admin_client)
+        title_id = titles[0]['id']
+        response = admin_client.delete(f'/api/v1/titles/{title_id}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert admin_client.get(f'/api/v1/titles/{title_id}/').status_code \
+            == HTTPStatus.NOT_FOUND
+        assert GenreTitle.objects.filter(title_id=title_id).exists()
+
+        slug = categories[1]['slug']
+        admin_client.delete(f'/api/v1/categories/{slug}/')
+        other = admin_client.get(f'/api/v1/titles/{titles[1]["id"]}/').json()
+        assert other['category'] is None, (
+            'Помеченная на удаление категория не должна отображаться.'
+        )
+        response = admin_client.post(
+            '/api/v1/categories/', data={'name': 'Новая', 'slug': slug}
+        )
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Slug помеченной категории должен сразу освобождаться.'
+        )
+
+        self.purge()
+        assert not Title.all_objects.filter(pk=title_id).exists()
+        assert not GenreTitle.objects.filter(title_id=title_id).exists()
+        assert Title.objects.get(pk=titles[1]['id']).category_id is None
+
+        settings.INLINE_DELETE_LIMIT = 0
+        admin_client.delete(f'/api/v1/genres/{genres[2]["slug"]}/')
+        assert Genre.all_objects.filter(is_deleted=True).exists()
+        self.purge()
+        assert not Genre.all_objects.filter(slug=genres[2]['slug']).exists()
+        assert admin_client.get(
+            f'/api/v1/titles/{titles[1]["id"]}/'
+        ).json()['genre'] == []
+
+    def test_03_small_deletes_inline(self, admin_client, settings):
+        settings.INLINE_DELETE_LIMIT = 100
+        titles, _, _ = create_titles(admin_client)
+        admin_client.delete(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert not Title.all_objects.filter(pk=titles[0]['id']).exists()
+
+    def test_04_title_pages(self, admin_client, admin, user_client, user):
+        comments, reviews, titles = create_comments(
+            admin_client, {admin: admin_client, user: user_client}
+        )
+        title_id = titles[0]['id']
+        reviews_url = f'/api/v1/titles/{title_id}/reviews/'
+        review_id = admin_client.get(reviews_url).json()['results'][0]['id']
+        comments_url = f'{reviews_url}{review_id}/comments/'
+        assert admin_client.get(comments_url).status_code == HTTPStatus.OK
+        response = admin_client.delete(f'/api/v1/titles/{title_id}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert Review.objects.filter(title_id=title_id).exists()
+        for url in (reviews_url, comments_url):
+            assert admin_client.get(url).status_code == HTTPStatus.NOT_FOUND, (
+                'Пометка произведения должна сбрасывать кэш страниц его '
+                'отзывов и комментариев.'
+            )
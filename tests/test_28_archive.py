@@ -0,0 +1,138 @@
+import json
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.archive import archive
+from reviews.models import ArchivedComment, ArchivedReview, Comments, Review
+from tests.utils import (create_comments, create_single_comment,
+                         create_single_review, create_titles)
+
+
+def age(model, *ids):
+    model.objects.filter(pk__in=ids).update(
+        pub_date=timezone.now() - timedelta(days=400)
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test28Archive:
+
+    def test_01_reviews_fall_through(self, admin_client, user_client,
+                                     moderator_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        ids = [
+            create_single_review(client, title_id, f'review {score}', score)
+            .json()['id']
+            for client, score in (
+                (admin_client, 2), (user_client, 6), (moderator_client, 10)
+            )
+        ]
+        age(Review, ids[0], ids[1])
+        assert archive() == {'reviews': 2, 'comments': 0}
+        assert Review.objects.count() == 1
+        assert ArchivedReview.objects.count() == 2
+
+        url = f'/api/v1/titles/{title_id}/reviews/?limit=1&offset='
+        with CaptureQueriesContext(connection) as context:
+            first = admin_client.get(url + '0').json()
+        assert not any(
+            'archivedreview' in query['sql'] and 'COUNT' not in query['sql']
+            for query in context.captured_queries
+        ), 'Первая страница не должна выбирать строки из архива.'
+        assert first['count'] == 3
+        assert [item['id'] for item in first['results']] == [ids[2]]
+        assert [
+            admin_client.get(url + str(offset)).json()['results'][0]['id']
+            for offset in (1, 2)
+        ] == [ids[1], ids[0]], (
+            'За горячими отзывами список должен продолжаться архивом.'
+        )
+        rating = admin_client.get(f'/api/v1/titles/{title_id}/').json()
+        assert rating['rating'] == 6, (
+            'Архивные отзывы должны учитываться в рейтинге.'
+        )
+
+    def test_02_archived_review_is_read_only(self, admin_client, admin,
+                                             user_client, user):
+        comments, reviews, titles = create_comments(
+            admin_client, {admin: admin_client, user: user_client}
+        )
+        title_id = titles[0]['id']
+        hot_id = reviews[1]['id']
+        old_comment = create_single_comment(
+            admin_client, title_id, hot_id, 'old comment'
+        ).json()['id']
+        age(Review, reviews[0]['id'])
+        age(Comments, old_comment)
+        assert archive() == {'reviews': 1, 'comments': 3}
+
+        review_url = f'/api/v1/titles/{title_id}/reviews/{reviews[0]["id"]}/'
+        response = admin_client.get(review_url)
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['text'] == reviews[0]['text']
+        response = admin_client.patch(
+            review_url, data=json.dumps({'text': 'new'}),
+            content_type='application/json'
+        )
+        assert response.status_code == HTTPStatus.NOT_FOUND, (
+            'Архивный отзыв нельзя изменить.'
+        )
+        assert admin_client.get(
+            f'{review_url}comments/'
+        ).json()['count'] == 2
+        response = admin_client.post(
+            f'{review_url}comments/', data={'text': 'late'}
+        )
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+        hot_url = f'/api/v1/titles/{title_id}/reviews/{hot_id}/comments/'
+        fresh = create_single_comment(
+            user_client, title_id, hot_id, 'fresh'
+        ).json()['id']
+        assert [
+            item['id'] for item in admin_client.get(hot_url).json()['results']
+        ] == [fresh, old_comment]
+
+        response = admin_client.post(
+            f'/api/v1/titles/{title_id}/reviews/',
+            data={'text': 'again', 'score': 3}
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Архивный отзыв автора должен мешать второму отзыву.'
+        )
+
+    def test_03_moderation_and_deletes(self, admin_client, admin,
+                                       user_client, user, moderator_client):
+        comments, reviews, titles = create_comments(
+            admin_client, {admin: admin_client, user: user_client}
+        )
+        age(Review, *(review['id'] for review in reviews))
+        archive()
+        response = moderator_client.post(
+            '/api/v1/moderation/',
+            data=json.dumps({'action': 'delete', 'author': user.username}),
+            content_type='application/json'
+        )
+        assert response.json()['reviews'] == 1
+        assert not ArchivedReview.objects.filter(author=user).exists()
+        assert not ArchivedComment.objects.filter(author=user).exists()
+
+        admin_client.delete(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert not ArchivedReview.objects.exists()
+        assert not ArchivedComment.objects.exists()
+
+    def test_04_command(self, admin_client, user_client):
+        titles, _, _ = create_titles(admin_client)
+        review = create_single_review(user_client, titles[0]['id'], 'a', 5)
+        out = StringIO()
+        call_command('archive', '--days', '0', stdout=out)
+        assert 'отзывов: 1' in out.getvalue()
+        assert ArchivedReview.objects.filter(pk=review.json()['id']).exists()
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Title, User
+from tests.utils import create_comments
+
+
+def patch(client, url, data):
+    with CaptureQueriesContext(connection) as context:
+        response = client.patch(
+            url, data=json.dumps(data), content_type='application/json'
+        )
+    assert response.status_code == 200, response.content
+    return context
+
+
+def set_columns(context, table):
+    """Столбцы из SET каждого UPDATE таблицы."""
+    return [
+        {
+            part.split('=')[0].strip().strip('"')
+            for part in query['sql'].split(' SET ', 1)[1]
+            .split(' WHERE ')[0].split(', ')
+        }
+        for query in context.captured_queries
+        if query['sql'].startswith(f'UPDATE "{table}"')
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test29PartialUpdates:
+
+    def test_01_users(self, user_client, user, admin_client):
+        context = patch(user_client, '/api/v1/users/me/', {'bio': 'Обо мне'})
+        assert set_columns(context, 'reviews_user') == [{'bio'}], (
+            'PATCH пользователя должен обновлять только изменённые столбцы.'
+        )
+        context = patch(
+            admin_client, f'/api/v1/users/{user.username}/',
+            {'role': 'moderator'}
+        )
+        assert set_columns(context, 'reviews_user') == [
+            {'role', 'is_staff'}
+        ]
+        assert User.objects.get(pk=user.pk).is_staff
+
+        context = patch(user_client, '/api/v1/users/me/', {'bio': 'Обо мне'})
+        assert set_columns(context, 'reviews_user') == [], (
+            'PATCH без изменений не должен писать в БД.'
+        )
+
+    def test_02_update_fields(self, user):
+        user.bio = 'Новое'
+        user.first_name = 'Несохранённое'
+        with CaptureQueriesContext(connection) as context:
+            user.save(update_fields=['bio'])
+        assert set_columns(context, 'reviews_user') == [{'bio'}]
+        user.refresh_from_db()
+        assert user.bio == 'Новое' and user.first_name == ''
+
+    def test_03_titles_reviews_comments(self, admin_client, admin,
+                                        user_client, user):
+        comments, reviews, titles = create_comments(
+            admin_client, {admin: admin_client, user: user_client}
+        )
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        context = patch(admin_client, url, {'name': 'Терминатор 2'})
+        assert set_columns(context, 'reviews_title') == [{'name'}]
+        assert Title.objects.get(pk=titles[0]['id']).name == 'Терминатор 2'
+        review_url = (
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/'
+        )
+        context = patch(admin_client, review_url, {'text': 'Исправлено'})
+        assert set_columns(context, 'reviews_review') == [{'text'}]
+        context = patch(
+            admin_client, f'{review_url}comments/{comments[0]["id"]}/',
+            {'text': 'Исправлено'}
+        )
+        assert set_columns(context, 'reviews_comments') == [{'text'}]
@@ -0,0 +1,95 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import pytest
+from django.core import mail
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import User
+
+URL_SIGNUP = '/api/v1/auth/signup/'
+
+
+def user_queries(context):
+    return [
+        query['sql'].split()[0] for query in context.captured_queries
+        if '"reviews_user"' in query['sql']
+    ]
+
+
+def signup_concurrently(payloads):
+    barrier = threading.Barrier(len(payloads))
+
+    def signup(data):
+        try:
+            barrier.wait(5)
+            return Client().post(URL_SIGNUP, data=data).status_code
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=len(payloads)) as pool:
+        return list(pool.map(signup, payloads))
+
+
+@pytest.mark.django_db(transaction=True)
+class Test30SignupUpsert:
+
+    def test_01_one_lookup_and_one_write(self, client, settings):
+        data = {'username': 'upsert', 'email': 'upsert@yamdb.fake'}
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(URL_SIGNUP, data=data)
+        assert response.status_code == HTTPStatus.OK
+        assert user_queries(context) == ['SELECT', 'INSERT'], (
+            'Регистрация нового пользователя должна обходиться одним '
+            'поиском и одной вставкой.'
+        )
+
+        settings.CONFIRMATION_CODE_RESEND_WINDOW = 0
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(URL_SIGNUP, data=data)
+        assert response.status_code == HTTPStatus.OK
+        assert user_queries(context) == ['SELECT'], (
+            'Повторная регистрация не должна писать в таблицу пользователей.'
+        )
+        assert len(mail.outbox) == 2
+
+    def test_02_conflicts(self, client, user):
+        for data, field in (
+            ({'username': user.username, 'email': 'x@yamdb.fake'},
+             'username'),
+            ({'username': 'other', 'email': user.email}, 'email'),
+        ):
+            response = client.post(URL_SIGNUP, data=data)
+            assert response.status_code == HTTPStatus.BAD_REQUEST
+            assert isinstance(response.json()[field], list), (
+                'Ошибки полей должны возвращаться списком, как у DRF.'
+            )
+        response = client.post(URL_SIGNUP, data={
+            'username': user.username, 'email': user.email
+        })
+        assert response.status_code == HTTPStatus.OK
+
+    def test_03_duplicate_simultaneous_signups(self):
+        data = {'username': 'racer', 'email': 'racer@yamdb.fake'}
+        statuses = signup_concurrently([data] * 6)
+        assert statuses == [HTTPStatus.OK] * 6, (
+            'Одновременные одинаковые регистрации должны завершаться '
+            'успешно.'
+        )
+        assert User.objects.filter(username='racer').count() == 1
+        assert len(mail.outbox) == 1, (
+            'Код должен быть выдан и отправлен один раз.'
+        )
+
+    def test_04_conflicting_simultaneous_signups(self):
+        statuses = signup_concurrently([
+            {'username': 'racer', 'email': f'racer{index}@yamdb.fake'}
+            for index in range(6)
+        ])
+        assert sorted(statuses) == (
+            [HTTPStatus.OK] + [HTTPStatus.BAD_REQUEST] * 5
+        ), 'Занять username должен ровно один из запросов.'
+        assert User.objects.filter(username='racer').count() == 1
@@ -0,0 +1,86 @@
+import re
+from datetime import timedelta
+from http import HTTPStatus
+
+import pytest
+from django.core import mail
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import ConfirmationCode
+
+URL_SIGNUP = '/api/v1/auth/signup/'
+URL_TOKEN = '/api/v1/auth/token/'
+DATA = {'username': 'coder', 'email': 'coder@yamdb.fake'}
+
+
+def signup(client):
+    response = client.post(URL_SIGNUP, data=DATA)
+    assert response.status_code == HTTPStatus.OK
+    return int(re.search(r'\d{6}', mail.outbox[-1].body).group())
+
+
+def token(client, code):
+    return client.post(URL_TOKEN, data={
+        'username': DATA['username'], 'confirmation_code': code
+    })
+
+
+@pytest.mark.django_db(transaction=True)
+class Test31ConfirmationCodes:
+
+    def test_01_code_is_single_use(self, client):
+        code = signup(client)
+        assert ConfirmationCode.objects.filter(code=code).exists()
+        response = token(client, code)
+        assert response.status_code == HTTPStatus.OK
+        assert 'token' in response.json()
+        assert token(client, code).status_code == HTTPStatus.BAD_REQUEST, (
+            'Код подтверждения должен быть одноразовым.'
+        )
+
+    def test_02_resend_window(self, client, settings):
+        code = signup(client)
+        client.post(URL_SIGNUP, data=DATA)
+        assert len(mail.outbox) == 1, (
+            'Пока действует окно повторной отправки, новый код не выдаётся.'
+        )
+        assert token(client, code).status_code == HTTPStatus.OK
+
+        settings.CONFIRMATION_CODE_RESEND_WINDOW = 0
+        first = signup(client)
+        second = signup(client)
+        assert len(mail.outbox) == 3
+        if first != second:
+            assert token(client, first).status_code == HTTPStatus.BAD_REQUEST
+        assert token(client, second).status_code == HTTPStatus.OK
+
+    def test_03_attempts(self, client, settings):
+        settings.CONFIRMATION_CODE_ATTEMPTS = 2
+        code = signup(client)
+        wrong = 100000 if code != 100000 else 100001
+        with CaptureQueriesContext(connection) as context:
+            assert token(client, wrong).status_code == HTTPStatus.BAD_REQUEST
+        assert not any(
+            '"reviews_user"."password"' in query['sql']
+            for query in context.captured_queries
+        ), 'До совпадения кода пользователь не должен загружаться целиком.'
+        token(client, wrong)
+        assert token(client, code).status_code == HTTPStatus.BAD_REQUEST, (
+            'После исчерпания попыток код не должен приниматься.'
+        )
+        assert not ConfirmationCode.objects.exists()
+
+    def test_04_expiry(self, client):
+        code = signup(client)
+        ConfirmationCode.objects.update(
+            issued_at=ConfirmationCode.objects.get().issued_at
+            - timedelta(days=1)
+        )
+        assert token(client, code).status_code == HTTPStatus.BAD_REQUEST
+        assert not ConfirmationCode.objects.exists()
+        new_code = signup(client)
+        assert len(mail.outbox) == 2, (
+            'Истёкший код не должен мешать выдаче нового.'
+        )
+        assert token(client, new_code).status_code == HTTPStatus.OK
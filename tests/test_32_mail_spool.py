@@ -0,0 +1,88 @@
+import os
+import time
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.mail import send_mail
+from django.core.management import CommandError, call_command
+
+from api.mail_spool import find, latest_code, segments
+
+
+@pytest.fixture
+def spool(settings, tmp_path):
+    settings.EMAIL_BACKEND = 'api.mail_spool.SpoolEmailBackend'
+    settings.EMAIL_FILE_PATH = str(tmp_path)
+    return tmp_path
+
+
+def send(address, text):
+    assert send_mail('Тема', text, 'yamdb@mail.com', (address,)) == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_01_signup_code_from_spool(client, spool):
+    data = {'username': 'spooled', 'email': 'Spooled@yamdb.fake'}
+    assert client.post('/api/v1/auth/signup/', data=data).status_code == (
+        HTTPStatus.OK
+    )
+    assert sorted(os.listdir(spool)) == [
+        'segment-00000001.eml', 'segment-00000001.idx', 'spool.lock'
+    ], 'Письма должны дописываться в сегмент, а не в отдельные файлы.'
+    code = latest_code('spooled@yamdb.fake')
+    assert code is not None
+    response = client.post('/api/v1/auth/token/', data={
+        'username': 'spooled', 'confirmation_code': code
+    })
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_02_rotation_and_lookup(spool, settings):
+    for index in range(3):
+        send('a@yamdb.fake', f'Письмо {index}')
+        send('b@yamdb.fake', 'Другой адресат')
+    assert len(segments()) == 1
+    settings.MAIL_SPOOL_SEGMENT_BYTES = 1
+    send('a@yamdb.fake', 'Письмо 3')
+    send('a@yamdb.fake', 'Письмо 4')
+    assert segments() == [1, 2, 3]
+    bodies = [
+        message.get_body(('plain',)).get_content().strip()
+        for message in find('a@yamdb.fake', limit=3)
+    ]
+    assert bodies == ['Письмо 4', 'Письмо 3', 'Письмо 2'], (
+        'Поиск должен возвращать последние письма адресату, новые первыми.'
+    )
+    assert find('missing@yamdb.fake') == []
+
+
+def test_03_retention(spool, settings):
+    settings.MAIL_SPOOL_SEGMENT_BYTES = 1
+    settings.MAIL_SPOOL_RETENTION_DAYS = 1
+    send('a@yamdb.fake', 'Код 111111')
+    send('a@yamdb.fake', 'Код 222222')
+    old = time.time() - 2 * 24 * 60 * 60
+    for number in (1, 2):
+        os.utime(spool / f'segment-{number:08d}.eml', (old, old))
+    send('a@yamdb.fake', 'Код 333333')
+    assert segments() == [2, 3], (
+        'При ротации старые сегменты удаляются, кроме текущего.'
+    )
+    assert not (spool / 'segment-00000001.idx').exists()
+    assert latest_code('a@yamdb.fake') == 333333
+
+
+def test_04_command(spool):
+    send('a@yamdb.fake', 'Код для получения токена - 123456')
+    out = StringIO()
+    call_command('mailspool', 'A@yamdb.fake', '--code', stdout=out)
+    assert out.getvalue().strip() == '123456'
+    out = StringIO()
+    call_command('mailspool', 'a@yamdb.fake', stdout=out)
+    assert 'To: a@yamdb.fake' in out.getvalue()
+    with pytest.raises(CommandError):
+        call_command('mailspool', 'missing@yamdb.fake')
+    out = StringIO()
+    call_command('mailspool', '--prune', stdout=out)
+    assert 'Удалено сегментов: 0' in out.getvalue()